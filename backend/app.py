@@ -8,6 +8,8 @@ from dotenv import load_dotenv
 import datetime
 from functools import wraps
 
+from compression import decode_row
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -190,7 +192,7 @@ def search():
             sql_query += " WHERE " + tags_condition
         
         cursor.execute(sql_query)
-        rows = cursor.fetchall()
+        rows = [decode_row(row, conn, (0, 1)) for row in cursor.fetchall()]
         conn.close()
         
         if not rows:
@@ -291,7 +293,7 @@ def get_recommendations():
             AND url NOT LIKE '%terms%'
             AND url NOT LIKE '%policy%'
         """)
-        resources = cursor.fetchall()
+        resources = [decode_row(row, conn, (3,)) for row in cursor.fetchall()]
         conn.close()
         
         scored_resources = []
@@ -342,7 +344,7 @@ def get_history():
             ORDER BY usi.timestamp DESC
             LIMIT 50
         """, (user["user_id"],))
-        interactions = cursor.fetchall()
+        interactions = [decode_row(row, conn, (2,)) for row in cursor.fetchall()]
         conn.close()
         
         history = [
@@ -447,7 +449,7 @@ def get_all_resources():
             LIMIT ? OFFSET ?
         """, (per_page, offset))
         
-        resources = cursor.fetchall()
+        resources = [decode_row(row, conn, (2,)) for row in cursor.fetchall()]
         
         cursor.execute("SELECT COUNT(*) FROM resources")
         total = cursor.fetchone()[0]
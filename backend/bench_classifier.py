@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+URL Classifier Benchmark
+Compare the old check_*_page substring chains from mega_crawler.py and
+crawler.py with the compiled rule table in url_rules.py on a synthetic
+sample of crawler links.
+
+The rule table is a consolidation of the two sets of chains, not an
+optimization: the timings are there to show it costs about the same.
+Where the chains disagreed the table keeps the stricter answer, so it
+should never accept a link that either old chain rejected ("looser"
+below); links only the table rejects are listed as "stricter".
+
+Each link is checked against the target's check function, and accepted
+links a second time, as the crawl engine does when it queues a link and
+again when it pops it. Links repeat across the sample the way navigation
+links repeat across pages.
+
+Usage:
+    python bench_classifier.py [num_urls] [unique_urls]
+"""
+
+import random
+import sys
+import time
+
+from url_rules import classify, site_filter
+from urlnorm import canonicalize_url
+
+# -------------------- OLD CHECK FUNCTIONS --------------------
+
+# The mega_crawler.py chains before url_rules.py, kept as the baseline
+
+def legacy_kaggle(url):
+    if any(symbol in url for symbol in ['#', '%']):
+        return None
+    if url.endswith(('/discussions', '/code', '/suggestions', '/competitions')):
+        return None
+    if '/discussion' in url:
+        return None
+    if 'kaggle.com/datasets' in url:
+        return 'dataset'
+    elif 'kaggle.com/models' in url:
+        return 'model'
+    elif 'kaggle.com/learn' in url:
+        return 'article'
+    return None
+
+def legacy_medium(url):
+    if 'medium.com' in url:
+        if any(x in url for x in ['/plans', '/membership', '/about', '/jobs', '/newsletter']):
+            return None
+        return 'article'
+    return None
+
+def legacy_arxiv(url):
+    if 'arxiv.org' in url and '/abs/' in url:
+        return 'research paper'
+    return None
+
+def legacy_huggingface(url):
+    if 'huggingface.co' in url:
+        if any(x in url for x in ['#', '?page=']):
+            return None
+        if '/datasets/' in url:
+            return 'dataset'
+        elif '/models/' in url or '/spaces/' in url:
+            return 'model'
+        elif '/papers/' in url:
+            return 'research paper'
+        elif '/docs/' in url:
+            return 'documentation'
+    return None
+
+def legacy_paperswithcode(url):
+    if 'paperswithcode.com' in url:
+        if any(x in url for x in ['#']):
+            return None
+        if '/paper/' in url or '/method/' in url or '/task/' in url:
+            return 'research paper'
+        elif '/dataset/' in url:
+            return 'dataset'
+    return None
+
+def legacy_github(url):
+    if 'github.com' in url:
+        if any(x in url for x in ['#', '/issues/', '/pull/', '/actions/', '/wiki/', '/settings/']):
+            return None
+        ml_keywords = ['machine-learning', 'deep-learning', 'neural', 'tensorflow', 'pytorch',
+                       'ai', 'ml', 'llm', 'transformer', 'vision', 'nlp']
+        if any(kw in url.lower() for kw in ml_keywords):
+            return 'code'
+    return None
+
+def legacy_towardsdatascience(url):
+    if 'towardsdatascience.com' in url:
+        if any(x in url for x in ['#', '/plans', '/membership']):
+            return None
+        return 'article'
+    return None
+
+def legacy_machinelearningmastery(url):
+    if 'machinelearningmastery.com' in url:
+        if any(x in url for x in ['#', '/blog/', '/start-here/', '/about/']):
+            return None
+        return 'article'
+    return None
+
+def legacy_kdnuggets(url):
+    if 'kdnuggets.com' in url:
+        if any(x in url for x in ['#', '/tag/', '/author/']):
+            return None
+        return 'article'
+    return None
+
+LEGACY = {
+    'kaggle': legacy_kaggle,
+    'medium': legacy_medium,
+    'arxiv': legacy_arxiv,
+    'huggingface': legacy_huggingface,
+    'paperswithcode': legacy_paperswithcode,
+    'github': legacy_github,
+    'kdnuggets': legacy_kdnuggets,
+    'towardsdatascience': legacy_towardsdatascience,
+    'machinelearningmastery': legacy_machinelearningmastery,
+}
+
+# The stricter crawler.py chains for the sites it also covered
+
+def strict_kaggle(url):
+    if any(symbol in url for symbol in ['#', '?', '%']):
+        return None
+    if url.endswith(('/discussions', '/code', '/suggestions', '/competitions')):
+        return None
+    if '/discussion' in url:
+        return None
+    if 'kaggle.com/datasets' in url:
+        return 'dataset'
+    elif 'kaggle.com/models' in url:
+        return 'model'
+    elif 'kaggle.com/learn' in url:
+        return 'article'
+    elif 'kaggle.com' in url:
+        return 'home'
+    return None
+
+def strict_medium(url):
+    if 'medium.com' in url:
+        if any(x in url for x in ['?', '#', '/tag/', '/topics/', '/plans', '/membership', '/about']):
+            return None
+        if url.count('/') >= 3:
+            return 'article'
+    return None
+
+def strict_towardsdatascience(url):
+    if 'towardsdatascience.com' in url:
+        if any(x in url for x in ['?', '#', '/tagged/', '/plans']):
+            return None
+        if url.count('/') >= 3:
+            return 'article'
+    return None
+
+def strict_paperswithcode(url):
+    if 'paperswithcode.com' in url:
+        if any(x in url for x in ['?', '#']):
+            return None
+        if '/paper/' in url or '/dataset/' in url or '/method/' in url:
+            return 'research paper'
+    return None
+
+def strict_machinelearningmastery(url):
+    if 'machinelearningmastery.com' in url:
+        if any(x in url for x in ['?', '#', '/blog/', '/start-here/', '/about/']):
+            return None
+        if url.count('/') >= 3:
+            return 'article'
+    return None
+
+STRICT = {
+    'kaggle': strict_kaggle,
+    'medium': strict_medium,
+    'towardsdatascience': strict_towardsdatascience,
+    'paperswithcode': strict_paperswithcode,
+    'machinelearningmastery': strict_machinelearningmastery,
+}
+
+# -------------------- SAMPLE --------------------
+
+TEMPLATES = [
+    "https://arxiv.org/abs/{a}.{b:05d}",
+    "https://arxiv.org/list/cs.LG/pastweek?skip={n}",
+    "https://kaggle.com/datasets/user{a}/dataset-{b}",
+    "https://kaggle.com/code/user{a}/notebook-{b}",
+    "https://kaggle.com/datasets/user{a}/dataset-{b}/discussion/{n}",
+    "https://medium.com/@writer{a}/understanding-transformers-{b:x}",
+    "https://medium.com/tag/machine-learning/archive/{n}",
+    "https://medium.com/tag/deep-learning",
+    "https://medium.com/search?q=term{b}",
+    "https://towardsdatascience.com/neural-networks-explained-{b:x}",
+    "https://towardsdatascience.com/tagged/machine-learning",
+    "https://machinelearningmastery.com/how-to-tune-model-{b}",
+    "https://machinelearningmastery.com/category/deep-learning/page/{n}",
+    "https://kaggle.com/datasets",
+    "https://kaggle.com/datasets?search=term{b}",
+    "https://paperswithcode.com/task/image-{b}",
+    "https://paperswithcode.com/paper/method-{b}?tab=code",
+    "https://towardsdatascience.medium.com/deep-learning-guide-{b:x}",
+    "https://huggingface.co/models/org{a}/model-{b}",
+    "https://huggingface.co/datasets/org{a}/data-{b}",
+    "https://huggingface.co/models?page={n}",
+    "https://paperswithcode.com/paper/method-{b}",
+    "https://paperswithcode.com/dataset/bench-{b}",
+    "https://github.com/org{a}/pytorch-model-{b}",
+    "https://github.com/org{a}/webapp-{b}/issues/{n}",
+    "https://kdnuggets.com/{a}/{n:02d}/top-ml-tools-{b}.html",
+    "https://kdnuggets.com/tag/python-{n}",
+    "https://twitter.com/share?url=page{b}",
+    "https://linkedin.com/company/org{a}",
+    "https://google.com/search?q=term{b}",
+]
+
+def build_sample(num_urls, unique_urls, seed=42):
+    rng = random.Random(seed)
+    pool = [
+        canonicalize_url(rng.choice(TEMPLATES).format(
+            a=rng.randint(1000, 2500), b=rng.randint(1, 99999), n=rng.randint(1, 40)
+        ))
+        for _ in range(unique_urls)
+    ]
+    sites = list(LEGACY)
+    return [(rng.choice(sites), rng.choice(pool)) for _ in range(num_urls)]
+
+# -------------------- TIMING --------------------
+
+def run(checks, sample):
+    start = time.perf_counter()
+    accepted = 0
+    for site, url in sample:
+        check = checks[site]
+        # Once when the link is queued, again when it is popped
+        if check(url) and check(url) is not None:
+            accepted += 1
+    return time.perf_counter() - start, accepted
+
+def main():
+    num_urls = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    unique_urls = int(sys.argv[2]) if len(sys.argv) > 2 else num_urls // 4
+
+    print(f"Building sample of {num_urls:,} links ({unique_urls:,} unique)...")
+    sample = build_sample(num_urls, unique_urls)
+    compiled = {site: site_filter(site) for site in LEGACY}
+
+    legacy_time, legacy_accepted = run(LEGACY, sample)
+    classify.cache_clear()
+    compiled_time, compiled_accepted = run(compiled, sample)
+    cached_time, _ = run(compiled, sample)
+
+    # site -> (count, example url, old answers, new answer)
+    looser, stricter = {}, {}
+    for site, url in set(sample):
+        old = [LEGACY[site](url)] + ([STRICT[site](url)] if site in STRICT else [])
+        new = compiled[site](url)
+        if new is not None and None in old:
+            found = looser
+        elif new is None and None not in old:
+            found = stricter
+        else:
+            continue
+        count, example, old_kinds, new_kind = found.get(site, (0, url, old, new))
+        found[site] = (count + 1, example, old_kinds, new_kind)
+
+    print("=" * 70)
+    print(f"  URL CLASSIFIER BENCHMARK ({num_urls:,} links)")
+    print("=" * 70)
+    print(f"Substring chains:      {legacy_time:7.2f} s  {num_urls / legacy_time:12,.0f} links/s")
+    print(f"Rule table (cold):     {compiled_time:7.2f} s  {num_urls / compiled_time:12,.0f} links/s")
+    print(f"Rule table (cached):   {cached_time:7.2f} s  {num_urls / cached_time:12,.0f} links/s")
+    print(f"Accepted:              {legacy_accepted:,} old / {compiled_accepted:,} new")
+    for label, found in [("Looser than an old chain", looser), ("Stricter than the old chains", stricter)]:
+        print()
+        print(f"{label}: {sum(count for count, *_ in found.values()):,} unique links")
+        for site, (count, url, old, new) in sorted(found.items()):
+            print(f"  {site:22} {count:7,}  e.g. {url[:55]}  {'/'.join(map(str, old))} -> {new}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Crawl Replay Benchmark
+Measure crawler throughput offline. A local HTTP server replays a
+synthetic, link-dense site graph with arxiv, Medium and Kaggle URL
+shapes, and each crawl variant crawls it from the same seeds with the
+same budgets.
+
+The fetcher sends every request to the local server (REPLAY_ORIGIN), so
+canonical https URLs and the url_rules check functions work unchanged.
+Each variant runs in a fresh process with its own temporary databases
+and reports pages/s, database write throughput and peak memory. Per-host
+pacing is off (HOST_MAX_RATE=0) so the crawl pipeline is measured, not
+the politeness delay.
+
+Variants:
+    bfs          crawl_engine.crawl_site with the FIFO frontier
+    priority     crawl_engine.crawl_site with the best-first frontier
+    persistent   resumable PersistentFrontier, as mega_crawler.py runs it
+    bloom        PersistentFrontier with VISITED_FILTER=bloom
+    pool         driver_pool.crawl_parallel, 4 workers (HTTP only)
+    distributed  one distributed.py worker on a shared frontier
+
+Usage:
+    python bench_crawl.py [pages_per_target] [variant ...]
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VARIANTS = ('bfs', 'priority', 'persistent', 'bloom', 'pool', 'distributed')
+POOL_WORKERS = 4
+
+# -------------------- SYNTHETIC SITE --------------------
+
+SITE_SEED = 1234
+SITE_SIZE = 20000          # resource pages per site
+LINKS_PER_PAGE = 40
+BODY_WORDS = 300
+
+WORDS = (
+    "neural network dataset training model transformer attention benchmark "
+    "inference architecture tutorial guide implementation github reference "
+    "learning deep reinforcement vision language embedding gradient optimizer "
+    "loss evaluation accuracy layer convolution token pretraining finetuning "
+    "retrieval generation diffusion graph federated multimodal robotics"
+).split()
+
+TAGS = ['machine-learning', 'deep-learning', 'artificial-intelligence', 'nlp', 'computer-vision']
+
+def _slug(rng, words=4):
+    return '-'.join(rng.choice(WORDS) for _ in range(words))
+
+# host: (resource path, listing path, navigation paths the filters reject)
+SITES = {
+    'arxiv.org': (
+        lambda i, rng: f"/abs/24{i // 10000 + 1:02d}.{i % 10000:05d}",
+        lambda i, rng: f"/list/cs.LG/pastweek?skip={i * 25}",
+        ['/help', '/login', '/list/cs.AI/recent'],
+    ),
+    'medium.com': (
+        lambda i, rng: f"/@writer{i % 900}/{_slug(random.Random(i))}-{i:012x}",
+        lambda i, rng: f"/tag/{TAGS[i % len(TAGS)]}/archive/{i % 50}",
+        ['/plans', '/membership', '/about', '/jobs'],
+    ),
+    'kaggle.com': (
+        lambda i, rng: (f"/datasets/user{i % 700}/dataset-{i}" if i % 3
+                        else f"/models/org{i % 300}/model-{i}"),
+        lambda i, rng: f"/datasets?page={i % 100}",
+        ['/code', '/discussions', '/competitions', '/discussion/1'],
+    ),
+}
+
+def _rng(*key):
+    digest = hashlib.blake2b('|'.join(map(str, (SITE_SEED,) + key)).encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(digest, 'little'))
+
+def _popular(rng):
+    # Skewed towards low ids, the way a few pages collect most inlinks
+    return int(SITE_SIZE * rng.random() ** 2)
+
+def build_page(host, path):
+    """The page at host + path; the same bytes on every run"""
+    host = host[4:] if host.startswith('www.') else host
+    rng = _rng(host, path)
+    resource_path, listing_path, navigation = SITES.get(host, SITES['arxiv.org'])
+
+    links = []
+    for _ in range(LINKS_PER_PAGE):
+        target = resource_path(_popular(rng), rng)
+        # Mix absolute (sometimes www.) and relative hrefs, as real pages do
+        style = rng.random()
+        if style < 0.4:
+            links.append((target, _slug(rng, 3)))
+        elif style < 0.8:
+            links.append((f"https://{host}{target}", _slug(rng, 3)))
+        else:
+            links.append((f"http://www.{host}{target}?utm_source=feed", _slug(rng, 3)))
+    links += [(listing_path(rng.randrange(200), rng), 'More') for _ in range(5)]
+    links += [(nav, nav.strip('/')) for nav in navigation]
+    for other in SITES:
+        if other != host:
+            links.append((f"https://{other}{SITES[other][0](_popular(rng), rng)}", 'Related'))
+    links.append(("https://twitter.com/share?url=" + path, 'Share'))
+
+    title = _slug(rng, 6).replace('-', ' ').title()
+    body = ' '.join(rng.choice(WORDS) for _ in range(BODY_WORDS))
+    anchors = ''.join(f'<li><a href="{href}">{text}</a></li>' for href, text in links)
+    return (
+        f"<!DOCTYPE html><html><head><title>{title}</title>"
+        f'<meta name="description" content="{body[:150]}">'
+        f"<script>var analytics = true;</script></head>"
+        f"<body><h1>{title}</h1><p>{body}</p><ul>{anchors}</ul></body></html>"
+    )
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        # /<host>/<path>, see politeness.REPLAY_ORIGIN
+        host, _, rest = self.path.lstrip('/').partition('/')
+        body = build_page(host, '/' + rest).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server():
+    """Serve the synthetic site on a free local port; returns (server, origin)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ReplayHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+# -------------------- CRAWL (child process) --------------------
+
+# name, seed URL, max depth, url_rules site
+TARGETS = [
+    ("ArXiv - Machine Learning", "https://arxiv.org/list/cs.LG/recent", 4, 'arxiv'),
+    ("Medium - Machine Learning", "https://medium.com/tag/machine-learning", 4, 'medium'),
+    ("Kaggle - Datasets", "https://www.kaggle.com/datasets", 3, 'kaggle'),
+]
+
+def _no_driver():
+    return None
+
+def run_variant(variant, budget):
+    """Crawl every target with one variant; returns the measurements"""
+    import crawl_engine
+    import db
+    from crawl_writer import get_writer, flush_all
+    from tagger import assign_tags
+    from url_rules import site_filter
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.setup_database()
+    writer = get_writer(db.DATABASE_PATH)
+    targets = [(name, url, depth, site_filter(site), budget) for name, url, depth, site in TARGETS]
+
+    def crawl_site(start_url, max_depth, check_function, visited_links, max_pages, frontier=None):
+        return crawl_engine.crawl_site(
+            start_url, max_depth, check_function, None, visited_links, max_pages,
+            assign_tags=assign_tags, store_resource=writer.add_resource,
+            store_link=writer.add_link, content_chars=500, frontier=frontier
+        )
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    pages = 0
+
+    if variant in ('bfs', 'priority'):
+        visited_links = set()
+        for _, url, depth, check, max_pages in targets:
+            pages += crawl_site(url, depth, check, visited_links, max_pages)
+
+    elif variant in ('persistent', 'bloom'):
+        from frontier import CrawlStateStore
+        store = CrawlStateStore('bench')
+        visited_links = store.load_visited()
+        for name, url, depth, check, max_pages in targets:
+            frontier = store.target_frontier(name, url, depth, max_pages, visited_links)
+            pages += crawl_site(url, depth, check, visited_links, max_pages, frontier)
+            store.finish_target(frontier)
+        store.close()
+
+    elif variant == 'pool':
+        from driver_pool import crawl_parallel
+        results = crawl_parallel(
+            targets, _no_driver, set(), assign_tags, writer.add_resource, writer.add_link,
+            workers=POOL_WORKERS, content_chars=500, log_every=None
+        )
+        pages = sum(results.values())
+
+    elif variant == 'distributed':
+        from distributed import SharedFrontierStore, run_worker
+        store = SharedFrontierStore('bench')
+        visited_links = set()
+        results = run_worker(
+            store, targets,
+            lambda t, frontier: crawl_site(t[1], t[2], t[3], visited_links, t[4], frontier),
+            visited_links, log=False
+        )
+        store.close()
+        pages = sum(results.values())
+
+    flush_all()
+    elapsed = time.perf_counter() - start
+
+    conn = sqlite3.connect(db.DATABASE_PATH)
+    resources = conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+    links = conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+    conn.close()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        'variant': variant,
+        'pages': pages,
+        'seconds': elapsed,
+        'resources': resources,
+        'links': links,
+        'rows_written': writer.rows_written,
+        'write_seconds': writer.write_seconds,
+        'peak_mb': peak_rss / 1024,
+        'growth_mb': (peak_rss - baseline_rss) / 1024,
+        'worker_mb': children_rss / 1024,
+    }
+
+# -------------------- DRIVER --------------------
+
+def run_child(variant, budget, origin):
+    """Run one variant in a fresh process with its own databases"""
+    workdir = tempfile.mkdtemp(prefix=f'bench_crawl_{variant}_')
+    env = dict(os.environ)
+    env.update({
+        'REPLAY_ORIGIN': origin,
+        'DATABASE_PATH': os.path.join(workdir, 'database.db'),
+        'CRAWL_STATE_PATH': os.path.join(workdir, 'crawl_state.db'),
+        'DIST_STATE_PATH': os.path.join(workdir, 'crawl_shared.db'),
+        'PAGE_STORE_PATH': os.path.join(workdir, 'pages.db'),
+        'TELEMETRY_PATH': os.path.join(workdir, 'crawl_metrics.jsonl'),
+        'CRAWL_FRONTIER': 'bfs' if variant == 'bfs' else 'priority',
+        'VISITED_FILTER': 'bloom' if variant == 'bloom' else 'set',
+        'DIST_IDLE_SECONDS': '0.1',
+    })
+    env.setdefault('HOST_MAX_RATE', '0')
+    env.setdefault('HOST_ADAPTIVE_FACTOR', '0')
+    env.setdefault('TELEMETRY', '0')
+    try:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', variant, str(budget)],
+            env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{variant} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        print(json.dumps(run_variant(sys.argv[2], int(sys.argv[3]))))
+        return
+
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    variants = sys.argv[2:] or list(VARIANTS)
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        print(f"Unknown variants: {', '.join(sorted(unknown))}")
+        print(__doc__)
+        return
+
+    server, origin = start_server()
+    print(f"Replaying the synthetic site from {origin}")
+    print(f"{len(TARGETS)} targets x {budget} pages, variants: {', '.join(variants)}")
+
+    results = []
+    try:
+        for variant in variants:
+            results.append(run_child(variant, budget, origin))
+    finally:
+        server.shutdown()
+
+    print("=" * 80)
+    print(f"  CRAWL REPLAY BENCHMARK ({len(TARGETS)} targets x {budget} pages)")
+    print("=" * 80)
+    print(f"{'Variant':12} {'pages':>6} {'sec':>7} {'pages/s':>8} {'resources':>9} {'links':>7} "
+          f"{'DB rows/s':>10} {'peak MB':>8} {'+MB':>6}")
+    for r in results:
+        print(f"{r['variant']:12} {r['pages']:6} {r['seconds']:7.2f} "
+              f"{r['pages'] / max(r['seconds'], 1e-9):8.1f} {r['resources']:9} {r['links']:7} "
+              f"{r['rows_written'] / max(r['write_seconds'], 1e-9):10,.0f} "
+              f"{r['peak_mb']:8.1f} {r['growth_mb']:6.1f}")
+    if any(r['worker_mb'] for r in results):
+        print()
+        for r in results:
+            if r['worker_mb']:
+                print(f"{r['variant']}: largest worker process {r['worker_mb']:.1f} MB")
+    print("=" * 80)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Extraction Benchmark
+Compare the old per-element WebDriver extraction (one round trip per
+field and per anchor) with the single execute_script extraction used by
+fetcher.extract_page().
+
+Loads a generated local page with N links so no network is involved.
+
+Usage:
+    python bench_extraction.py [num_links] [runs]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from selenium.webdriver.common.by import By
+
+from fetcher import extract_page
+from mega_crawler import setup_driver
+
+def build_page(num_links):
+    links = "\n".join(
+        f'<li><a href="https://example.com/article/{i}">Article {i}</a></li>'
+        for i in range(num_links)
+    )
+    return f"""<!DOCTYPE html>
+<html><head>
+<title>Extraction benchmark</title>
+<meta name="description" content="Synthetic page with {num_links} links">
+</head><body>
+<h1>Machine learning resources</h1>
+<p>{'Neural networks learn representations from training data. ' * 50}</p>
+<ul>{links}</ul>
+</body></html>"""
+
+def extract_per_element(driver, url):
+    """The extraction crawl_site used before: one WebDriver call per item"""
+    title = driver.title
+    try:
+        description = driver.find_element(
+            By.CSS_SELECTOR, 'meta[name="description"]'
+        ).get_attribute('content')
+    except Exception:
+        description = ''
+
+    content = driver.find_element(By.TAG_NAME, 'body').text
+
+    links = []
+    for link in driver.find_elements(By.TAG_NAME, 'a'):
+        href = link.get_attribute('href')
+        if href and href.startswith('http') and href not in links:
+            links.append(href)
+
+    return title, description, content, links
+
+def time_runs(function, driver, url, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function(driver, url)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], result
+
+def main():
+    num_links = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False) as f:
+        f.write(build_page(num_links))
+        path = f.name
+
+    driver = setup_driver()
+    try:
+        url = 'file://' + path
+        driver.get(url)
+
+        old_time, old = time_runs(extract_per_element, driver, url, runs)
+        new_time, new = time_runs(extract_page, driver, url, runs)
+    finally:
+        driver.quit()
+        os.unlink(path)
+
+    print("=" * 70)
+    print(f"  EXTRACTION BENCHMARK ({num_links} links, median of {runs} runs)")
+    print("=" * 70)
+    print(f"Per-element calls:  {old_time * 1000:9.1f} ms  ({num_links + 4} round trips)")
+    print(f"Single script:      {new_time * 1000:9.1f} ms  (1 round trip)")
+    print(f"Speedup:            {old_time / max(new_time, 1e-9):9.1f}x")
+    print()
+    print(f"Same title:         {old[0] == new.title}")
+    print(f"Same description:   {old[1] == new.description}")
+    print(f"Same links:         {old[3] == new.links} ({len(new.links)} links)")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
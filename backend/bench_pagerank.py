@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+PageRank Benchmark
+Compare the old dict-based calculate_pagerank (fixed 20 iterations, one
+Python loop over every edge per iteration) with the sparse-matrix power
+iteration in pagerank.py, on synthetic link graphs.
+
+Each graph has power-law in-degrees, like real link graphs. For the
+comparison every page gets at least one outgoing link: without dangling
+pages the old scores are the new ranks times the number of pages, so with
+the same number of iterations both must agree to floating-point error. A
+second graph with dangling pages shows the rank mass the old version
+loses.
+
+The old version needs several GB for 10^7 edges.
+
+Usage:
+    python bench_pagerank.py [num_edges ...]     # default: 100000 1000000
+"""
+
+import sys
+import time
+import numpy as np
+
+from pagerank import node_ids, transition_matrix, power_iteration, PAGERANK_DAMPING, PAGERANK_TOL
+
+# -------------------- OLD IMPLEMENTATION --------------------
+
+# calculate_pagerank before pagerank.py used scipy, kept as the baseline
+# (progress prints removed)
+
+def legacy_pagerank(links, damping_factor=0.85, iterations=20):
+    pages = set()
+    for source, destination in links:
+        pages.add(source)
+        pages.add(destination)
+    pagerank = {page: 1.0 for page in pages}
+
+    inbound_links = {page: [] for page in pages}
+    outbound_links = {page: 0 for page in pages}
+
+    for source, destination in links:
+        inbound_links[destination].append(source)
+        outbound_links[source] += 1
+
+    for iteration in range(iterations):
+        new_pagerank = {}
+        for page in pages:
+            rank_sum = 0
+            for inbound_page in inbound_links[page]:
+                if outbound_links[inbound_page] > 0:
+                    rank_sum += pagerank[inbound_page] / outbound_links[inbound_page]
+            new_pagerank[page] = (1 - damping_factor) + damping_factor * rank_sum
+        pagerank = new_pagerank
+
+    return pagerank
+
+# -------------------- GRAPHS --------------------
+
+def synthetic_links(num_edges, dangling_fraction=0.0, seed=42):
+    """(url, url) links over num_edges / 10 pages with power-law in-degrees"""
+    rng = np.random.default_rng(seed)
+    num_pages = max(num_edges // 10, 10)
+    linking = num_pages - int(num_pages * dangling_fraction)
+
+    # Every linking page has one outgoing link, the rest are spread at random
+    sources = np.concatenate([np.arange(linking), rng.integers(0, linking, num_edges - linking)])
+    popularity = 1.0 / np.arange(1, num_pages + 1) ** 0.8
+    destinations = rng.choice(num_pages, size=num_edges, p=popularity / popularity.sum())
+    pages = rng.permutation(num_pages)
+    return [(f"https://example.com/p/{s}", f"https://example.com/p/{d}")
+            for s, d in zip(pages[sources].tolist(), pages[destinations].tolist())]
+
+def sparse_pagerank(links, iterations=None):
+    """Ranks by page, the iterations run and the seconds taken"""
+    start = time.perf_counter()
+    pages, sources, destinations = node_ids(links)
+    M, dangling = transition_matrix(sources, destinations, len(pages))
+    if iterations is None:
+        rank, residuals = power_iteration(M, dangling, PAGERANK_DAMPING)
+    else:
+        rank, residuals = power_iteration(M, dangling, PAGERANK_DAMPING, tol=0, max_iterations=iterations)
+    elapsed = time.perf_counter() - start
+    return dict(zip(pages, rank.tolist())), residuals, elapsed
+
+def compare(num_edges):
+    links = synthetic_links(num_edges)
+    new, residuals, new_time = sparse_pagerank(links)
+    iterations = len(residuals)
+
+    start = time.perf_counter()
+    old = legacy_pagerank(links, PAGERANK_DAMPING, iterations)
+    old_time = time.perf_counter() - start
+
+    num_pages = len(new)
+    diff = max(abs(old[page] / num_pages - rank) for page, rank in new.items())
+    top_old = sorted(old, key=old.get, reverse=True)[:100]
+    top_new = sorted(new, key=new.get, reverse=True)[:100]
+
+    links = synthetic_links(num_edges, dangling_fraction=0.2)
+    dangling_new, _, _ = sparse_pagerank(links)
+    dangling_old = legacy_pagerank(links, PAGERANK_DAMPING)
+
+    print(f"{num_edges:,} edges, {num_pages:,} pages")
+    print(f"  Old (dict, {iterations} iterations): {old_time:9.2f} s  "
+          f"({old_time / iterations * 1000:.0f} ms/iteration)")
+    print(f"  New (CSR, tol {PAGERANK_TOL:g}):      {new_time:9.2f} s  "
+          f"({iterations} iterations, final residual {residuals[-1]:.2e})")
+    print(f"  Speedup:                       {old_time / max(new_time, 1e-9):9.1f}x")
+    print(f"  Max |old/N - new|:             {diff:.2e}")
+    print(f"  Same top 100 order:            {top_old == top_new}")
+    print(f"  Rank mass kept with 20% dangling pages: "
+          f"old {sum(dangling_old.values()) / len(dangling_old):.3f}, "
+          f"new {sum(dangling_new.values()):.3f}")
+
+def main():
+    sizes = [int(float(arg)) for arg in sys.argv[1:]] or [100000, 1000000]
+
+    print("=" * 70)
+    print("  PAGERANK BENCHMARK")
+    print("=" * 70)
+    for num_edges in sizes:
+        compare(num_edges)
+        print()
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Discovery Fixture Check
+Run discovery.py's parser and discover() against the sitemaps and feeds
+in fixtures/discovery/ and compare them with the entries they should
+yield: a sitemap, a sitemap index with relative locations, a gzipped
+sitemap, an RSS feed and an Atom feed. Needs no network.
+
+Usage:
+    python check_discovery.py
+"""
+
+import os
+import sys
+
+from discovery import discover, open_source, parse_source, seed_rows
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'discovery')
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+def file_url(name):
+    return 'file://' + fixture(name)
+
+# -------------------- EXPECTED --------------------
+
+# parse_source items per fixture: ('sitemap', location) or
+# ('url', url, lastmod, title), before canonicalization and filtering
+PARSED = {
+    'sitemap-index.xml': [
+        ('sitemap', file_url('sitemap.xml')),
+        ('sitemap', file_url('sitemap-kaggle.xml.gz')),
+        ('sitemap', file_url('missing-sitemap.xml')),
+    ],
+    'sitemap.xml': [
+        ('url', 'https://huggingface.co/datasets/openai/gsm8k', '2026-05-01T00:00:00Z', None),
+        ('url', 'https://HuggingFace.co/models/google-bert/bert-base-uncased/?utm_source=sitemap',
+         '2026-09-15T08:00:00Z', None),
+        ('url', 'https://huggingface.co/papers/2310.06825', None, None),
+        ('url', 'https://huggingface.co/models', '2026-10-10T00:00:00Z', None),
+        ('url', 'https://huggingface.co/datasets/openai/gsm8k#viewer', '2026-10-10T00:00:00Z', None),
+    ],
+    'sitemap-kaggle.xml.gz': [
+        ('url', 'https://www.kaggle.com/datasets/zillow/zecon', '2026-10-12T00:00:00Z', None),
+        ('url', 'https://www.kaggle.com/models/google/gemma', '2026-06-20T00:00:00Z', None),
+        ('url', 'https://www.kaggle.com/datasets/zillow/zecon/discussion/123', None, None),
+    ],
+    'feed.rss': [
+        ('url', 'https://arxiv.org/abs/2610.01234', '2026-10-05T18:30:00Z',
+         'Scaling Laws for Sparse Mixture-of-Experts'),
+        ('url', 'https://arxiv.org/abs/2610.04321', None, 'Retrieval Augmented Generation Revisited'),
+    ],
+    'feed.atom': [
+        ('url', 'https://towardsdatascience.com/a-practical-guide-to-lora-fine-tuning-3f2a1b',
+         '2026-09-30T06:00:00Z', 'A Practical Guide to LoRA Fine-Tuning'),
+        ('url', 'https://towardsdatascience.com/gradient-boosting-from-scratch-9c8d7e',
+         '2026-07-04T12:00:00Z', 'Gradient Boosting from Scratch'),
+    ],
+}
+
+# discover() over the index and both feeds, in seed order (newest first)
+DISCOVERED = [
+    ('https://kaggle.com/datasets/zillow/zecon', '2026-10-12T00:00:00Z'),
+    ('https://arxiv.org/abs/2610.01234', '2026-10-05T18:30:00Z'),
+    ('https://towardsdatascience.com/a-practical-guide-to-lora-fine-tuning-3f2a1b', '2026-09-30T06:00:00Z'),
+    ('https://huggingface.co/models/google-bert/bert-base-uncased', '2026-09-15T08:00:00Z'),
+    ('https://towardsdatascience.com/gradient-boosting-from-scratch-9c8d7e', '2026-07-04T12:00:00Z'),
+    ('https://kaggle.com/models/google/gemma', '2026-06-20T00:00:00Z'),
+    ('https://huggingface.co/datasets/openai/gsm8k', '2026-05-01T00:00:00Z'),
+    ('https://arxiv.org/abs/2610.04321', None),
+    ('https://huggingface.co/papers/2310.06825', None),
+]
+
+# -------------------- CHECKS --------------------
+
+def parsed_items(name):
+    with open_source(fixture(name)) as stream:
+        return [(kind, item) if kind == 'sitemap' else (kind, *item)
+                for kind, item in parse_source(stream, file_url(name))]
+
+def check(label, actual, expected):
+    if actual == expected:
+        print(f"✓ {label}")
+        return True
+    print(f"❌ {label}")
+    print(f"   expected: {expected}")
+    print(f"   got:      {actual}")
+    return False
+
+def main():
+    print("=" * 70)
+    print("  DISCOVERY FIXTURE CHECK")
+    print("=" * 70)
+
+    results = [check(f"parse_source {name}", parsed_items(name), expected)
+               for name, expected in PARSED.items()]
+
+    sources = [fixture('sitemap-index.xml'), fixture('feed.rss'), fixture('feed.atom')]
+    errors = []
+    entries = discover(sources, errors=errors)
+    rows = seed_rows(entries)
+    results.append(check("discover follows the index and keeps accepted URLs, newest first",
+                         [(url, lastmod) for url, _, _, lastmod, _ in rows], DISCOVERED))
+    results.append(check("seeds are fetched as discovered",
+                         [rows[0][4], rows[3][4]],
+                         ['https://www.kaggle.com/datasets/zillow/zecon',
+                          'https://HuggingFace.co/models/google-bert/bert-base-uncased/?utm_source=sitemap']))
+    results.append(check("feed titles become anchor text",
+                         rows[1][2], 'Scaling Laws for Sparse Mixture-of-Experts'))
+    results.append(check("an unreadable sitemap is reported, not fatal",
+                         [source for source, _ in errors], [file_url('missing-sitemap.xml')]))
+    results.append(check("site filter",
+                         sorted(discover(sources, site='kaggle')),
+                         ['https://kaggle.com/datasets/zillow/zecon', 'https://kaggle.com/models/google/gemma']))
+    results.append(check("max_entries", len(discover(sources, max_entries=3)), 3))
+
+    print("=" * 70)
+    failed = results.count(False)
+    print(f"{len(results) - failed}/{len(results)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Distributed Crawl Check
+Run one distributed.py worker through crawl_engine.crawl_site against a
+local replay server (politeness.REPLAY_ORIGIN) and check how leases end:
+a page that fails once is requeued and fetched again on the next claim
+by the same worker, and a page whose lease expired and was completed by
+another worker counts once toward the shared budget. Also checks that a
+link is fetched as it was written but stored by its canonical URL.
+Needs no network; all state goes to a temporary directory.
+
+Usage:
+    python check_distributed.py
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+PORT = free_port()
+WORKDIR = tempfile.mkdtemp(prefix='check_distributed_')
+
+# Read by politeness.py, page_store.py and telemetry.py at import time
+os.environ.update(REPLAY_ORIGIN=f"http://127.0.0.1:{PORT}", HOST_MAX_RATE='0', TELEMETRY='0',
+                  PAGE_STORE_PATH=os.path.join(WORKDIR, 'pages.db'))
+
+from crawl_engine import crawl_site
+from distributed import SharedFrontierStore, run_worker
+from url_rules import site_filter
+
+TARGET = 'ArXiv - Check'
+START_URL = 'https://arxiv.org/list/cs.LG/new'
+FLAKY = 'https://arxiv.org/abs/2610.00001'
+STEADY = 'https://arxiv.org/abs/2610.00002'
+# Linked with 'www.', which canonicalize_url drops
+AS_LINKED = 'https://www.arxiv.org/abs/2610.00003'
+CANONICAL = 'https://arxiv.org/abs/2610.00003'
+
+# -------------------- REPLAY SERVER --------------------
+
+requests = Counter()
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = f"https://{self.path.lstrip('/')}"
+        requests[url] += 1
+        if url == FLAKY and requests[url] == 1:
+            status, body = 503, '<html><body>Try again</body></html>'
+        elif url == START_URL:
+            status, body = 200, (f'<html><head><title>New</title></head><body>'
+                                 f'<a href="{FLAKY}">Flaky paper</a> <a href="{STEADY}">Steady paper</a>'
+                                 f' <a href="{AS_LINKED}">Linked paper</a></body></html>')
+        elif url in (FLAKY, STEADY, AS_LINKED):
+            status, body = 200, f'<html><head><title>{url}</title></head><body>Abstract</body></html>'
+        else:
+            status, body = 404, '<html><body>Not found</body></html>'
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), _ReplayHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# -------------------- CHECKS --------------------
+
+def check(label, ok, detail=''):
+    print(f"{'✓' if ok else '❌'} {label}" + (f"  ({detail})" if detail and not ok else ''))
+    return ok
+
+def check_worker_crawl():
+    """A URL that fails once is fetched again on its next claim; links are fetched as written"""
+    # Short leases, so a URL stuck in a lease runs out of attempts instead of hanging the check
+    store = SharedFrontierStore('check', path=os.path.join(WORKDIR, 'shared.db'), lease_seconds=1)
+    stored = []
+    visited_links = set()
+
+    def crawl_target(target, frontier):
+        _, start_url, max_depth, check_function, max_pages = target
+        return crawl_site(start_url, max_depth, check_function, None, visited_links, max_pages,
+                          assign_tags=lambda content, url: [],
+                          store_resource=lambda url, *args: stored.append(url),
+                          store_link=lambda source, destination: None,
+                          frontier=frontier)
+
+    run_worker(store, [(TARGET, START_URL, 2, site_filter('arxiv'), 10)], crawl_target,
+               visited_links, idle_seconds=0.05, log=False)
+    state, attempts = store.conn.execute(
+        "SELECT state, attempts FROM dist_frontier WHERE url = ?", (FLAKY,)
+    ).fetchone()
+    store.close()
+
+    return [
+        check("failed URL fetched again after it is requeued", requests[FLAKY] == 2,
+              f"{requests[FLAKY]} requests"),
+        check("failed URL stored on the retry", FLAKY in stored and STEADY in stored, repr(stored)),
+        check("failed URL ends done after two leases", (state, attempts) == ('done', 2),
+              f"{state}, {attempts} attempts"),
+        check("link fetched as written, stored by its canonical URL",
+              requests[AS_LINKED] == 1 and requests[CANONICAL] == 0 and CANONICAL in stored,
+              f"{requests[AS_LINKED]} / {requests[CANONICAL]} requests, stored {stored!r}"),
+    ]
+
+def check_expired_lease():
+    """Completing a URL after its lease moved to another worker does not count it"""
+    path = os.path.join(WORKDIR, 'expired.db')
+    first = SharedFrontierStore('first', path=path)
+    second = SharedFrontierStore('second', path=path)
+    first.add_target(TARGET, STEADY, 1, 10)
+    [(url, _, _)] = first.claim(TARGET, 1)
+    # The lease expires and the URL goes to the second worker
+    first.conn.execute("UPDATE dist_frontier SET lease_expires = 0 WHERE url = ?", (url,))
+    first.reclaim_expired()
+    second.conn.execute("UPDATE dist_frontier SET state = 'leased', owner = 'second' WHERE url = ?", (url,))
+    second.complete(TARGET, [url])
+    first.complete(TARGET, [url])
+    pages = {worker: count for worker, count in first.conn.execute("SELECT worker_id, pages FROM dist_workers")}
+    crawled = first.pages_crawled(TARGET)
+    first.close()
+    second.close()
+
+    return [
+        check("late completion by the first worker is not counted", crawled == 1, f"pages_crawled {crawled}"),
+        check("pages credited to the worker holding the lease",
+              pages == {'first': 0, 'second': 1}, repr(pages)),
+    ]
+
+def main():
+    print("=" * 70)
+    print("  DISTRIBUTED CRAWL CHECK")
+    print("=" * 70)
+
+    server = start_server()
+    checks = check_worker_crawl() + check_expired_lease()
+    server.shutdown()
+
+    print("=" * 70)
+    failed = checks.count(False)
+    print(f"{len(checks) - failed}/{len(checks)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
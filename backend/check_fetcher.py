@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Fetcher Fixture Check
+Run fetcher.fetch_pages against a local fixture server and check how
+each URL is routed: static hosts over HTTP, JS hosts and static network
+errors in the driver, HTTP errors (StaticFetchError) final. 127.0.0.1 is
+configured as a static host and localhost as a JS host, both served by
+the same server. The driver is a stand-in that loads the page over HTTP
+and records which URLs reached it, so no Chrome is needed.
+
+Usage:
+    python check_fetcher.py
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+# Read by fetcher.py and politeness.py at import time
+os.environ.update(STATIC_HOSTS='127.0.0.1', JS_REQUIRED_HOSTS='localhost', STATIC_TIMEOUT='1',
+                  REPLAY_ORIGIN='')
+
+from fetcher import PageData, PageNotModified, StaticFetchError, fetch_pages, parse_html
+
+SLOW_SECONDS = 2
+
+ARTICLE = b"""<html><head><title>Fixture Article</title>
+<meta name="description" content="A page served over plain HTTP"></head>
+<body><p>Gradient descent, step by step.</p>
+<a href="/next">Next article</a> <a href="https://arxiv.org/abs/2610.01234">Paper</a>
+<script>ignored()</script></body></html>"""
+
+APP = b"""<html><head><title>Fixture App</title></head>
+<body><div id="root">Rendered in the browser</div></body></html>"""
+
+# -------------------- FIXTURE SERVER --------------------
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    def _send(self, status, content_type=None, body=b'', headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # /slow after the client timed out
+            pass
+
+    def do_GET(self):
+        if self.path == '/article':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._send(304)
+            else:
+                self._send(200, 'text/html; charset=utf-8', ARTICLE, {'ETag': '"v1"'})
+        elif self.path == '/app':
+            self._send(200, 'text/html', APP)
+        elif self.path == '/slow':
+            time.sleep(SLOW_SECONDS)
+            self._send(200, 'text/html', ARTICLE)
+        elif self.path == '/data.json':
+            self._send(200, 'application/json', b'{}')
+        else:
+            self._send(404, 'text/html', b'<html><body>Not found</body></html>')
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    """Serve the fixtures on a free local port; returns (server, port)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+def closed_port():
+    """A local port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class RecordingDriver:
+    """Just enough of a WebDriver for fetch_with_driver, loading pages over HTTP"""
+
+    def __init__(self):
+        self.visited = []
+        self.page_source = ''
+        self.current_url = None
+
+    def get(self, url):
+        self.visited.append(url)
+        with urlopen(url, timeout=SLOW_SECONDS * 2) as response:
+            self.page_source = response.read().decode('utf-8')
+        self.current_url = url
+
+    def execute_script(self, script, *args):
+        if 'readyState' in script:
+            return 'complete'
+        page = parse_html(self.page_source, self.current_url)
+        return [page.title, page.description, page.content, page.links, page.anchors]
+
+# -------------------- CHECKS --------------------
+
+def check(label, ok, detail=''):
+    print(f"{'✓' if ok else '❌'} {label}" + (f"  ({detail})" if detail and not ok else ''))
+    return ok
+
+def main():
+    print("=" * 70)
+    print("  FETCHER FIXTURE CHECK")
+    print("=" * 70)
+
+    server, port = start_server()
+    static = f"http://127.0.0.1:{port}"
+    urls = {
+        'article': f"{static}/article",
+        'app': f"http://localhost:{port}/app",
+        'missing': f"{static}/missing",
+        'json': f"{static}/data.json",
+        'slow': f"{static}/slow",
+        'refused': f"http://127.0.0.1:{closed_port()}/article",
+    }
+    driver = RecordingDriver()
+    results = dict(zip(urls, fetch_pages(list(urls.values()), driver, render_wait=0, throttle=False)))
+    reached_driver = {name for name, url in urls.items() if url in driver.visited}
+
+    article, app, slow = results['article'], results['app'], results['slow']
+    checks = [
+        check("static host fetched over HTTP",
+              isinstance(article, PageData) and article.title == 'Fixture Article'
+              and 'article' not in reached_driver, repr(article)),
+        check("HTTP fetch keeps validators, resolves links and drops scripts",
+              isinstance(article, PageData) and article.etag == '"v1"'
+              and article.links == [f"{static}/next", 'https://arxiv.org/abs/2610.01234']
+              and article.anchors.get(f"{static}/next") == 'Next article'
+              and 'ignored' not in article.content, repr(article)),
+        check("JS host fetched in the driver",
+              isinstance(app, PageData) and app.content == 'Rendered in the browser'
+              and 'app' in reached_driver, repr(app)),
+        check("HTTP 404 is a final StaticFetchError",
+              isinstance(results['missing'], StaticFetchError) and 'missing' not in reached_driver,
+              repr(results['missing'])),
+        check("non-HTML response is a final StaticFetchError",
+              isinstance(results['json'], StaticFetchError) and 'json' not in reached_driver,
+              repr(results['json'])),
+        check("static timeout falls back to the driver",
+              isinstance(slow, PageData) and slow.title == 'Fixture Article' and 'slow' in reached_driver,
+              repr(slow)),
+        check("connection error falls back to the driver",
+              'refused' in reached_driver and isinstance(results['refused'], Exception),
+              repr(results['refused'])),
+    ]
+
+    driver = RecordingDriver()
+    [unchanged] = fetch_pages([urls['article']], driver, throttle=False,
+                              validators={urls['article']: ('"v1"', None)})
+    checks.append(check("conditional request gives a final PageNotModified",
+                        isinstance(unchanged, PageNotModified) and not driver.visited, repr(unchanged)))
+
+    no_driver = fetch_pages([urls['app'], urls['refused']], None, throttle=False)
+    checks.append(check("without a driver, browser URLs fail and network errors are kept",
+                        isinstance(no_driver[0], RuntimeError)
+                        and isinstance(no_driver[1], Exception) and not isinstance(no_driver[1], RuntimeError),
+                        repr(no_driver)))
+    server.shutdown()
+
+    print("=" * 70)
+    failed = checks.count(False)
+    print(f"{len(checks) - failed}/{len(checks)} checks passed")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Text Column Compression
+Transparent compression for the large text columns of the resources table
+(description, summary).
+
+Values are stored either as plain TEXT (uncompressed / legacy rows) or as a
+BLOB with a 4-byte header:
+
+    b'MX' | codec id (1 = zlib, 2 = zstd) | dictionary id (0 = none)
+
+The dictionary is trained from stored text and kept in the
+compression_dicts table, so every value shares it. All reads and writes of
+these columns should go through encode_text() / decode_text().
+
+Usage:
+    python compression.py train        # train a shared dictionary
+    python compression.py compress     # re-encode existing rows
+    python compression.py decompress   # restore plain TEXT
+"""
+
+import sqlite3
+import threading
+import zlib
+import os
+import sys
+from collections import Counter
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DATABASE_PATH))
+
+# 'none' keeps the current behaviour; 'zlib' or 'zstd' enable compression
+TEXT_COMPRESSION = os.getenv('TEXT_COMPRESSION', 'none').lower()
+
+# Values shorter than this are stored as plain text (header + frame overhead
+# would make them larger)
+MIN_COMPRESS_BYTES = int(os.getenv('TEXT_COMPRESSION_MIN_BYTES', '96'))
+
+COMPRESSED_COLUMNS = ('description', 'summary')
+
+MAGIC = b'MX'
+CODEC_IDS = {'zlib': 1, 'zstd': 2}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+HEADER_SIZE = 4
+
+DICT_SIZE = 32 * 1024  # zlib windows are 32KB, so larger dicts are wasted
+
+_dictionaries = {}
+_active_ids = {}
+_codec_objects = {}
+
+# -------------------- SCHEMA --------------------
+
+def ensure_dictionary_table(conn):
+    """Create the dictionary table if it does not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec TEXT NOT NULL,
+            dict BLOB NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+# -------------------- DICTIONARIES --------------------
+
+def load_dictionary(conn, dict_id):
+    """Return the dictionary bytes for dict_id (cached per process)"""
+    if dict_id == 0:
+        return None
+    if dict_id not in _dictionaries:
+        row = conn.execute(
+            "SELECT dict FROM compression_dicts WHERE id = ?", (dict_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown compression dictionary id {dict_id}")
+        _dictionaries[dict_id] = bytes(row[0])
+    return _dictionaries[dict_id]
+
+def active_dictionary_id(conn, codec):
+    """Return the newest dictionary id for a codec, or 0 if none was trained"""
+    if codec not in _active_ids:
+        try:
+            row = conn.execute(
+                "SELECT MAX(id) FROM compression_dicts WHERE codec = ?", (codec,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return 0
+        _active_ids[codec] = row[0] or 0
+    return _active_ids[codec]
+
+def _sample_texts(conn, limit=5000):
+    """Collect plain-text samples of the compressed columns"""
+    samples = []
+    for column in COMPRESSED_COLUMNS:
+        cursor = conn.execute(
+            f"SELECT {column} FROM resources WHERE {column} IS NOT NULL "
+            f"ORDER BY RANDOM() LIMIT ?", (limit,)
+        )
+        for (value,) in cursor:
+            text = decode_text(value, conn)
+            if text:
+                samples.append(text.encode('utf-8'))
+    return samples
+
+def _build_zlib_dictionary(samples, size=DICT_SIZE):
+    """Build a zlib preset dictionary from the most common words.
+
+    zlib favours matches close to the end of the dictionary, so the most
+    frequent words are placed last.
+    """
+    counts = Counter()
+    for sample in samples:
+        counts.update(sample.split())
+
+    words = []
+    total = 0
+    for word, _ in counts.most_common():
+        if total + len(word) + 1 > size:
+            break
+        words.append(word)
+        total += len(word) + 1
+
+    return b' '.join(reversed(words))
+
+def train_dictionary(conn, codec=None, size=DICT_SIZE):
+    """Train a shared dictionary from stored text and return its id"""
+    codec = codec or TEXT_COMPRESSION
+    if codec not in CODEC_IDS:
+        raise ValueError(f"Cannot train a dictionary for codec '{codec}'")
+
+    ensure_dictionary_table(conn)
+    samples = _sample_texts(conn)
+    if not samples:
+        print("No text found to train a dictionary from")
+        return 0
+
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        dict_data = zstandard.train_dictionary(size, samples).as_bytes()
+    else:
+        dict_data = _build_zlib_dictionary(samples, size)
+
+    cursor = conn.execute(
+        "INSERT INTO compression_dicts (codec, dict) VALUES (?, ?)",
+        (codec, dict_data)
+    )
+    conn.commit()
+    _active_ids[codec] = cursor.lastrowid
+    print(f"✓ Trained {codec} dictionary #{cursor.lastrowid} "
+          f"({len(dict_data)} bytes from {len(samples)} samples)")
+    return cursor.lastrowid
+
+# -------------------- ENCODE / DECODE --------------------
+
+def _zstd_objects(conn, dict_id):
+    """Return a cached (compressor, decompressor) pair for a zstd dictionary.
+
+    zstandard objects are not thread-safe, so each thread gets its own pair.
+    """
+    key = ('zstd', dict_id, threading.get_ident())
+    if key not in _codec_objects:
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        dict_data = load_dictionary(conn, dict_id)
+        zdict = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+        _codec_objects[key] = (
+            zstandard.ZstdCompressor(level=3, dict_data=zdict),
+            zstandard.ZstdDecompressor(dict_data=zdict),
+        )
+    return _codec_objects[key]
+
+def compress_bytes(data, codec, dict_id, conn):
+    """Compress raw bytes and prepend the value header"""
+    header = MAGIC + bytes((CODEC_IDS[codec], dict_id))
+    if codec == 'zstd':
+        compressor, _ = _zstd_objects(conn, dict_id)
+        return header + compressor.compress(data)
+
+    dict_data = load_dictionary(conn, dict_id)
+    if dict_data:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dict_data)
+    else:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    return header + compressor.compress(data) + compressor.flush()
+
+def encode_text(text, conn, codec=None):
+    """Encode a text value for storage, compressing it when enabled.
+
+    Returns the original string when compression is off, the text is short,
+    or compression does not make it smaller.
+    """
+    codec = codec or TEXT_COMPRESSION
+    if text is None or codec not in CODEC_IDS:
+        return text
+
+    data = text.encode('utf-8')
+    if len(data) < MIN_COMPRESS_BYTES:
+        return text
+
+    dict_id = active_dictionary_id(conn, codec)
+    if dict_id > 255:
+        # Header has one byte for the dictionary id
+        dict_id = 0
+
+    encoded = compress_bytes(data, codec, dict_id, conn)
+    return encoded if len(encoded) < len(data) else text
+
+def decode_text(value, conn):
+    """Decode a stored column value back to a string"""
+    if value is None or isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    if len(value) < HEADER_SIZE or value[:2] != MAGIC:
+        return value.decode('utf-8', errors='replace')
+
+    codec = CODEC_NAMES.get(value[2])
+    dict_id = value[3]
+    payload = value[HEADER_SIZE:]
+
+    if codec == 'zstd':
+        _, decompressor = _zstd_objects(conn, dict_id)
+        return decompressor.decompress(payload).decode('utf-8')
+
+    if codec == 'zlib':
+        dict_data = load_dictionary(conn, dict_id)
+        if dict_data:
+            decompressor = zlib.decompressobj(-15, zdict=dict_data)
+        else:
+            decompressor = zlib.decompressobj(-15)
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+
+    raise ValueError(f"Unknown compression codec id {value[2]}")
+
+def decode_row(row, conn, indexes):
+    """Return a copy of a result row with the given column positions decoded"""
+    row = list(row)
+    for i in indexes:
+        row[i] = decode_text(row[i], conn)
+    return tuple(row)
+
+# -------------------- BULK RE-ENCODE --------------------
+
+def reencode_resources(conn, codec, batch_size=500):
+    """Re-encode every compressed column with the given codec ('none' restores text)"""
+    ensure_dictionary_table(conn)
+    columns = ", ".join(COMPRESSED_COLUMNS)
+    rows = conn.execute(f"SELECT id, {columns} FROM resources").fetchall()
+
+    updates = []
+    changed = 0
+    for row in rows:
+        resource_id, values = row[0], row[1:]
+        new_values = []
+        for value in values:
+            text = decode_text(value, conn)
+            new_values.append(encode_text(text, conn, codec))
+        if list(values) != new_values:
+            updates.append((*new_values, resource_id))
+            changed += 1
+
+        if len(updates) >= batch_size:
+            _apply_updates(conn, updates)
+            updates = []
+
+    if updates:
+        _apply_updates(conn, updates)
+    conn.commit()
+    return changed
+
+def _apply_updates(conn, updates):
+    assignments = ", ".join(f"{column} = ?" for column in COMPRESSED_COLUMNS)
+    conn.executemany(f"UPDATE resources SET {assignments} WHERE id = ?", updates)
+
+# -------------------- CLI --------------------
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('train', 'compress', 'decompress'):
+        print(__doc__)
+        return
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        if command == 'train':
+            train_dictionary(conn)
+        elif command == 'compress':
+            if TEXT_COMPRESSION not in CODEC_IDS:
+                print("Set TEXT_COMPRESSION=zlib or TEXT_COMPRESSION=zstd first")
+                return
+            changed = reencode_resources(conn, TEXT_COMPRESSION)
+            print(f"✓ Compressed {changed} resources with {TEXT_COMPRESSION}")
+        else:
+            changed = reencode_resources(conn, 'none')
+            print(f"✓ Restored {changed} resources to plain text")
+
+        if command != 'train':
+            print("Run VACUUM (sqlite3 database.db 'VACUUM') to reclaim freed pages")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
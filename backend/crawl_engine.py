@@ -0,0 +1,120 @@
+"""
+Crawl Engine
+Crawl loop shared by crawler.py, mega_crawler.py, topic_crawler.py and
+targeted_crawler.py.
+
+URLs are taken off the frontier (best-first by default, see frontier.py
+and crawl_priority.py) in batches so static pages can be
+fetched concurrently (see fetcher.py); pages that need a browser still go
+through the Selenium driver one at a time. Links are canonicalized
+(urlnorm.py) before they are checked, queued or stored, but fetched as
+they were discovered (frontier.fetch_url), and page bodies are kept in
+the page store (page_store.py) for the indexer.
+"""
+
+import time
+import os
+from dotenv import load_dotenv
+
+from fetcher import fetch_pages
+from frontier import MemoryFrontier, make_queue
+from link_graph import page_edges
+from page_store import get_page_store
+from telemetry import get_metrics
+from urlnorm import canonical_anchors, canonical_links
+
+load_dotenv()
+
+CRAWL_BATCH_SIZE = int(os.getenv('CRAWL_BATCH_SIZE', '16'))
+
+def crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages=None,
+               assign_tags=None, store_resource=None, store_link=None,
+               render_wait=1, content_chars=None, log_every=None, frontier=None, scorer=None):
+    """Crawl one target and return the number of pages stored.
+
+    log_every=None keeps the crawl silent; log_every=1 prints every page
+    with its depth. Errors are printed whenever logging is enabled.
+    Pass a PersistentFrontier to make the crawl resumable; max_pages then
+    also counts pages stored by earlier runs. scorer replaces the default
+    crawl_priority score of a new frontier.
+    """
+    if frontier is None:
+        frontier = MemoryFrontier(start_url, visited_links, make_queue(scorer))
+    metrics = get_metrics()
+    page_store = get_page_store()
+    pages_crawled = 0
+
+    while frontier:
+        if max_pages and frontier.pages_crawled >= max_pages:
+            break
+
+        # Take the next batch of crawlable URLs, never more than the budget left
+        batch_limit = CRAWL_BATCH_SIZE
+        if max_pages:
+            batch_limit = min(batch_limit, max_pages - frontier.pages_crawled)
+
+        batch = []
+        while frontier and len(batch) < batch_limit:
+            url, depth = frontier.pop()
+
+            if depth > max_depth or frontier.is_visited(url):
+                continue
+
+            # The start URL is often a listing page (arxiv /list/, a search)
+            # that no rule accepts; fetch it anyway so its links are followed
+            # (it is not stored, see below)
+            if depth > 1 and check_function(url) is None:
+                continue
+
+            frontier.mark_visited(url)
+            batch.append((url, depth))
+
+        if not batch:
+            continue
+
+        metrics.set_queue_depth(len(frontier))
+        results = fetch_pages([frontier.fetch_url(url) for url, _ in batch], driver, render_wait)
+
+        for (url, depth), page in zip(batch, results):
+            if isinstance(page, Exception):
+                frontier.mark_failed(url, page)
+                metrics.page_failed(url, page)
+                if log_every:
+                    print(f"  Error: {url[:60]}... - {str(page)[:40]}")
+                continue
+
+            metrics.page_done(url, page.timings)
+            start = time.monotonic()
+            # A listing-page seed is only fetched for its links, never stored,
+            # and does not count toward max_pages
+            stored = depth > 1 or check_function(url) is not None
+            anchors = canonical_anchors(page.anchors)
+            spellings = {}
+            links = canonical_links(page.links, spellings)
+
+            if stored:
+                content = page.content[:content_chars] if content_chars else page.content
+                tags = assign_tags(content, url)
+
+                store_resource(url, page.title, page.description, tags)
+                if page_store is not None:
+                    page_store.put(url, page.content, page.html)
+                pages_crawled += 1
+
+                if log_every == 1:
+                    print(f"  [{pages_crawled}] [Depth {depth}] {url[:80]}")
+                elif log_every and pages_crawled % log_every == 0:
+                    print(f"  [{pages_crawled}] {url[:80]}...")
+
+                for href in page_edges(url, links, visited_links):
+                    store_link(url, href)
+            # Only once its rows are buffered, so a checkpoint never commits
+            # the page as fetched ahead of them
+            frontier.mark_fetched(url, stored)
+            for href in links:
+                if href not in visited_links and check_function(href):
+                    frontier.push(href, depth + 1, anchors.get(href, ''), fetch_url=spellings[href])
+
+            metrics.observe('store', time.monotonic() - start)
+
+    return pages_crawled
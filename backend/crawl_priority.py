@@ -0,0 +1,144 @@
+"""
+Crawl Priority
+Scores for the best-first crawl frontier (frontier.PriorityQueue).
+
+With a FIFO queue a target's max_pages budget goes to whatever the crawl
+reaches first breadth-wise, which is mostly navigation and listing pages.
+The best-first frontier pops the highest-scoring URL instead, where the
+score adds up:
+
+    relevance   ML terms (tagger.category_keywords, plus topic terms for
+                topic crawls) found in the URL path and the anchor text
+    inlinks     how many crawled pages have linked to the URL so far
+    depth       a penalty per level below the start page
+    host        a penalty that grows with the pages already taken from
+                the URL's host, so one host cannot use up the budget
+    recency     for URLs seeded from a sitemap or feed (discovery.py),
+                a bonus that halves every PRIORITY_RECENCY_DAYS of the
+                entry's lastmod age; undated URLs get none
+
+Any callable that takes a Candidate and returns a number (higher is
+crawled sooner) can be passed as the scorer instead of RelevanceScorer.
+"""
+
+import math
+import re
+import time
+import os
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+from tagger import category_keywords
+
+load_dotenv()
+
+PRIORITY_RELEVANCE_WEIGHT = float(os.getenv('PRIORITY_RELEVANCE_WEIGHT', '1.0'))
+PRIORITY_TOPIC_WEIGHT = float(os.getenv('PRIORITY_TOPIC_WEIGHT', '2.0'))
+PRIORITY_INLINK_WEIGHT = float(os.getenv('PRIORITY_INLINK_WEIGHT', '0.5'))
+PRIORITY_DEPTH_WEIGHT = float(os.getenv('PRIORITY_DEPTH_WEIGHT', '1.0'))
+PRIORITY_HOST_WEIGHT = float(os.getenv('PRIORITY_HOST_WEIGHT', '0.5'))
+PRIORITY_RECENCY_WEIGHT = float(os.getenv('PRIORITY_RECENCY_WEIGHT', '2.0'))
+PRIORITY_RECENCY_DAYS = float(os.getenv('PRIORITY_RECENCY_DAYS', '30'))    # half-life
+
+# Distinct terms counted per URL, so a keyword-stuffed slug cannot
+# outweigh everything else
+RELEVANCE_CAP = 5
+
+# What the frontier knows about a queued URL when it scores it; lastmod
+# is discovery.py's ISO-8601 UTC string, or None for URLs found as links
+Candidate = namedtuple('Candidate', ['url', 'anchor', 'depth', 'inlinks', 'host_pages', 'lastmod'],
+                       defaults=(None,))
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+TOPIC_STOP_WORDS = {'a', 'an', 'and', 'for', 'in', 'of', 'on', 'the', 'to', 'with'}
+
+# -------------------- TERMS --------------------
+
+def normalize(text):
+    """Lowercase text with every run of non-alphanumerics as one space"""
+    return _NON_WORD.sub(' ', text.lower()).strip()
+
+def topic_terms(*topics):
+    """Terms for topic names such as 'RAG (Retrieval Augmented Generation)'"""
+    terms = set()
+    for topic in topics:
+        words = normalize(topic).split()
+        terms.add(' '.join(words))
+        terms.update(w for w in words if w not in TOPIC_STOP_WORDS)
+    terms.discard('')
+    return terms
+
+def _terms_pattern(terms):
+    terms = sorted({normalize(t) for t in terms} - {''}, key=len, reverse=True)
+    if not terms:
+        return None
+    # Lookahead so overlapping terms ('few shot learning', 'learning') all count
+    return re.compile(r'(?=\b(' + '|'.join(re.escape(t) for t in terms) + r')\b)')
+
+@lru_cache(maxsize=65536)
+def _timestamp(lastmod):
+    try:
+        return datetime.fromisoformat(lastmod.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+# -------------------- SCORER --------------------
+
+class RelevanceScorer:
+    """Default frontier score: relevance + inlinks + recency - depth - host share"""
+
+    def __init__(self, terms=None, topic=(), relevance_weight=PRIORITY_RELEVANCE_WEIGHT,
+                 topic_weight=PRIORITY_TOPIC_WEIGHT, inlink_weight=PRIORITY_INLINK_WEIGHT,
+                 depth_weight=PRIORITY_DEPTH_WEIGHT, host_weight=PRIORITY_HOST_WEIGHT,
+                 recency_weight=PRIORITY_RECENCY_WEIGHT, recency_days=PRIORITY_RECENCY_DAYS):
+        if terms is None:
+            terms = {w for words in category_keywords.values() for w in words}
+        self.pattern = _terms_pattern(terms)
+        self.topic_pattern = _terms_pattern(topic)
+        self.relevance_weight = relevance_weight
+        self.topic_weight = topic_weight
+        self.inlink_weight = inlink_weight
+        self.depth_weight = depth_weight
+        self.host_weight = host_weight
+        self.recency_weight = recency_weight
+        self.recency_days = recency_days
+
+    def relevance(self, url, anchor=''):
+        """Weighted count of distinct terms in the URL path, query and anchor text"""
+        parts = urlsplit(url)
+        text = normalize(f"{parts.path} {parts.query} {anchor}")
+        score = 0.0
+        for pattern, weight in ((self.pattern, self.relevance_weight),
+                                (self.topic_pattern, self.topic_weight)):
+            if pattern is not None:
+                hits = len(set(pattern.findall(text)))
+                score += weight * min(hits, RELEVANCE_CAP)
+        return score
+
+    def recency(self, lastmod, now=None):
+        """Between 1 (modified now) and 0 (undated or long ago)"""
+        timestamp = _timestamp(lastmod) if lastmod else None
+        if timestamp is None:
+            return 0.0
+        age_days = max((now or time.time()) - timestamp, 0) / 86400
+        return 0.5 ** (age_days / self.recency_days)
+
+    def __call__(self, candidate):
+        return (self.relevance(candidate.url, candidate.anchor)
+                + self.inlink_weight * math.log(max(candidate.inlinks, 1))
+                + self.recency_weight * self.recency(candidate.lastmod)
+                - self.depth_weight * (candidate.depth - 1)
+                - self.host_weight * math.log1p(candidate.host_pages))
+
+_default_scorer = None
+
+def default_scorer():
+    """Shared RelevanceScorer over the tagger's category keywords"""
+    global _default_scorer
+    if _default_scorer is None:
+        _default_scorer = RelevanceScorer()
+    return _default_scorer
@@ -0,0 +1,190 @@
+"""
+Crawl Writer
+Buffered database writer shared by the crawler scripts.
+
+store_resource() / store_link() used to open a connection and commit for
+every row. The writer keeps one connection, buffers resources and links
+in memory (deduplicating links inside the buffer) and writes them with
+executemany in a single transaction every WRITER_BATCH_ROWS rows or
+WRITER_FLUSH_SECONDS seconds. Buffers are also flushed at exit and on
+SIGTERM / SIGINT. URLs are canonicalized before they are buffered.
+
+Rows are never thrown away with their batch. If the database cannot be
+written (locked, full, unreadable) the rows stay buffered, flush() raises
+and the next flush retries. If a single row is bad the batch is written
+row by row and only that row is dropped, with a message.
+"""
+
+import sqlite3
+import atexit
+import signal
+import threading
+import time
+import os
+from dotenv import load_dotenv
+
+from compression import encode_text
+from page_store import flush_page_store
+from urlnorm import canonicalize_url
+
+load_dotenv()
+
+WRITER_BATCH_ROWS = int(os.getenv('WRITER_BATCH_ROWS', '500'))
+WRITER_FLUSH_SECONDS = float(os.getenv('WRITER_FLUSH_SECONDS', '5'))
+
+_writers = {}
+
+class CrawlWriter:
+    """Buffers resource and link rows for one database"""
+
+    def __init__(self, database_path, batch_rows=WRITER_BATCH_ROWS, flush_seconds=WRITER_FLUSH_SECONDS):
+        self.database_path = database_path
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.conn = None
+        self.resources = {}
+        self.links = {}
+        self.last_flush = time.time()
+        self.retry_at = 0.0
+        self.lock = threading.Lock()
+        self.rows_written = 0
+        self.write_seconds = 0.0
+
+    def add_resource(self, url, title, description, tags):
+        url = canonicalize_url(url)
+        with self.lock:
+            # Same semantics as INSERT OR IGNORE: the first row for a URL wins
+            self.resources.setdefault(url, (url, title, description, tags))
+        self._maybe_flush()
+
+    def add_link(self, source_url, destination_url):
+        source_url = canonicalize_url(source_url)
+        destination_url = canonicalize_url(destination_url)
+        with self.lock:
+            self.links[(source_url, destination_url)] = None
+        self._maybe_flush()
+
+    def pending(self):
+        return len(self.resources) + len(self.links)
+
+    def _maybe_flush(self):
+        if time.time() < self.retry_at:
+            return
+        if (self.pending() >= self.batch_rows
+                or time.time() - self.last_flush >= self.flush_seconds):
+            try:
+                self.flush()
+            except sqlite3.OperationalError as e:
+                # Rows stay buffered; try again after another flush interval
+                self.retry_at = time.time() + self.flush_seconds
+                print(f"Error storing {self.pending()} buffered rows, will retry: {e}")
+
+    def _insert_resources(self, rows):
+        self.conn.executemany("""
+            INSERT OR IGNORE INTO resources (url, title, description, tags)
+            VALUES (?, ?, ?, ?)
+        """, [(url, title, encode_text(description, self.conn), tags)
+              for url, title, description, tags in rows])
+
+    def _insert_links(self, rows):
+        self.conn.executemany("""
+            INSERT OR IGNORE INTO links (source_url, destination_url)
+            VALUES (?, ?)
+        """, rows)
+
+    def _insert_one_by_one(self, resources, links):
+        """Write each row on its own, dropping (and reporting) the ones that fail"""
+        dropped = 0
+        for insert, rows in ((self._insert_resources, resources), (self._insert_links, links)):
+            for row in rows:
+                try:
+                    insert([row])
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error as e:
+                    dropped += 1
+                    print(f"Dropped row for {row[0][:80]}: {e}")
+        return dropped
+
+    def flush(self):
+        """Write all buffered rows in one transaction.
+
+        Raises sqlite3.OperationalError, with the rows still buffered, if
+        the database cannot be written.
+        """
+        with self.lock:
+            resources = list(self.resources.values())
+            links = list(self.links)
+            self.last_flush = time.time()
+
+            if not resources and not links:
+                return
+
+            start = time.perf_counter()
+            try:
+                if self.conn is None:
+                    self.conn = sqlite3.connect(self.database_path, timeout=30)
+                try:
+                    self._insert_resources(resources)
+                    self._insert_links(links)
+                    dropped = 0
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error:
+                    # A bad row fails the whole batch; find it and keep the rest
+                    self.conn.rollback()
+                    dropped = self._insert_one_by_one(resources, links)
+                self.conn.commit()
+            except sqlite3.OperationalError:
+                if self.conn is not None:
+                    self.conn.rollback()
+                raise
+
+            self.resources.clear()
+            self.links.clear()
+            self.retry_at = 0.0
+            self.rows_written += len(resources) + len(links) - dropped
+            self.write_seconds += time.perf_counter() - start
+
+    def close(self):
+        self.flush()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+# -------------------- SHARED INSTANCES --------------------
+
+def get_writer(database_path):
+    """Return the process-wide writer for a database, creating it on first use"""
+    if database_path not in _writers:
+        _writers[database_path] = CrawlWriter(database_path)
+        if len(_writers) == 1:
+            _install_exit_hooks()
+    return _writers[database_path]
+
+def flush_all():
+    """Flush every writer in this process, and the page store.
+
+    Raises sqlite3.OperationalError if a writer's rows could not be
+    written; they stay buffered for the next flush.
+    """
+    try:
+        for writer in list(_writers.values()):
+            writer.flush()
+    finally:
+        flush_page_store()
+
+def _install_exit_hooks():
+    atexit.register(flush_all)
+
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    # SIGTERM normally kills the process without running atexit handlers;
+    # turn it into SystemExit so finally blocks and the flush above run.
+    # SIGINT already raises KeyboardInterrupt, which unwinds the same way.
+    if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(128 + signum)
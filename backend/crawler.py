@@ -1,13 +1,15 @@
-import sqlite3
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from collections import deque
-import time
 import os
-import re
 from dotenv import load_dotenv
 
+from crawl_writer import get_writer
+from driver_supervisor import SupervisedDriver
+import crawl_engine
+from tagger import assign_tags
+from telemetry import get_metrics
+from url_rules import site_filter
+
 load_dotenv()
 
 # -------------------- DATABASE --------------------
@@ -17,212 +19,49 @@ DATABASE_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), DATABASE_PATH)
 )
 
-# -------------------- TAG KEYWORDS --------------------
-
-category_keywords = {
-    "dataset": ["dataset", "data collection", "data source", "training data", "benchmark"],
-    "model": ["model", "algorithm", "neural network", "training", "inference", "architecture"],
-    "article": ["article", "guide", "tutorial", "how-to", "introduction", "overview"],
-    "research paper": ["research paper", "study", "journal", "publication", "arxiv", "conference", "proceedings", "ieee"],
-    "documentation": ["documentation", "api", "reference", "docs"],
-    "code": ["code", "implementation", "github", "repository", "example"]
-}
-
-
 # -------------------- HELPERS --------------------
 
-def assign_tags(content, url=""):
-    """Determine tags based on content and URL"""
-    tags = []
-    content_lower = content.lower()
-    url_lower = url.lower()
-    
-    # Check URL patterns first for more accurate tagging
-    if 'kaggle.com/datasets' in url_lower:
-        tags.append('dataset')
-    elif 'kaggle.com/models' in url_lower:
-        tags.append('model')
-    elif 'arxiv.org' in url_lower or 'ieeexplore.ieee.org' in url_lower:
-        tags.append('research paper')
-    
-    # Then check content
-    for category, keywords in category_keywords.items():
-        if category not in tags:  # Avoid duplicates
-            if any(re.search(r'\b' + keyword + r'\b', content_lower) for keyword in keywords):
-                tags.append(category)
-    
-    return ", ".join(tags) if tags else "general"
-
 def store_resource(url, title, description, tags):
-    """Insert a new resource into the database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO resources (url, title, description, tags)
-            VALUES (?, ?, ?, ?)
-        """, (url, title, description, tags))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error storing resource: {e}")
-    finally:
-        conn.close()
+    """Queue a new resource for the database (written in batches)"""
+    get_writer(DATABASE_PATH).add_resource(url, title, description, tags)
 
 def store_link(source_url, destination_url):
-    """Insert a link between two pages"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO links (source_url, destination_url)
-            VALUES (?, ?)
-        """, (source_url, destination_url))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error storing link: {e}")
-    finally:
-        conn.close()
+    """Queue a link between two pages (written in batches)"""
+    get_writer(DATABASE_PATH).add_link(source_url, destination_url)
 
 # -------------------- SITE FILTERS --------------------
 
-def check_kaggle_page(url):
-    if any(symbol in url for symbol in ['#', '?', '%']):
-        return None
-    if url.endswith(('/discussions', '/code', '/suggestions', '/competitions')):
-        return None
-    if '/discussion' in url:
-        return None
-    if 'kaggle.com/datasets' in url:
-        return 'dataset'
-    elif 'kaggle.com/models' in url:
-        return 'model'
-    elif 'kaggle.com/learn' in url:
-        return 'article'
-    elif 'kaggle.com' in url:
-        return 'home'
-    return None
-
-def check_geeksforgeeks_page(url):
-    if '?' in url or '#' in url:
-        return None
-    if 'geeksforgeeks.org' in url and not any(x in url for x in ['/jobs/', '/courses/', '/newsletter', '/write/']):
-        return 'article'
-    return None
-
-def check_medium_page(url):
-    """Check Medium articles - more permissive"""
-    if 'medium.com' in url:
-        # Exclude certain sections
-        if any(x in url for x in ['?', '#', '/tag/', '/topics/', '/plans', '/membership', '/about']):
-            return None
-        # Accept both user articles and publication articles
-        if url.count('/') >= 3:  # More permissive
-            return 'article'
-    return None
-
-def check_towardsdatascience_page(url):
-    """Check Towards Data Science articles"""
-    if 'towardsdatascience.com' in url:
-        if any(x in url for x in ['?', '#', '/tagged/', '/plans']):
-            return None
-        if url.count('/') >= 3:
-            return 'article'
-    return None
-
-def check_arxiv_page(url):
-    """Check ArXiv papers"""
-    if 'arxiv.org/abs/' in url:
-        return 'research paper'
-    return None
-
-def check_ieee_page(url):
-    """Check IEEE papers"""
-    if 'ieeexplore.ieee.org/document/' in url:
-        return 'research paper'
-    return None
-
-def check_paperswithcode_page(url):
-    """Check Papers with Code"""
-    if 'paperswithcode.com' in url:
-        if any(x in url for x in ['?', '#']):
-            return None
-        if '/paper/' in url or '/dataset/' in url or '/method/' in url:
-            return 'research paper'
-    return None
-
-def check_machinelearningmastery_page(url):
-    """Check Machine Learning Mastery blog"""
-    if 'machinelearningmastery.com' in url:
-        if any(x in url for x in ['?', '#', '/blog/', '/start-here/', '/about/']):
-            return None
-        if url.count('/') >= 3:
-            return 'article'
-    return None
+# Compiled from the shared rule table in url_rules.py
+check_kaggle_page = site_filter('kaggle')
+check_geeksforgeeks_page = site_filter('geeksforgeeks')
+check_medium_page = site_filter('medium')
+check_towardsdatascience_page = site_filter('towardsdatascience')
+check_arxiv_page = site_filter('arxiv')
+check_ieee_page = site_filter('ieee')
+check_paperswithcode_page = site_filter('paperswithcode')
+check_machinelearningmastery_page = site_filter('machinelearningmastery')
 
 # -------------------- SELENIUM SETUP --------------------
 
 def setup_driver():
-    """Set up Selenium WebDriver (auto-managed ChromeDriver)"""
+    """Set up Selenium WebDriver (auto-managed ChromeDriver) under a SupervisedDriver"""
     chrome_options = Options()
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--disable-gpu")
 
-    return webdriver.Chrome(options=chrome_options)
+    return SupervisedDriver(lambda: webdriver.Chrome(options=chrome_options))
 
 # -------------------- CRAWLER --------------------
 
 def crawl_site(start_url, max_depth, check_function, driver, visited_links):
-    queue = deque([(start_url, 1)])
-    site_visited = set()
-
-    while queue:
-        url, depth = queue.popleft()
-
-        if depth > max_depth or url in visited_links or url in site_visited:
-            continue
-
-        print(f"[Depth {depth}] Crawling: {url}")
-
-        if check_function(url) is None:
-            continue
-
-        site_visited.add(url)
-        visited_links.add(url)
+    return crawl_engine.crawl_site(
+        start_url, max_depth, check_function, driver, visited_links,
+        assign_tags=assign_tags, store_resource=store_resource, store_link=store_link,
+        render_wait=3, log_every=1
+    )
 
-        try:
-            driver.get(url)
-            time.sleep(3)
-
-            title = driver.title
-
-            try:
-                description = driver.find_element(
-                    By.CSS_SELECTOR, 'meta[name="description"]'
-                ).get_attribute('content')
-            except:
-                description = ''
-
-            content = driver.find_element(By.TAG_NAME, 'body').text
-            tags = assign_tags(content)
-
-            store_resource(url, title, description, tags)
-
-            links = driver.find_elements(By.TAG_NAME, 'a')
-            for link in links:
-                try:
-                    href = link.get_attribute('href')
-                    if href and href.startswith('http') and href not in visited_links:
-                        store_link(url, href)
-                        if check_function(href):
-                            queue.append((href, depth + 1))
-                except:
-                    continue
-
-        except Exception as e:
-            print(f"Error crawling {url}: {e}")
-            continue
 
 # -------------------- MAIN --------------------
 
@@ -267,6 +106,8 @@ def main():
     finally:
         driver.quit()
 
+    get_metrics().summary()
+
     print(f"\n{'=' * 60}")
     print(f"✓ Crawling completed! Total pages: {len(visited_links)}")
     print(f"{'=' * 60}")
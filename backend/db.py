@@ -69,6 +69,71 @@ def setup_database():
     """)
     print("✓ Table 'user_source_interaction' created successfully.")
     
+    # Shared dictionaries for compressed text columns
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec TEXT NOT NULL,
+            dict BLOB NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    print("✓ Table 'compression_dicts' created successfully.")
+    
+    # Change tracking for the recrawl planner
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS page_state (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            visits INTEGER DEFAULT 0,
+            changes INTEGER DEFAULT 0,
+            observed_seconds REAL DEFAULT 0,
+            last_fetched DATETIME,
+            last_changed DATETIME,
+            FOREIGN KEY (url) REFERENCES resources(url) ON DELETE CASCADE
+        );
+    """)
+    print("✓ Table 'page_state' created successfully.")
+
+    # Index state and change log for indexer.py --incremental
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_state (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            extractor_version INTEGER,
+            status TEXT NOT NULL,
+            retries INTEGER DEFAULT 0,
+            last_error TEXT,
+            indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (url) REFERENCES resources(url) ON DELETE CASCADE
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS index_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            change TEXT NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    print("✓ Tables 'index_state' and 'index_changes' created successfully.")
+
+    # One row per pagerank.py run; the latest id versions popularity_score
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pagerank_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pages INTEGER,
+            links INTEGER,
+            resources_updated INTEGER,
+            iterations INTEGER,
+            residual REAL,
+            completed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    print("✓ Table 'pagerank_runs' created successfully.")
+    
     # Create indexes for better performance
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_resources_url ON resources(url);")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_links_source ON links(source_url);")
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Sitemap and Feed Discovery
+Find resource URLs from sitemaps and RSS/Atom feeds instead of rendering
+listing pages and walking their anchors depth by depth.
+
+Sources are read as streams (urllib or local files, gzip detected by its
+magic bytes) and parsed incrementally with lxml.etree.iterparse, clearing
+every element once it is read, so a sitemap with hundreds of thousands of
+entries never sits in memory. Sitemap indexes are followed, entries are
+canonicalized and kept only if a url_rules site accepts them, and the
+result is loaded into a crawl frontier in one pass: newest lastmod first,
+with the feed item's title as anchor text and the lastmod as the recency
+term of the priority score (crawl_priority.py).
+
+mega_crawler.py --discover adds one "Discovery - <site>" target per site
+with sources, seeded from them.
+
+Usage:
+    python discovery.py scan <sitemap/feed URL or file> [...]
+    python discovery.py sites [site ...]     # scan the configured sources
+"""
+
+import gzip
+import io
+import sys
+import time
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+from dotenv import load_dotenv
+
+from politeness import get_scheduler, USER_AGENT
+from url_rules import SITE_RULES, classify, site_filter
+from urlnorm import canonicalize_url
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+load_dotenv()
+
+DISCOVERY_MAX_ENTRIES = int(os.getenv('DISCOVERY_MAX_ENTRIES', '20000'))   # per site
+DISCOVERY_MAX_SITEMAPS = int(os.getenv('DISCOVERY_MAX_SITEMAPS', '50'))    # per site
+DISCOVERY_MAX_AGE_DAYS = float(os.getenv('DISCOVERY_MAX_AGE_DAYS', '0'))   # 0 = no limit
+DISCOVERY_MAX_PAGES = int(os.getenv('DISCOVERY_MAX_PAGES', '500'))         # crawl budget per site
+DISCOVERY_MAX_DEPTH = int(os.getenv('DISCOVERY_MAX_DEPTH', '2'))
+DISCOVERY_ROBOTS = os.getenv('DISCOVERY_ROBOTS', '1') == '1'
+DISCOVERY_TIMEOUT = float(os.getenv('DISCOVERY_TIMEOUT', '30'))
+
+# Sitemaps and feeds per url_rules site; sitemaps listed in each site's
+# robots.txt are added when DISCOVERY_ROBOTS=1
+SITE_SOURCES = {
+    'arxiv': [
+        'https://rss.arxiv.org/rss/cs.LG',
+        'https://rss.arxiv.org/rss/cs.AI',
+        'https://rss.arxiv.org/rss/cs.CV',
+        'https://rss.arxiv.org/rss/cs.CL',
+        'https://rss.arxiv.org/rss/cs.RO',
+    ],
+    'medium': [
+        'https://medium.com/feed/tag/machine-learning',
+        'https://medium.com/feed/tag/deep-learning',
+        'https://medium.com/feed/tag/artificial-intelligence',
+        'https://medium.com/feed/tag/large-language-models',
+    ],
+    'towardsdatascience': ['https://towardsdatascience.com/feed'],
+    'kaggle': ['https://www.kaggle.com/sitemap.xml'],
+    'huggingface': ['https://huggingface.co/sitemap.xml'],
+    'distill': ['https://distill.pub/rss.xml'],
+    'machinelearningmastery': ['https://machinelearningmastery.com/feed/'],
+    'kdnuggets': ['https://www.kdnuggets.com/feed'],
+    'analyticsvidhya': ['https://www.analyticsvidhya.com/feed/'],
+    'ai_googleblog': ['https://blog.research.google/feeds/posts/default'],
+}
+
+# A URL found in a source; lastmod is an ISO-8601 UTC string or None
+Entry = namedtuple('Entry', ['url', 'lastmod', 'title'])
+
+# -------------------- READING --------------------
+
+def open_source(source):
+    """Binary stream for a URL, file:// URL or local path, gunzipped if needed"""
+    if '://' not in source:
+        stream = open(source, 'rb')
+    elif source.startswith('file://'):
+        stream = open(urlsplit(source).path, 'rb')
+    else:
+        get_scheduler().acquire(source)
+        stream = urlopen(Request(source, headers={'User-Agent': USER_AGENT}),
+                         timeout=DISCOVERY_TIMEOUT)
+    stream = io.BufferedReader(stream) if not hasattr(stream, 'peek') else stream
+    if stream.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+def _base(source):
+    return source if '://' in source else 'file://' + os.path.abspath(source)
+
+def normalize_date(value):
+    """W3C datetime (sitemaps, Atom) or RFC 822 date (RSS) as ISO-8601 UTC"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _child_text(element, name):
+    for child in element:
+        if isinstance(child.tag, str) and etree.QName(child).localname == name:
+            return (child.text or '').strip()
+    return None
+
+def _atom_link(entry):
+    for child in entry:
+        if isinstance(child.tag, str) and etree.QName(child).localname == 'link':
+            if child.get('rel', 'alternate') == 'alternate' and child.get('href'):
+                return child.get('href')
+    return None
+
+def parse_source(stream, base):
+    """Yield ('url', Entry) and ('sitemap', location) items from one source.
+
+    Handles sitemap urlsets, sitemap indexes, RSS and Atom. Elements are
+    cleared as soon as they are read.
+    """
+    if etree is None:
+        raise RuntimeError("Sitemap and feed discovery requires the 'lxml' package")
+
+    for _, element in etree.iterparse(stream, events=('end',), recover=True, huge_tree=True):
+        if not isinstance(element.tag, str):
+            continue
+        name = etree.QName(element).localname
+
+        if name == 'url':
+            loc = _child_text(element, 'loc')
+            if loc:
+                yield 'url', Entry(urljoin(base, loc), normalize_date(_child_text(element, 'lastmod')), None)
+        elif name == 'sitemap':
+            loc = _child_text(element, 'loc')
+            if loc:
+                yield 'sitemap', urljoin(base, loc)
+        elif name == 'item':
+            link = _child_text(element, 'link') or _child_text(element, 'guid')
+            if link:
+                yield 'url', Entry(urljoin(base, link), normalize_date(_child_text(element, 'pubDate')),
+                                   _child_text(element, 'title'))
+        elif name == 'entry':
+            link = _atom_link(element)
+            if link:
+                # Atom feeds may set xml:base for relative links
+                if element.base:
+                    link = urljoin(urljoin(base, element.base), link)
+                updated = _child_text(element, 'updated') or _child_text(element, 'published')
+                yield 'url', Entry(urljoin(base, link), normalize_date(updated),
+                                   _child_text(element, 'title'))
+        else:
+            continue
+
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+def robots_sitemaps(url):
+    """Sitemap URLs declared in the robots.txt of url's host"""
+    parts = urlsplit(url)
+    try:
+        with open_source(f"{parts.scheme}://{parts.netloc}/robots.txt") as stream:
+            lines = stream.read(512 * 1024).decode('utf-8', errors='replace').splitlines()
+    except Exception:
+        return []
+    return [line.split(':', 1)[1].strip() for line in lines
+            if line.lower().startswith('sitemap:')]
+
+# -------------------- DISCOVERY --------------------
+
+def discover(sources, site=None, max_entries=DISCOVERY_MAX_ENTRIES,
+             max_sitemaps=DISCOVERY_MAX_SITEMAPS, max_age_days=DISCOVERY_MAX_AGE_DAYS, errors=None):
+    """Accepted entries from sources, following sitemap indexes.
+
+    An entry is kept if url_rules classifies its canonical URL (for site,
+    when given). Returns {canonical url: Entry}, first occurrence wins; the
+    Entry keeps the URL as discovered, which is the one fetched. errors, if
+    a list, collects (source, message) for unreadable sources.
+    """
+    cutoff = None
+    if max_age_days:
+        cutoff = normalize_date(datetime.fromtimestamp(time.time() - max_age_days * 86400,
+                                                       timezone.utc).isoformat())
+    pending = list(sources)
+    seen_sources = set()
+    entries = {}
+
+    while pending and len(seen_sources) < max_sitemaps and len(entries) < max_entries:
+        source = pending.pop(0)
+        if source in seen_sources:
+            continue
+        seen_sources.add(source)
+        try:
+            with open_source(source) as stream:
+                for kind, item in parse_source(stream, _base(source)):
+                    if kind == 'sitemap':
+                        pending.append(item)
+                        continue
+                    if cutoff and item.lastmod and item.lastmod < cutoff:
+                        continue
+                    url = canonicalize_url(item.url)
+                    result = classify(url)
+                    if result is None or (site is not None and result[0] != site):
+                        continue
+                    if url not in entries:
+                        entries[url] = item
+                        if len(entries) >= max_entries:
+                            break
+        except Exception as e:
+            if errors is not None:
+                errors.append((source, str(e)))
+    return entries
+
+def site_sources(site, use_robots=DISCOVERY_ROBOTS):
+    """Configured sources for a site plus its robots.txt sitemaps"""
+    sources = list(SITE_SOURCES.get(site, []))
+    if use_robots:
+        for host in SITE_RULES[site][0]:
+            for sitemap in robots_sitemaps(f"https://{host}/"):
+                if sitemap not in sources:
+                    sources.append(sitemap)
+    return sources
+
+def seed_rows(entries):
+    """Frontier rows (url, depth, anchor, lastmod, fetch_url): newest lastmod first, undated last"""
+    ordered = sorted(entries.items(), key=lambda item: item[1].lastmod or '', reverse=True)
+    return [(url, 1, e.title or '', e.lastmod, e.url) for url, e in ordered]
+
+def discovery_targets(sites, max_pages=DISCOVERY_MAX_PAGES, max_depth=DISCOVERY_MAX_DEPTH):
+    """Crawl targets seeded from each site's sitemaps and feeds.
+
+    Returns (targets, seeds): targets in the crawlers' (name, start_url,
+    max_depth, check_function, max_pages) form, and {target name: frontier
+    rows}. The start URL is the newest entry, as discovered; sites whose
+    sources yield nothing are left out.
+    """
+    targets = []
+    seeds = {}
+    for site in sites:
+        errors = []
+        rows = seed_rows(discover(site_sources(site), site, errors=errors))
+        for source, message in errors:
+            print(f"  ✗ {source}: {message[:80]}")
+        print(f"  {site}: {len(rows)} URLs discovered")
+        if not rows:
+            continue
+        name = f"Discovery - {site}"
+        targets.append((name, rows[0][4], max_depth, site_filter(site), max_pages))
+        seeds[name] = rows
+    return targets, seeds
+
+# -------------------- ENTRY POINT --------------------
+
+def print_entries(entries, elapsed):
+    by_site = {}
+    for url in entries:
+        site, kind = classify(url)
+        by_site[(site, kind)] = by_site.get((site, kind), 0) + 1
+    dated = sum(1 for e in entries.values() if e.lastmod)
+
+    print("=" * 70)
+    print(f"  DISCOVERED {len(entries):,} URLs in {elapsed:.2f}s ({dated:,} with lastmod)")
+    print("=" * 70)
+    for (site, kind), count in sorted(by_site.items(), key=lambda item: -item[1]):
+        print(f"{site:25} {kind:15} {count:8,}")
+    print()
+    for url, _, _, lastmod, _ in seed_rows(entries)[:5]:
+        print(f"  {lastmod or '-':20} {url[:70]}")
+    print("=" * 70)
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('scan', 'sites') or (command == 'scan' and len(sys.argv) < 3):
+        print(__doc__)
+        return
+
+    start = time.time()
+    errors = []
+    if command == 'scan':
+        entries = discover(sys.argv[2:], errors=errors)
+    else:
+        entries = {}
+        for site in sys.argv[2:] or list(SITE_SOURCES):
+            entries.update(discover(site_sources(site), site, errors=errors))
+    for source, message in errors:
+        print(f"✗ {source}: {message[:100]}")
+    print_entries(entries, time.time() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Distributed Crawl
+Coordinator-free crawling across several processes or machines that
+share one frontier database (DIST_STATE_PATH).
+
+Every URL any worker discovers is inserted once into dist_frontier, which
+doubles as the shared visited set. Workers claim batches of queued URLs
+under an expiring lease, mark them done or failed, and heartbeat in
+dist_workers. URLs are split into DIST_PARTITIONS partitions by a hash of
+their host, and the live workers divide the partitions between them
+(partition % live workers), so each host is paced by exactly one
+worker's politeness scheduler. When a worker dies its heartbeat goes
+stale, its partitions move to the others and its leases are reclaimed
+once they expire.
+
+SQLite is fine for workers on one host; for several machines the file
+has to live on storage every worker can lock.
+
+Usage:
+    python mega_crawler.py --distributed [--worker-id ID]
+    python topic_crawler.py --distributed [--worker-id ID]
+    python distributed.py stats
+    python distributed.py reclaim
+    python distributed.py reset
+"""
+
+import sqlite3
+import hashlib
+import socket
+import sys
+import time
+import os
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+from crawl_priority import Candidate, default_scorer
+from crawl_writer import flush_all
+from urlnorm import canonicalize_url
+
+load_dotenv()
+
+DIST_STATE_PATH = os.getenv('DIST_STATE_PATH', '../database/crawl_shared.db')
+DIST_STATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DIST_STATE_PATH))
+
+DIST_PARTITIONS = int(os.getenv('DIST_PARTITIONS', '64'))
+DIST_LEASE_SECONDS = float(os.getenv('DIST_LEASE_SECONDS', '300'))
+DIST_CLAIM_BATCH = int(os.getenv('DIST_CLAIM_BATCH', os.getenv('CRAWL_BATCH_SIZE', '16')))
+DIST_MAX_ATTEMPTS = int(os.getenv('DIST_MAX_ATTEMPTS', '3'))
+DIST_IDLE_SECONDS = float(os.getenv('DIST_IDLE_SECONDS', '5'))
+
+# URL states
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+# -------------------- HELPERS --------------------
+
+def partition_of(url, partitions=DIST_PARTITIONS):
+    """Partition for a URL's host; every URL of a host lands in the same one"""
+    host = (urlsplit(url).hostname or '').lower()
+    digest = hashlib.blake2b(host.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % partitions
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def ensure_dist_tables(conn):
+    """Create the shared frontier tables if they do not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dist_targets (
+            name TEXT PRIMARY KEY,
+            start_url TEXT NOT NULL,
+            max_depth INTEGER NOT NULL,
+            max_pages INTEGER,
+            pages_crawled INTEGER DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dist_frontier (
+            url TEXT PRIMARY KEY,
+            target TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            partition INTEGER NOT NULL,
+            priority REAL DEFAULT 0,
+            inlinks INTEGER DEFAULT 1,
+            state TEXT NOT NULL DEFAULT 'queued',
+            owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            fetch_url TEXT
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dist_workers (
+            worker_id TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL,
+            pages INTEGER DEFAULT 0
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_dist_claim
+        ON dist_frontier(target, state, partition, priority);
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_dist_lease ON dist_frontier(state, lease_expires);")
+    # Shared files from before URLs were fetched as discovered (NULL: fetch the url itself)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(dist_frontier)")}
+    if 'fetch_url' not in columns:
+        conn.execute("ALTER TABLE dist_frontier ADD COLUMN fetch_url TEXT")
+
+# -------------------- SHARED STORE --------------------
+
+class SharedFrontierStore:
+    """One worker's connection to the shared frontier database"""
+
+    def __init__(self, worker_id=None, path=DIST_STATE_PATH, lease_seconds=DIST_LEASE_SECONDS,
+                 partitions=DIST_PARTITIONS, register=True):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.worker_id = worker_id or default_worker_id()
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.partitions = partitions
+        # Autocommit; multi-statement writes go through _transaction()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self._transaction():
+            ensure_dist_tables(self.conn)
+        self.last_heartbeat = 0.0
+        if register:
+            self.heartbeat()
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so two workers can never
+        # both read the same queued rows and then claim them
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.conn
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ----- membership -----
+
+    def heartbeat(self, force=True):
+        now = time.time()
+        if not force and now - self.last_heartbeat < self.lease_seconds / 3:
+            return
+        self.conn.execute("""
+            INSERT INTO dist_workers (worker_id, heartbeat) VALUES (?, ?)
+            ON CONFLICT(worker_id) DO UPDATE SET heartbeat = excluded.heartbeat
+        """, (self.worker_id, now))
+        self.last_heartbeat = now
+
+    def live_workers(self):
+        cutoff = time.time() - self.lease_seconds
+        return [w for (w,) in self.conn.execute(
+            "SELECT worker_id FROM dist_workers WHERE heartbeat >= ? ORDER BY worker_id", (cutoff,)
+        )]
+
+    def owned_partitions(self):
+        """Partitions this worker crawls, given the workers alive right now"""
+        workers = self.live_workers()
+        if self.worker_id not in workers:
+            self.heartbeat()
+            workers = self.live_workers()
+        index, count = workers.index(self.worker_id), len(workers)
+        return [p for p in range(self.partitions) if p % count == index]
+
+    def leave(self):
+        """Give up this worker's partitions and unfinished leases straight away"""
+        with self._transaction() as conn:
+            conn.execute("""
+                UPDATE dist_frontier SET state = 'queued', owner = NULL, lease_expires = NULL
+                WHERE state = 'leased' AND owner = ?
+            """, (self.worker_id,))
+            conn.execute("DELETE FROM dist_workers WHERE worker_id = ?", (self.worker_id,))
+
+    # ----- targets -----
+
+    def add_target(self, name, start_url, max_depth, max_pages):
+        """Register a target and queue its start URL (fetched as given).
+
+        Returns False (and changes nothing) if another worker already did.
+        """
+        given_url = start_url
+        start_url = canonicalize_url(start_url)
+        with self._transaction() as conn:
+            added = conn.execute("""
+                INSERT OR IGNORE INTO dist_targets (name, start_url, max_depth, max_pages)
+                VALUES (?, ?, ?, ?)
+            """, (name, start_url, max_depth, max_pages)).rowcount
+            conn.execute("""
+                INSERT OR IGNORE INTO dist_frontier (url, target, depth, partition, priority, fetch_url)
+                VALUES (?, ?, 1, ?, 0, ?)
+            """, (start_url, name, partition_of(start_url, self.partitions),
+                  given_url if given_url != start_url else None))
+        return added > 0
+
+    def pages_crawled(self, name):
+        row = self.conn.execute(
+            "SELECT pages_crawled FROM dist_targets WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def target_done(self, name, max_pages):
+        """No queued or leased URLs left, or the budget is spent"""
+        if max_pages and self.pages_crawled(name) >= max_pages:
+            return True
+        return self.conn.execute(
+            "SELECT 1 FROM dist_frontier WHERE target = ? AND state IN ('queued', 'leased') LIMIT 1",
+            (name,)
+        ).fetchone() is None
+
+    # ----- leases -----
+
+    def reclaim_expired(self):
+        """Requeue expired leases (or fail them after DIST_MAX_ATTEMPTS); returns the count"""
+        now = time.time()
+        with self._transaction() as conn:
+            failed = conn.execute("""
+                UPDATE dist_frontier SET state = 'failed', owner = NULL, lease_expires = NULL,
+                    last_error = 'lease expired'
+                WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, DIST_MAX_ATTEMPTS)).rowcount
+            requeued = conn.execute("""
+                UPDATE dist_frontier SET state = 'queued', owner = NULL, lease_expires = NULL
+                WHERE state = 'leased' AND lease_expires < ?
+            """, (now,)).rowcount
+        return requeued + failed
+
+    def claim(self, name, limit):
+        """Lease up to limit of the target's best queued URLs in owned partitions.
+
+        Returns [(url, depth, fetch_url), ...] best first, fetch_url being
+        the URL as discovered.
+        """
+        self.heartbeat(force=False)
+        self.reclaim_expired()
+        partitions = self.owned_partitions()
+        now = time.time()
+        placeholders = ','.join('?' * len(partitions))
+        with self._transaction() as conn:
+            rows = conn.execute(f"""
+                UPDATE dist_frontier
+                SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE url IN (
+                    SELECT url FROM dist_frontier
+                    WHERE target = ? AND state = 'queued' AND partition IN ({placeholders})
+                    ORDER BY priority DESC, inlinks DESC
+                    LIMIT ?
+                )
+                RETURNING url, depth, priority, inlinks, COALESCE(fetch_url, url)
+            """, (self.worker_id, now + self.lease_seconds, name, *partitions, limit)).fetchall()
+        rows.sort(key=lambda row: (-row[2], -row[3]))
+        return [(url, depth, fetch_url) for url, depth, _, _, fetch_url in rows]
+
+    def add_urls(self, name, rows, inlinks=True):
+        """Queue discovered (url, depth, priority, fetch_url) rows.
+
+        Known URLs gain an inlink, unless inlinks is False (sitemap and
+        feed seeds, which are not links): then a queued URL only keeps the
+        higher of its two priorities, as the seed's includes its lastmod.
+        """
+        if not rows:
+            return
+        conflict = ("inlinks = inlinks + 1" if inlinks
+                    else "priority = MAX(dist_frontier.priority, excluded.priority)")
+        with self._transaction() as conn:
+            conn.executemany(f"""
+                INSERT INTO dist_frontier (url, target, depth, partition, priority, fetch_url)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET {conflict}
+                WHERE dist_frontier.state = 'queued'
+            """, [(url, name, depth, partition_of(url, self.partitions), priority,
+                   fetch_url if fetch_url != url else None)
+                  for url, depth, priority, fetch_url in rows])
+
+    def complete(self, name, urls, counted=True):
+        """Mark fetched URLs done; their pages must already be written (see LeaseFrontier).
+
+        Only URLs this worker still holds the lease on count as crawled: one
+        whose lease expired and went to another worker is counted there.
+        counted=False is for pages fetched but not stored (a listing-page
+        start URL), which do not count toward the budget at all.
+        """
+        if not urls:
+            return
+        with self._transaction() as conn:
+            done = conn.executemany("""
+                UPDATE dist_frontier SET state = 'done', owner = NULL, lease_expires = NULL
+                WHERE url = ? AND owner = ?
+            """, [(url, self.worker_id) for url in urls]).rowcount
+            if done and counted:
+                conn.execute(
+                    "UPDATE dist_targets SET pages_crawled = pages_crawled + ? WHERE name = ?", (done, name)
+                )
+                conn.execute(
+                    "UPDATE dist_workers SET pages = pages + ? WHERE worker_id = ?", (done, self.worker_id)
+                )
+        self.heartbeat(force=False)
+
+    def fail(self, url, error):
+        """Requeue a failed URL until it has used DIST_MAX_ATTEMPTS leases.
+
+        Returns True if the URL went back in the queue.
+        """
+        row = self.conn.execute("""
+            UPDATE dist_frontier
+            SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                owner = NULL, lease_expires = NULL, last_error = ?
+            WHERE url = ? AND owner = ?
+            RETURNING state
+        """, (DIST_MAX_ATTEMPTS, str(error)[:500], url, self.worker_id)).fetchone()
+        return row is not None and row[0] == QUEUED
+
+    def release(self, urls, state=QUEUED):
+        """Hand leased URLs back (queued) or drop them (skipped)"""
+        if not urls:
+            return
+        with self._transaction() as conn:
+            conn.executemany(f"""
+                UPDATE dist_frontier
+                SET state = ?, owner = NULL, lease_expires = NULL,
+                    attempts = attempts - {1 if state == QUEUED else 0}
+                WHERE url = ? AND owner = ?
+            """, [(state, url, self.worker_id) for url in urls])
+
+    def stats(self):
+        """{target: {state: count}}"""
+        result = {}
+        for target, state, count in self.conn.execute(
+            "SELECT target, state, COUNT(*) FROM dist_frontier GROUP BY target, state"
+        ):
+            result.setdefault(target, {})[state] = count
+        return result
+
+    def reset(self):
+        with self._transaction() as conn:
+            for table in ('dist_frontier', 'dist_targets', 'dist_workers'):
+                conn.execute(f"DELETE FROM {table}")
+
+    def close(self):
+        self.conn.close()
+
+# -------------------- LEASE FRONTIER --------------------
+
+class LeaseFrontier:
+    """Frontier for one target backed by the shared store (see frontier.MemoryFrontier).
+
+    URLs come from leases claimed in batches. Links pushed while a page is
+    stored are buffered and written in one transaction before the next
+    claim or pop, so no write lock is held during a fetch.
+
+    Fetched URLs are only marked done once per claimed batch, before the
+    next claim and on release, right after the batched writers have been
+    flushed. A URL is never done in the shared store while its page is
+    still in this process's write buffer, so a killed worker's pages are
+    crawled again by whoever reclaims its leases instead of being lost.
+    """
+
+    def __init__(self, store, name, visited_links, max_depth, scorer=None,
+                 claim_batch=DIST_CLAIM_BATCH):
+        self.store = store
+        self.name = name
+        self.visited_links = visited_links
+        self.max_depth = max_depth
+        self.scorer = scorer or default_scorer()
+        self.claim_batch = claim_batch
+        self.buffer = deque()
+        self.pushed = []
+        self.fetched = []
+        self.unstored = []
+        self.fetch_urls = {}
+        self.site_visited = set()
+        self.last_popped = None
+        self.crawled_here = 0
+
+    @property
+    def pages_crawled(self):
+        return self.store.pages_crawled(self.name) + len(self.fetched)
+
+    def _flush(self):
+        if self.pushed:
+            self.store.add_urls(self.name, self.pushed)
+            self.pushed = []
+
+    def _complete(self):
+        if self.fetched or self.unstored:
+            try:
+                flush_all()
+            except sqlite3.OperationalError as e:
+                # Not acknowledged; retried at the next claim, or refetched once the leases expire
+                print(f"Completions postponed, crawled pages are not written yet: {e}")
+                return
+            self.store.complete(self.name, self.fetched)
+            self.store.complete(self.name, self.unstored, counted=False)
+            self.fetched = []
+            self.unstored = []
+
+    def _settle_last(self):
+        # A popped URL the engine skipped (too deep, rejected, already seen
+        # locally) is never marked visited; drop its lease so it is not retried
+        if self.last_popped is not None and self.last_popped not in self.site_visited:
+            self.store.release([self.last_popped], SKIPPED)
+            self.fetch_urls.pop(self.last_popped, None)
+        self.last_popped = None
+
+    def __bool__(self):
+        self._flush()
+        if not self.buffer:
+            self._complete()
+            for url, depth, fetch_url in self.store.claim(self.name, self.claim_batch):
+                self.buffer.append((url, depth))
+                if fetch_url != url:
+                    self.fetch_urls[url] = fetch_url
+        return bool(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def pop(self):
+        self._settle_last()
+        if not self:
+            return None
+        self.last_popped = self.buffer[0][0]
+        return self.buffer.popleft()
+
+    def push(self, url, depth, anchor='', lastmod=None, fetch_url=None):
+        if depth > self.max_depth:
+            return
+        priority = self.scorer(Candidate(url, anchor, depth, 1, 0, lastmod))
+        self.pushed.append((url, depth, priority, fetch_url or url))
+
+    def push_many(self, rows):
+        """Queue (url, depth, anchor, lastmod, fetch_url) seed rows in one transaction, without inlinks"""
+        self._flush()
+        for url, depth, anchor, lastmod, fetch_url in rows:
+            self.push(url, depth, anchor, lastmod, fetch_url)
+        self.store.add_urls(self.name, self.pushed, inlinks=False)
+        self.pushed = []
+
+    def fetch_url(self, url):
+        """The URL to request for a claimed one: as discovered, or as the seed was given"""
+        return self.fetch_urls.get(url, url)
+
+    def is_visited(self, url):
+        return url in self.visited_links or url in self.site_visited
+
+    def mark_visited(self, url):
+        self.site_visited.add(url)
+        self.visited_links.add(url)
+
+    def mark_fetched(self, url, stored=True):
+        self.fetch_urls.pop(url, None)
+        if stored:
+            self.fetched.append(url)
+            self.crawled_here += 1
+        else:
+            self.unstored.append(url)
+
+    def mark_failed(self, url, error):
+        # A requeued URL keeps its fetch_url in the store and gets it back with the claim
+        self.fetch_urls.pop(url, None)
+        if self.store.fail(url, error):
+            # Requeued: forget the URL here so the next claim fetches it again
+            self.site_visited.discard(url)
+            self.visited_links.discard(url)
+
+    def release(self):
+        """Flush pending links and completions and hand unused leases back to the queue"""
+        self._settle_last()
+        self._flush()
+        self._complete()
+        self.store.release([url for url, _ in self.buffer])
+        self.buffer.clear()
+        self.fetch_urls.clear()
+
+# -------------------- WORKER LOOP --------------------
+
+def run_worker(store, targets, crawl_target, visited_links, scorers=None, seeds=None,
+               idle_seconds=DIST_IDLE_SECONDS, log=True):
+    """Crawl the targets' owned partitions until every target is done.
+
+    targets is a list of (name, start_url, max_depth, check_function,
+    max_pages); crawl_target(target, frontier) crawls one target through
+    the given frontier and returns the pages stored. Returns a dict of
+    pages this worker crawled per target. seeds maps a target name to
+    (url, depth, anchor, lastmod, fetch_url) rows queued by whichever worker
+    registers it.
+    """
+    scorers = scorers or {}
+    seeds = seeds or {}
+    for name, start_url, max_depth, _, max_pages in targets:
+        if store.add_target(name, start_url, max_depth, max_pages) and seeds.get(name):
+            LeaseFrontier(store, name, visited_links, max_depth, scorers.get(name)).push_many(seeds[name])
+
+    results = {name: 0 for name, *_ in targets}
+    try:
+        while True:
+            active = [t for t in targets if not store.target_done(t[0], t[4])]
+            if not active:
+                break
+
+            progressed = False
+            for target in active:
+                name, _, max_depth, _, _ = target
+                frontier = LeaseFrontier(store, name, visited_links, max_depth, scorers.get(name))
+                try:
+                    crawl_target(target, frontier)
+                finally:
+                    frontier.release()
+                if frontier.crawled_here:
+                    progressed = True
+                    results[name] += frontier.crawled_here
+                    if log:
+                        print(f"✓ [{store.worker_id}] {name}: {frontier.crawled_here} pages "
+                              f"({store.pages_crawled(name)} total)")
+
+            # Other workers still hold leases or own the remaining partitions
+            if not progressed:
+                time.sleep(idle_seconds)
+    finally:
+        store.leave()
+    return results
+
+def crawl_distributed(targets, setup_driver, crawl_site, visited_links, worker_id=None,
+                      scorers=None, seeds=None):
+    """Run this process as one worker with a single driver; returns pages crawled here.
+
+    crawl_site is the calling script's crawl_site(start_url, max_depth,
+    check_function, driver, visited_links, max_pages, frontier=...).
+    """
+    store = SharedFrontierStore(worker_id)
+    print(f"Distributed mode: worker {store.worker_id}, shared frontier {store.path}")
+    print("-" * 80)
+    driver = setup_driver()
+
+    def crawl_target(target, frontier):
+        _, start_url, max_depth, check_function, max_pages = target
+        return crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages,
+                          frontier=frontier)
+
+    try:
+        results = run_worker(store, targets, crawl_target, visited_links, scorers=scorers, seeds=seeds)
+    finally:
+        driver.quit()
+        store.close()
+    return sum(results.values())
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('stats', 'reclaim', 'reset'):
+        print(__doc__)
+        return
+
+    store = SharedFrontierStore(register=False)
+    try:
+        if command == 'reclaim':
+            print(f"✓ Reclaimed {store.reclaim_expired()} expired leases")
+        elif command == 'reset':
+            store.reset()
+            print(f"✓ Cleared the shared frontier in {store.path}")
+        else:
+            print("=" * 70)
+            print("  SHARED FRONTIER")
+            print("=" * 70)
+            cutoff = time.time() - store.lease_seconds
+            for worker_id, heartbeat, pages in store.conn.execute(
+                "SELECT worker_id, heartbeat, pages FROM dist_workers ORDER BY worker_id"
+            ):
+                status = 'live' if heartbeat >= cutoff else 'stale'
+                print(f"Worker {worker_id:30} {status:6} {pages:7} pages")
+            print()
+            print(f"{'Target':40} {'queued':>8} {'leased':>8} {'done':>8} {'failed':>8} {'skipped':>8}")
+            for target, states in sorted(store.stats().items()):
+                print(f"{target[:40]:40} " + ' '.join(
+                    f"{states.get(s, 0):8}" for s in (QUEUED, LEASED, DONE, FAILED, SKIPPED)
+                ))
+            print("=" * 70)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
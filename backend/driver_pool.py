@@ -0,0 +1,323 @@
+"""
+Driver Pool
+Parallel crawl mode: a pool of worker processes, each owning its own
+Selenium driver, fetches pages handed out by a single coordinator.
+
+The coordinator (the calling process) owns the shared frontier, the
+visited set and the per-target max_pages / max_depth budgets, and is the
+only process that writes to the database. Workers restart their driver
+after DRIVER_RECYCLE_PAGES pages or when it errors out, and a worker
+process that dies is replaced and its page handed out again.
+
+Politeness is enforced by the coordinator: a URL is only handed out once
+its host has a free slot in the politeness scheduler, and targets whose
+host is busy are skipped in favour of other hosts.
+"""
+
+import multiprocessing as mp
+import queue as queue_module
+import time
+import os
+from dotenv import load_dotenv
+
+from selenium.common.exceptions import WebDriverException
+
+from driver_supervisor import DRIVER_RECYCLE_PAGES
+from fetcher import fetch_pages, is_static_url
+from frontier import MemoryFrontier, make_queue
+from link_graph import page_edges
+from page_store import get_page_store
+from politeness import get_scheduler
+from telemetry import get_metrics, error_kind
+from urlnorm import canonical_anchors, canonical_links
+
+load_dotenv()
+
+DRIVER_POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', '4'))
+MAX_TASK_RETRIES = 1
+# Seconds without any worker message before unclaimed tasks are handed out again
+STALL_TIMEOUT = int(os.getenv('DRIVER_POOL_STALL_TIMEOUT', '300'))
+
+# -------------------- WORKER --------------------
+
+def _worker(worker_id, setup_driver, task_queue, result_queue, render_wait, recycle_after):
+    """Fetch pages until a None sentinel arrives"""
+    driver = None
+    driver_pages = 0
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            task_id, url = task
+            result_queue.put(('claim', worker_id, task_id, None))
+
+            if driver is None and not is_static_url(url):
+                driver = setup_driver()
+                driver_pages = 0
+
+            # The coordinator already paced this request for its host
+            start = time.monotonic()
+            page = fetch_pages([url], driver, render_wait, throttle=False)[0]
+            elapsed = time.monotonic() - start
+
+            if isinstance(page, Exception):
+                result_queue.put(('error', worker_id, task_id, (str(page), elapsed, error_kind(page))))
+                if isinstance(page, WebDriverException) and driver is not None:
+                    # The driver may have crashed; start a fresh one next time
+                    _quit(driver)
+                    driver = None
+                    result_queue.put(('restart', worker_id, None, 'driver error'))
+                continue
+
+            result_queue.put(('page', worker_id, task_id, (page, elapsed, None)))
+
+            if driver is not None:
+                driver_pages += 1
+                if driver_pages >= recycle_after:
+                    _quit(driver)
+                    driver = None
+                    result_queue.put(('restart', worker_id, None, 'recycled'))
+    finally:
+        if driver is not None:
+            _quit(driver)
+
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+# -------------------- COORDINATOR --------------------
+
+class _Target:
+    """Frontier and budget for one crawl target"""
+
+    def __init__(self, name, frontier, max_depth, check_function, max_pages):
+        self.name = name
+        self.frontier = frontier
+        self.max_depth = max_depth
+        self.check_function = check_function
+        self.max_pages = max_pages
+        self.crawled = 0
+        self.in_flight = 0
+
+    def has_budget(self):
+        return (not self.max_pages
+                or self.frontier.pages_crawled + self.in_flight < self.max_pages)
+
+def crawl_parallel(targets, setup_driver, visited_links, assign_tags, store_resource, store_link,
+                   workers=DRIVER_POOL_SIZE, render_wait=1, content_chars=None,
+                   recycle_after=DRIVER_RECYCLE_PAGES, log_every=10, store=None, scorers=None,
+                   seeds=None):
+    """Crawl all targets with a pool of driver processes.
+
+    targets is a list of (name, start_url, max_depth, check_function,
+    max_pages). Returns a dict of pages crawled per target name. With a
+    CrawlStateStore the frontiers are persistent and targets finished in
+    an earlier run are skipped. scorers maps a target name to its frontier
+    scorer (default: crawl_priority's); seeds maps it to (url, depth,
+    anchor, lastmod, fetch_url) rows queued before the crawl starts, as
+    discovery.py builds.
+    """
+    scorers = scorers or {}
+    seeds = seeds or {}
+    states = []
+    for name, start_url, max_depth, check_function, max_pages in targets:
+        if store is not None:
+            if store.is_done(name):
+                continue
+            frontier = store.target_frontier(name, start_url, max_depth, max_pages, visited_links,
+                                             scorer=scorers.get(name))
+        else:
+            frontier = MemoryFrontier(start_url, visited_links, make_queue(scorers.get(name)))
+        if name in seeds:
+            frontier.push_many(seeds[name])
+        states.append(_Target(name, frontier, max_depth, check_function, max_pages))
+
+    if not states:
+        return {}
+
+    task_queue = mp.Queue()
+    result_queue = mp.Queue()
+
+    def start_worker(worker_id):
+        process = mp.Process(
+            target=_worker,
+            args=(worker_id, setup_driver, task_queue, result_queue, render_wait, recycle_after),
+            daemon=True
+        )
+        process.start()
+        return process
+
+    scheduler = get_scheduler()
+    metrics = get_metrics()
+    page_store = get_page_store()
+    processes = {worker_id: start_worker(worker_id) for worker_id in range(workers)}
+    tasks = {}           # task_id -> (target index, url, depth, retries)
+    worker_tasks = {}    # worker_id -> task_id currently being fetched
+    held = {}            # target index -> (url, depth) waiting for its host
+    next_task_id = 0
+    next_worker_id = workers
+    cursor = 0
+    total_crawled = 0
+    restarts = 0
+    last_message = time.time()
+
+    def next_url():
+        """Pick the next crawlable URL whose host is ready, round-robin over targets"""
+        nonlocal cursor
+        for _ in range(len(states)):
+            index = cursor
+            cursor = (cursor + 1) % len(states)
+            state = states[index]
+            if not state.has_budget():
+                held.pop(index, None)
+                continue
+            while state.has_budget() and (index in held or state.frontier):
+                url, depth = held.pop(index, None) or state.frontier.pop()
+                if depth > state.max_depth or state.frontier.is_visited(url):
+                    continue
+                if depth > 1 and state.check_function(url) is None:
+                    continue
+                if scheduler.ready_in(url) > 0:
+                    held[index] = (url, depth)
+                    break
+                scheduler.reserve(url)
+                state.frontier.mark_visited(url)
+                return index, url, depth, 0
+        return None
+
+    def retry(task_id):
+        """Hand a lost task out again, or drop it after MAX_TASK_RETRIES"""
+        nonlocal next_task_id
+        index, url, depth, retries = tasks.pop(task_id)
+        if retries < MAX_TASK_RETRIES:
+            tasks[next_task_id] = (index, url, depth, retries + 1)
+            task_queue.put((next_task_id, states[index].frontier.fetch_url(url)))
+            next_task_id += 1
+        else:
+            states[index].in_flight -= 1
+            states[index].frontier.mark_failed(url, "worker lost")
+
+    try:
+        while True:
+            # Keep every worker busy with one queued task in reserve
+            while len(tasks) < workers * 2:
+                picked = next_url()
+                if picked is None:
+                    break
+                index, url, depth, retries = picked
+                tasks[next_task_id] = picked
+                states[index].in_flight += 1
+                task_queue.put((next_task_id, states[index].frontier.fetch_url(url)))
+                next_task_id += 1
+
+            if not tasks:
+                if not held:
+                    break
+                # Every remaining URL is waiting for its host's next slot
+                time.sleep(min(scheduler.ready_in(url) for url, _ in held.values()) or 0.05)
+                continue
+
+            try:
+                kind, worker_id, task_id, payload = result_queue.get(timeout=1)
+            except queue_module.Empty:
+                # Replace dead workers and hand their page out again
+                for worker_id, process in list(processes.items()):
+                    if process.is_alive():
+                        continue
+                    del processes[worker_id]
+                    task_id = worker_tasks.pop(worker_id, None)
+                    if task_id in tasks:
+                        retry(task_id)
+                    processes[next_worker_id] = start_worker(next_worker_id)
+                    next_worker_id += 1
+                    restarts += 1
+                    metrics.driver_restart('worker died')
+                    print(f"  Worker {worker_id} died, started worker {next_worker_id - 1}")
+
+                # A worker that died between taking a task and claiming it
+                # leaves the task orphaned; reissue those after a long stall
+                if time.time() - last_message > STALL_TIMEOUT:
+                    claimed = set(worker_tasks.values())
+                    for task_id in [t for t in tasks if t not in claimed]:
+                        retry(task_id)
+                    last_message = time.time()
+                continue
+
+            last_message = time.time()
+
+            if kind == 'claim':
+                worker_tasks[worker_id] = task_id
+                continue
+            if kind == 'restart':
+                restarts += 1
+                metrics.driver_restart(payload)
+                continue
+
+            worker_tasks.pop(worker_id, None)
+            if task_id not in tasks:
+                continue
+            index, url, depth, _ = tasks.pop(task_id)
+            state = states[index]
+            state.in_flight -= 1
+            payload, elapsed, failure = payload
+            scheduler.record(url, elapsed, kind == 'page')
+            metrics.set_queue_depth(sum(len(s.frontier) for s in states))
+
+            if kind == 'error':
+                state.frontier.mark_failed(url, payload)
+                metrics.page_failed(url, payload, elapsed, failure)
+                if log_every:
+                    print(f"  Error: {url[:60]}... - {payload[:40]}")
+                continue
+
+            page = payload
+            metrics.page_done(url, page.timings)
+            start = time.monotonic()
+            # A listing-page seed is only fetched for its links, never stored,
+            # and does not count toward max_pages
+            stored = depth > 1 or state.check_function(url) is not None
+            anchors = canonical_anchors(page.anchors)
+            spellings = {}
+            links = canonical_links(page.links, spellings)
+
+            if stored:
+                content = page.content[:content_chars] if content_chars else page.content
+                store_resource(url, page.title, page.description, assign_tags(content, url))
+                if page_store is not None:
+                    page_store.put(url, page.content, page.html)
+                state.crawled += 1
+                total_crawled += 1
+
+                if log_every and total_crawled % log_every == 0:
+                    print(f"  [{total_crawled}] ({state.name}) {url[:70]}...")
+
+                for href in page_edges(url, links, visited_links):
+                    store_link(url, href)
+            # Only once its rows are buffered, so a checkpoint never commits
+            # the page as fetched ahead of them
+            state.frontier.mark_fetched(url, stored)
+            for href in links:
+                if href not in visited_links and state.check_function(href):
+                    state.frontier.push(href, depth + 1, anchors.get(href, ''), fetch_url=spellings[href])
+
+            metrics.observe('store', time.monotonic() - start)
+    finally:
+        for _ in processes:
+            task_queue.put(None)
+        for process in processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+    if store is not None:
+        for state in states:
+            if not state.frontier or not state.has_budget():
+                store.finish_target(state.frontier)
+
+    print(f"Driver pool: {workers} workers, {restarts} driver restarts")
+    return {state.name: state.crawled for state in states}
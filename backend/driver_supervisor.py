@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Driver Supervisor
+Keeps a long-running Selenium driver healthy and light.
+
+A Chrome instance kept for thousands of pages grows steadily in memory, a
+page that never finishes loading can stall a whole run, and
+--disable-images alone does not stop fonts, stylesheets and media from
+being downloaded. SupervisedDriver wraps a setup_driver() function and
+stands in for the driver it returns:
+
+    timeouts    page-load and script timeouts; a page that times out is
+                stopped and reported as failed, and the driver is
+                restarted after DRIVER_MAX_TIMEOUTS timeouts in a row
+    recycling   the driver is restarted after DRIVER_RECYCLE_PAGES pages
+                or once Chrome's total RSS passes DRIVER_MAX_RSS_MB
+                (needs psutil)
+    blocking    requests for heavy resource types (DRIVER_BLOCK_TYPES)
+                and known third-party hosts (ads, analytics, widgets,
+                web fonts) are dropped by Chrome through the DevTools
+                Network.setBlockedURLs command
+
+Selenium's execute_cdp_cmd cannot receive Fetch.requestPaused events, so
+blocking uses URL patterns rather than per-request interception. Chrome
+drops a matched request before it is sent.
+
+Usage:
+    python driver_supervisor.py compare <url> [url ...]   # load time, bytes and RSS, blocking off vs on
+"""
+
+import time
+import sys
+import os
+from dotenv import load_dotenv
+
+from telemetry import get_metrics
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+load_dotenv()
+
+DRIVER_PAGE_LOAD_TIMEOUT = float(os.getenv('DRIVER_PAGE_LOAD_TIMEOUT', '30'))
+DRIVER_SCRIPT_TIMEOUT = float(os.getenv('DRIVER_SCRIPT_TIMEOUT', '10'))
+DRIVER_MAX_TIMEOUTS = int(os.getenv('DRIVER_MAX_TIMEOUTS', '3'))
+DRIVER_RECYCLE_PAGES = int(os.getenv('DRIVER_RECYCLE_PAGES', '200'))
+DRIVER_MAX_RSS_MB = float(os.getenv('DRIVER_MAX_RSS_MB', '1500'))     # 0 = no limit
+DRIVER_RSS_CHECK_EVERY = int(os.getenv('DRIVER_RSS_CHECK_EVERY', '10'))
+DRIVER_BLOCK_TYPES = [t for t in os.getenv('DRIVER_BLOCK_TYPES', 'image,media,font,stylesheet').split(',') if t]
+DRIVER_BLOCK_THIRD_PARTY = os.getenv('DRIVER_BLOCK_THIRD_PARTY', '1') == '1'
+DRIVER_BLOCK_HOSTS = [h for h in os.getenv('DRIVER_BLOCK_HOSTS', '').split(',') if h]
+
+# File extensions per resource type
+BLOCKED_EXTENSIONS = {
+    'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'media': ['mp4', 'webm', 'ogg', 'mp3', 'm4a', 'wav', 'mov', 'm3u8'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+    'stylesheet': ['css'],
+}
+
+# Third-party hosts that never carry page content
+THIRD_PARTY_HOSTS = [
+    'doubleclick.net', 'googlesyndication.com', 'googletagmanager.com', 'google-analytics.com',
+    'googleadservices.com', 'fonts.googleapis.com', 'fonts.gstatic.com', 'facebook.net',
+    'connect.facebook.com', 'platform.twitter.com', 'platform.linkedin.com', 'hotjar.com',
+    'segment.io', 'segment.com', 'mixpanel.com', 'optimizely.com', 'newrelic.com', 'nr-data.net',
+    'scorecardresearch.com', 'quantserve.com', 'taboola.com', 'outbrain.com', 'disqus.com',
+    'intercom.io', 'amplitude.com', 'sentry.io', 'youtube.com/embed', 'player.vimeo.com',
+]
+
+def blocked_url_patterns(types=DRIVER_BLOCK_TYPES, third_party=DRIVER_BLOCK_THIRD_PARTY,
+                         extra_hosts=DRIVER_BLOCK_HOSTS):
+    """Network.setBlockedURLs patterns ('*' matches any run of characters)"""
+    patterns = []
+    for kind in types:
+        for ext in BLOCKED_EXTENSIONS.get(kind.strip(), []):
+            patterns += [f"*.{ext}", f"*.{ext}?*"]
+    hosts = (THIRD_PARTY_HOSTS if third_party else []) + extra_hosts
+    for host in hosts:
+        patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+    return patterns
+
+def chrome_rss(driver):
+    """Total RSS in bytes of the chromedriver process and its browser tree, or None"""
+    if psutil is None:
+        return None
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is None:
+        return None
+    try:
+        root = psutil.Process(process.pid)
+        total = 0
+        for p in [root] + root.children(recursive=True):
+            try:
+                total += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    except psutil.Error:
+        return None
+
+# -------------------- SUPERVISOR --------------------
+
+class SupervisedDriver:
+    """Drop-in driver that restarts, times out and trims the one it wraps.
+
+    Attributes other than get() and quit() are passed through to the
+    current driver, which is started on first use.
+    """
+
+    def __init__(self, setup_driver, recycle_pages=DRIVER_RECYCLE_PAGES, max_rss_mb=DRIVER_MAX_RSS_MB,
+                 page_load_timeout=DRIVER_PAGE_LOAD_TIMEOUT, script_timeout=DRIVER_SCRIPT_TIMEOUT,
+                 blocked_patterns=None):
+        self.setup_driver = setup_driver
+        self.recycle_pages = recycle_pages
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.page_load_timeout = page_load_timeout
+        self.script_timeout = script_timeout
+        self.blocked_patterns = blocked_url_patterns() if blocked_patterns is None else blocked_patterns
+        self.driver = None
+        self.driver_pages = 0
+        self.timeouts_in_row = 0
+        self.stats = {
+            'pages': 0, 'timeouts': 0, 'restarts': {}, 'peak_rss': 0, 'rss_reclaimed': 0,
+        }
+
+    def _start(self):
+        driver = self.setup_driver()
+        driver.set_page_load_timeout(self.page_load_timeout)
+        driver.set_script_timeout(self.script_timeout)
+        if self.blocked_patterns and hasattr(driver, 'execute_cdp_cmd'):
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_patterns})
+            except Exception as e:
+                print(f"Request blocking unavailable: {str(e)[:80]}")
+        self.driver = driver
+        self.driver_pages = 0
+        self.timeouts_in_row = 0
+        return driver
+
+    def _stop(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def restart(self, reason):
+        """Replace the driver; the RSS freed is counted as reclaimed"""
+        rss = chrome_rss(self.driver) if self.driver is not None else None
+        self._stop()
+        driver = self._start()
+        if rss is not None:
+            fresh = chrome_rss(driver) or 0
+            self.stats['rss_reclaimed'] += max(rss - fresh, 0)
+        self.stats['restarts'][reason] = self.stats['restarts'].get(reason, 0) + 1
+        get_metrics().driver_restart(reason)
+
+    def _check_health(self):
+        if self.recycle_pages and self.driver_pages >= self.recycle_pages:
+            self.restart('pages')
+        elif (self.max_rss and psutil is not None and self.driver_pages
+              and self.driver_pages % DRIVER_RSS_CHECK_EVERY == 0):
+            rss = chrome_rss(self.driver) or 0
+            self.stats['peak_rss'] = max(self.stats['peak_rss'], rss)
+            if rss > self.max_rss:
+                self.restart('rss')
+
+    def get(self, url):
+        """Load a page; a page-load timeout is stopped and re-raised"""
+        from selenium.common.exceptions import TimeoutException
+
+        if self.driver is None:
+            self._start()
+        else:
+            self._check_health()
+
+        self.driver_pages += 1
+        self.stats['pages'] += 1
+        try:
+            self.driver.get(url)
+            self.timeouts_in_row = 0
+        except TimeoutException:
+            self.stats['timeouts'] += 1
+            self.timeouts_in_row += 1
+            try:
+                self.driver.execute_script('window.stop();')
+            except Exception:
+                self.timeouts_in_row = DRIVER_MAX_TIMEOUTS
+            if self.timeouts_in_row >= DRIVER_MAX_TIMEOUTS:
+                self.restart('hung')
+            raise
+
+    def __getattr__(self, name):
+        # Only reached for names the supervisor does not define itself
+        if name.startswith('__') or name == 'driver':
+            raise AttributeError(name)
+        if self.driver is None:
+            self._start()
+        return getattr(self.driver, name)
+
+    def report(self):
+        """One-line summary of what the supervisor did"""
+        restarts = ', '.join(f"{n} {r}" for r, n in self.stats['restarts'].items()) or 'none'
+        line = (f"Driver: {self.stats['pages']} pages, {self.stats['timeouts']} timeouts, "
+                f"restarts: {restarts}")
+        if self.stats['peak_rss']:
+            line += (f", peak RSS {self.stats['peak_rss'] / 1024 / 1024:.0f} MB, "
+                     f"{self.stats['rss_reclaimed'] / 1024 / 1024:.0f} MB reclaimed by restarts")
+        return line
+
+    def quit(self):
+        if self.stats['pages']:
+            print(self.report())
+        self._stop()
+
+# -------------------- COMPARISON --------------------
+
+# Bytes and request count of everything the page loaded
+_TRANSFER_SCRIPT = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+return [entries.reduce((sum, e) => sum + (e.transferSize || 0), 0), entries.length];
+"""
+
+def _measure(urls, blocked_patterns):
+    from mega_crawler import start_chrome
+
+    driver = SupervisedDriver(start_chrome, recycle_pages=0, max_rss_mb=0,
+                              blocked_patterns=blocked_patterns)
+    seconds = transferred = requests = 0
+    peak_rss = 0
+    try:
+        for url in urls:
+            start = time.monotonic()
+            try:
+                driver.get(url)
+            except Exception as e:
+                print(f"  ✗ {url[:60]}: {str(e)[:60]}")
+            seconds += time.monotonic() - start
+            size, count = driver.execute_script(_TRANSFER_SCRIPT)
+            transferred += size
+            requests += count
+            peak_rss = max(peak_rss, chrome_rss(driver.driver) or 0)
+    finally:
+        driver._stop()
+    return seconds, transferred, requests, peak_rss
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'compare':
+        print(__doc__)
+        return
+
+    urls = sys.argv[2:]
+    results = {}
+    for label, patterns in (('no blocking', []), ('blocking', blocked_url_patterns())):
+        print(f"Loading {len(urls)} pages ({label})...")
+        results[label] = _measure(urls, patterns)
+
+    print("=" * 70)
+    print(f"{'':14} {'sec/page':>10} {'KB/page':>10} {'requests/page':>14} {'peak RSS MB':>12}")
+    for label, (seconds, transferred, requests, peak_rss) in results.items():
+        print(f"{label:14} {seconds / len(urls):10.2f} {transferred / len(urls) / 1024:10.0f} "
+              f"{requests / len(urls):14.1f} {peak_rss / 1024 / 1024:12.0f}")
+    base, trimmed = results['no blocking'], results['blocking']
+    print("-" * 70)
+    print(f"Saved: {(base[0] - trimmed[0]) / len(urls):.2f} s/page, "
+          f"{(base[1] - trimmed[1]) / len(urls) / 1024:.0f} KB/page, "
+          f"{(base[3] - trimmed[3]) / 1024 / 1024:.0f} MB peak RSS")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
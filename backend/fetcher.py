@@ -0,0 +1,336 @@
+"""
+Page Fetcher
+Static HTML hosts are fetched concurrently over plain HTTP (asyncio +
+aiohttp) and parsed with lxml. Hosts that need JavaScript, or pages the
+HTTP path cannot handle, are loaded in the Selenium driver as before.
+
+Every request first takes a slot from the per-host politeness scheduler
+(politeness.py) unless throttle=False is passed.
+"""
+
+import asyncio
+import time
+import os
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+from dotenv import load_dotenv
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from politeness import get_scheduler, REPLAY_ORIGIN, USER_AGENT
+
+try:
+    import aiohttp
+    from lxml import html as lxml_html
+except ImportError:
+    aiohttp = None
+    lxml_html = None
+
+load_dotenv()
+
+# -------------------- SETTINGS --------------------
+
+# Hosts whose pages are complete in the server-rendered HTML
+STATIC_HOSTS = {
+    'arxiv.org',
+    'export.arxiv.org',
+    'machinelearningmastery.com',
+    'kdnuggets.com',
+    'distill.pub',
+    'geeksforgeeks.org',
+    'paperswithcode.com',
+    'analyticsvidhya.com',
+}
+
+# Hosts that render their content client-side and always need Chrome
+JS_REQUIRED_HOSTS = {
+    'medium.com',
+    'towardsdatascience.com',
+    'kaggle.com',
+    'huggingface.co',
+    'openai.com',
+    'deepmind.google',
+    'deepmind.com',
+}
+
+STATIC_HOSTS.update(h.strip() for h in os.getenv('STATIC_HOSTS', '').split(',') if h.strip())
+JS_REQUIRED_HOSTS.update(h.strip() for h in os.getenv('JS_REQUIRED_HOSTS', '').split(',') if h.strip())
+
+STATIC_CONCURRENCY = int(os.getenv('STATIC_CONCURRENCY', '32'))
+STATIC_PER_HOST = int(os.getenv('STATIC_PER_HOST', '8'))
+STATIC_TIMEOUT = float(os.getenv('STATIC_TIMEOUT', '15'))
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+EXTRACT_MAX_CHARS = int(os.getenv('EXTRACT_MAX_CHARS', '20000'))
+# Also return the raw HTML, for the page store (page_store.py)
+KEEP_HTML = os.getenv('PAGE_STORE_HTML', '0') == '1'
+
+# etag / last_modified are the response's HTTP validators (HTTP path only);
+# timings maps a stage (wait, fetch, render, extract) to seconds spent in it;
+# anchors maps a link to the text of its first non-empty anchor; html is
+# the raw page, only kept with PAGE_STORE_HTML=1
+PageData = namedtuple(
+    'PageData',
+    ['url', 'title', 'description', 'content', 'links', 'etag', 'last_modified', 'timings',
+     'anchors', 'html'],
+    defaults=(None, None, None, None, None)
+)
+
+ANCHOR_MAX_CHARS = 100
+
+class StaticFetchError(Exception):
+    """The server answered, but not with a usable HTML page"""
+
+class PageNotModified(StaticFetchError):
+    """A conditional request came back 304 Not Modified"""
+
+# -------------------- ROUTING --------------------
+
+def _host_matches(host, hosts):
+    """True if host or one of its parent domains is in hosts"""
+    parts = host.split('.')
+    return any('.'.join(parts[i:]) in hosts for i in range(len(parts)))
+
+def is_static_url(url):
+    """Return True if the URL can be fetched without a browser"""
+    if aiohttp is None:
+        return False
+    if REPLAY_ORIGIN:
+        return True
+    host = (urlsplit(url).hostname or '').lower()
+    if _host_matches(host, JS_REQUIRED_HOSTS):
+        return False
+    return _host_matches(host, STATIC_HOSTS)
+
+# -------------------- HTML PARSING --------------------
+
+def parse_html(html, base_url):
+    """Extract title, meta description, body text and absolute links"""
+    doc = lxml_html.fromstring(html)
+
+    for element in doc.xpath('//script | //style | //noscript | //template'):
+        element.drop_tree()
+
+    base_href = doc.xpath('//base/@href')
+    if base_href:
+        base_url = urljoin(base_url, base_href[0])
+
+    title = ' '.join(doc.findtext('.//title', default='').split())
+
+    description = doc.xpath('//meta[@name="description"]/@content')
+    description = description[0].strip() if description else ''
+
+    body = doc.find('body')
+    text = ' '.join((body if body is not None else doc).itertext())
+    content = ' '.join(text.split())[:EXTRACT_MAX_CHARS]
+
+    links = []
+    anchors = {}
+    for anchor in doc.iter('a'):
+        href = anchor.get('href')
+        if not href:
+            continue
+        href = urljoin(base_url, href.strip())
+        if not href.startswith('http'):
+            continue
+        if href not in anchors:
+            links.append(href)
+            anchors[href] = ''
+        if not anchors[href]:
+            anchors[href] = ' '.join(anchor.text_content().split())[:ANCHOR_MAX_CHARS]
+
+    return PageData(base_url, title, description, content, links, anchors=anchors)
+
+# -------------------- HTTP FETCH --------------------
+
+def _request_url(url):
+    if not REPLAY_ORIGIN:
+        return url
+    parts = urlsplit(url)
+    return f"{REPLAY_ORIGIN}/{parts.netloc}{parts.path or '/'}" + (f"?{parts.query}" if parts.query else '')
+
+def _conditional_headers(validators):
+    """If-None-Match / If-Modified-Since headers for an (etag, last_modified) pair"""
+    headers = {}
+    if validators:
+        etag, last_modified = validators
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    return headers
+
+async def _fetch_one(session, url, semaphore, scheduler, validators=None):
+    start = time.monotonic()
+    if scheduler is not None:
+        await scheduler.acquire_async(url)
+    async with semaphore:
+        wait = time.monotonic() - start
+        start = time.monotonic()
+        ok = False
+        try:
+            async with session.get(_request_url(url), allow_redirects=True,
+                                   headers=_conditional_headers(validators)) as response:
+                if response.status == 304:
+                    ok = True
+                    raise PageNotModified("HTTP 304")
+                if response.status != 200:
+                    raise StaticFetchError(f"HTTP {response.status}")
+                content_type = response.headers.get('Content-Type', '')
+                if 'html' not in content_type:
+                    raise StaticFetchError(f"Not HTML ({content_type})")
+                raw = await response.content.read(MAX_PAGE_BYTES)
+                ok = True
+        finally:
+            fetch = time.monotonic() - start
+            if scheduler is not None:
+                scheduler.record(url, fetch, ok)
+        start = time.monotonic()
+        page = parse_html(raw, url if REPLAY_ORIGIN else str(response.url))
+        return page._replace(
+            url=url,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified'),
+            timings={'wait': wait, 'fetch': fetch, 'extract': time.monotonic() - start},
+            html=raw.decode(response.charset or 'utf-8', errors='replace') if KEEP_HTML else None
+        )
+
+async def _fetch_all(urls, concurrency, scheduler, validators):
+    timeout = aiohttp.ClientTimeout(total=STATIC_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=STATIC_PER_HOST)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession(
+        timeout=timeout, connector=connector, headers={'User-Agent': USER_AGENT}
+    ) as session:
+        return await asyncio.gather(
+            *(_fetch_one(session, url, semaphore, scheduler, validators.get(url)) for url in urls),
+            return_exceptions=True
+        )
+
+def fetch_static_pages(urls, concurrency=STATIC_CONCURRENCY, throttle=True, validators=None):
+    """Fetch URLs concurrently over HTTP.
+
+    Returns a list aligned with urls holding a PageData or the exception
+    raised for that URL. validators maps a URL to its stored (etag,
+    last_modified) to make the request conditional; an unchanged page
+    comes back as a PageNotModified exception.
+    """
+    if not urls:
+        return []
+    scheduler = get_scheduler() if throttle else None
+    return asyncio.run(_fetch_all(list(urls), concurrency, scheduler, validators or {}))
+
+# -------------------- SELENIUM FETCH --------------------
+
+# Returns [title, meta description, body text, unique absolute http(s) hrefs,
+# {href: anchor text}] in one WebDriver round trip instead of one call per
+# field and per anchor
+EXTRACT_SCRIPT = """
+const maxChars = arguments[0];
+const anchorChars = arguments[1];
+const meta = document.querySelector('meta[name="description"]');
+const body = document.body ? document.body.innerText || '' : '';
+const anchors = {};
+const links = [];
+for (const a of document.getElementsByTagName('a')) {
+    const href = a.href;
+    if (!href || !href.startsWith('http')) continue;
+    if (!(href in anchors)) {
+        links.push(href);
+        anchors[href] = '';
+    }
+    if (!anchors[href]) {
+        anchors[href] = (a.textContent || '').replace(/\\s+/g, ' ').trim().slice(0, anchorChars);
+    }
+}
+return [
+    document.title || '',
+    meta ? meta.getAttribute('content') || '' : '',
+    maxChars ? body.slice(0, maxChars) : body,
+    links,
+    anchors
+];
+"""
+
+def extract_page(driver, url, max_chars=EXTRACT_MAX_CHARS):
+    """Extract title, description, body text, links and anchor texts from the loaded page"""
+    title, description, content, links, anchors = driver.execute_script(
+        EXTRACT_SCRIPT, max_chars, ANCHOR_MAX_CHARS
+    )
+    return PageData(url, title, description, content, links, anchors=anchors)
+
+def fetch_with_driver(driver, url, render_wait=1):
+    """Load a page in the Selenium driver and extract the same fields.
+
+    Waits at most render_wait seconds for the document to finish loading
+    instead of always sleeping that long.
+    """
+    start = time.monotonic()
+    driver.get(url)
+    loaded = time.monotonic()
+    try:
+        WebDriverWait(driver, render_wait, poll_frequency=0.1).until(
+            lambda d: d.execute_script('return document.readyState') == 'complete'
+        )
+    except Exception:
+        pass
+    rendered = time.monotonic()
+
+    page = extract_page(driver, url)
+    return page._replace(
+        timings={
+            'fetch': loaded - start,
+            'render': rendered - loaded,
+            'extract': time.monotonic() - rendered,
+        },
+        html=driver.page_source if KEEP_HTML else None
+    )
+
+# -------------------- COMBINED --------------------
+
+def fetch_pages(urls, driver, render_wait=1, throttle=True, validators=None):
+    """Fetch a batch of URLs, static hosts over HTTP and the rest in Chrome.
+
+    Returns a list aligned with urls holding a PageData or the exception
+    raised for that URL. A static URL whose HTTP fetch hits a network error
+    or timeout is retried in the driver; HTTP errors are final. validators
+    is passed on to fetch_static_pages().
+    """
+    scheduler = get_scheduler() if throttle else None
+    results = [None] * len(urls)
+
+    static = [i for i, url in enumerate(urls) if is_static_url(url)]
+    static_results = fetch_static_pages([urls[i] for i in static], throttle=throttle,
+                                        validators=validators)
+    for i, result in zip(static, static_results):
+        results[i] = result
+
+    browser = [
+        url for i, url in enumerate(urls)
+        if results[i] is None or (
+            isinstance(results[i], Exception) and not isinstance(results[i], StaticFetchError)
+        )
+    ]
+    if scheduler is not None:
+        # Visit hosts round-robin so one slow host does not hold up the rest
+        browser = scheduler.interleave(browser)
+
+    positions = {url: i for i, url in enumerate(urls)}
+    for url in browser:
+        i = positions[url]
+        if driver is None:
+            results[i] = results[i] or RuntimeError("No driver for browser-only URL")
+            continue
+        start = time.monotonic()
+        if scheduler is not None:
+            scheduler.acquire(url)
+        wait = time.monotonic() - start
+        start = time.monotonic()
+        try:
+            results[i] = fetch_with_driver(driver, url, render_wait)
+            results[i].timings['wait'] = wait
+        except Exception as e:
+            results[i] = e
+        if scheduler is not None:
+            scheduler.record(url, time.monotonic() - start, not isinstance(results[i], Exception))
+
+    return results
@@ -0,0 +1,605 @@
+"""
+Crawl Frontier
+The queue of URLs still to crawl for one target plus the visited
+bookkeeping around it.
+
+The queue is best-first by default: PriorityQueue pops the URL with the
+highest crawl_priority score (relevance, inlinks, depth, host share).
+CRAWL_FRONTIER=bfs restores the plain FIFO order.
+
+MemoryFrontier keeps the queue in memory. PersistentFrontier keeps
+the same queue in memory but mirrors every change into SQLite tables
+(crawl_targets, crawl_frontier) in a separate crawl-state database, with
+periodic checkpoints, so an interrupted run can be resumed with --resume.
+
+URLs are queued and tracked by their canonical form (urlnorm.py), but
+fetched as they were discovered or as the seed was given: canonicalizing
+upgrades http to https and drops 'www.', which not every host serves.
+fetch_url() maps a queued URL back to that spelling.
+
+With VISITED_FILTER=bloom the crawler-wide visited set is a VisitedFilter:
+a Bloom filter in memory backed by the crawl_visited table, so
+multi-million-URL crawls keep a few bits per URL in memory instead of
+every URL string.
+"""
+
+import sqlite3
+import hashlib
+import heapq
+import itertools
+import math
+import time
+import os
+from collections import deque
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+from crawl_priority import Candidate, default_scorer
+from crawl_writer import flush_all
+from urlnorm import canonicalize_url
+
+load_dotenv()
+
+# Kept out of the main database so checkpoint transactions never block
+# the crawler's resource/link writes
+CRAWL_STATE_PATH = os.getenv('CRAWL_STATE_PATH', '../database/crawl_state.db')
+CRAWL_STATE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), CRAWL_STATE_PATH))
+
+CHECKPOINT_EVERY = int(os.getenv('CRAWL_CHECKPOINT_EVERY', '200'))
+CHECKPOINT_SECONDS = float(os.getenv('CRAWL_CHECKPOINT_SECONDS', '15'))
+FRONTIER_MAX_RETRIES = int(os.getenv('FRONTIER_MAX_RETRIES', '2'))
+
+CRAWL_FRONTIER = os.getenv('CRAWL_FRONTIER', 'priority')   # 'priority' or 'bfs'
+
+VISITED_FILTER = os.getenv('VISITED_FILTER', 'set')        # 'set' or 'bloom'
+VISITED_FILTER_CAPACITY = int(os.getenv('VISITED_FILTER_CAPACITY', '10000000'))
+VISITED_FILTER_ERROR = float(os.getenv('VISITED_FILTER_ERROR', '0.01'))
+
+# URL states
+QUEUED = 'queued'
+FETCHING = 'fetching'
+FETCHED = 'fetched'
+FAILED = 'failed'
+
+# -------------------- QUEUES --------------------
+
+class FifoQueue:
+    """Breadth-first order; a URL pushed twice is queued twice"""
+
+    def __init__(self):
+        self.items = deque()
+
+    def __len__(self):
+        return len(self.items)
+
+    def push(self, url, depth, anchor='', lastmod=None):
+        self.items.append((url, depth))
+
+    def seed(self, url, depth, anchor='', lastmod=None):
+        self.push(url, depth)
+
+    def bump(self, url, anchor=''):
+        pass
+
+    def pop(self):
+        return self.items.popleft() if self.items else None
+
+class PriorityQueue:
+    """Best-first order over a heap with lazy deletion.
+
+    Pushing a URL that is already queued counts another inlink and
+    re-scores it: the new heap entry gets a new version and the old one is
+    skipped when it surfaces. Seeding a URL that is already queued only
+    adds its lastmod, since a sitemap or feed entry is not an inlink.
+
+    Host shares change as pages are taken, so the top entry is re-scored
+    before it is popped and pushed back if it is no longer the best.
+    """
+
+    def __init__(self, scorer=None):
+        self.scorer = scorer or default_scorer()
+        self.heap = []
+        self.entries = {}       # url -> [depth, anchor, inlinks, version, lastmod]
+        self.host_pages = {}
+        self.versions = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, url):
+        return url in self.entries
+
+    def _score(self, url, entry):
+        host = _host(url)
+        return self.scorer(Candidate(url, entry[1], entry[0], entry[2], self.host_pages.get(host, 0),
+                                     entry[4]))
+
+    def _push_entry(self, url, entry, score=None):
+        if score is None:
+            score = self._score(url, entry)
+        entry[3] = next(self.versions)
+        heapq.heappush(self.heap, (-score, entry[3], url))
+        # Drop stale entries once they outnumber the live ones
+        if len(self.heap) > 2 * len(self.entries) + 1024:
+            self.heap = [item for item in self.heap
+                         if item[2] in self.entries and self.entries[item[2]][3] == item[1]]
+            heapq.heapify(self.heap)
+
+    def push(self, url, depth, anchor='', lastmod=None):
+        entry = self.entries.get(url)
+        if entry is None:
+            entry = self.entries[url] = [depth, anchor, 1, 0, lastmod]
+        else:
+            entry[0] = min(entry[0], depth)
+            entry[1] = entry[1] or anchor
+            entry[2] += 1
+            entry[4] = entry[4] or lastmod
+        self._push_entry(url, entry)
+
+    def seed(self, url, depth, anchor='', lastmod=None):
+        """Queue a sitemap or feed URL, or give a queued one its lastmod"""
+        entry = self.entries.get(url)
+        if entry is None:
+            self.push(url, depth, anchor, lastmod)
+        elif lastmod and not entry[4]:
+            entry[4] = lastmod
+            self._push_entry(url, entry)
+
+    def bump(self, url, anchor=''):
+        """Count another inlink to a URL if it is still queued"""
+        entry = self.entries.get(url)
+        if entry is not None:
+            self.push(url, entry[0], anchor)
+
+    def pop(self):
+        while self.heap:
+            negative_score, version, url = heapq.heappop(self.heap)
+            entry = self.entries.get(url)
+            if entry is None or entry[3] != version:
+                continue
+            score = self._score(url, entry)
+            if self.heap and score < -self.heap[0][0]:
+                self._push_entry(url, entry, score)
+                continue
+            del self.entries[url]
+            host = _host(url)
+            self.host_pages[host] = self.host_pages.get(host, 0) + 1
+            return url, entry[0]
+        return None
+
+def _host(url):
+    return urlsplit(url).netloc
+
+def make_queue(scorer=None):
+    """Queue for a new frontier, as selected by CRAWL_FRONTIER"""
+    if CRAWL_FRONTIER == 'bfs':
+        return FifoQueue()
+    return PriorityQueue(scorer)
+
+# -------------------- IN-MEMORY FRONTIER --------------------
+
+class MemoryFrontier:
+    """Crawl queue for one target; nothing survives a restart"""
+
+    def __init__(self, start_url, visited_links, queue=None):
+        self.queue = queue if queue is not None else make_queue()
+        self.fetch_urls = {}
+        url = canonicalize_url(start_url)
+        self._spelling(url, start_url)
+        self.queue.push(url, 1)
+        self.site_visited = set()
+        self.visited_links = visited_links
+        self.pages_crawled = 0
+
+    def __bool__(self):
+        return len(self.queue) > 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def pop(self):
+        """Return the next (url, depth) or None when the queue is empty"""
+        return self.queue.pop()
+
+    def push(self, url, depth, anchor='', fetch_url=None):
+        self._spelling(url, fetch_url)
+        self.queue.push(url, depth, anchor)
+
+    def push_many(self, rows):
+        """Queue (url, depth, anchor, lastmod, fetch_url) seed rows from discovery.py.
+
+        Seeds are not links: a URL that is already queued keeps its inlink
+        count.
+        """
+        for url, depth, anchor, lastmod, fetch_url in rows:
+            self._spelling(url, fetch_url)
+            self.queue.seed(url, depth, anchor, lastmod)
+
+    def _spelling(self, url, fetch_url):
+        # Only kept where it differs; the first spelling seen wins
+        if fetch_url and fetch_url != url and url not in self.fetch_urls:
+            self.fetch_urls[url] = fetch_url
+            return True
+        return False
+
+    def fetch_url(self, url):
+        """The URL to request for a queued one: as discovered, or as the seed was given"""
+        return self.fetch_urls.get(url, url)
+
+    def is_visited(self, url):
+        return url in self.visited_links or url in self.site_visited
+
+    def mark_visited(self, url):
+        self.site_visited.add(url)
+        self.visited_links.add(url)
+
+    def mark_fetched(self, url, stored=True):
+        """Record a fetched page; only stored ones count toward the budget"""
+        self.fetch_urls.pop(url, None)
+        if stored:
+            self.pages_crawled += 1
+
+    def mark_failed(self, url, error):
+        self.fetch_urls.pop(url, None)
+
+# -------------------- PERSISTENT FRONTIER --------------------
+
+class PersistentFrontier(MemoryFrontier):
+    """MemoryFrontier whose queue, URL states and budget live in SQLite"""
+
+    def __init__(self, store, target_id, visited_links, queued, site_visited, pages_crawled,
+                 queue=None):
+        self.store = store
+        self.target_id = target_id
+        self.queue = queue if queue is not None else make_queue()
+        for url, depth, lastmod, _ in queued:
+            self.queue.push(url, depth, lastmod=lastmod)
+        self.known = {url for url, _, _, _ in queued} | site_visited
+        self.site_visited = site_visited
+        self.visited_links = visited_links
+        self.pages_crawled = pages_crawled
+        self.depths = {url: depth for url, depth, _, _ in queued}
+        self.lastmods = {url: lastmod for url, _, lastmod, _ in queued if lastmod}
+        self.fetch_urls = {url: fetch_url for url, _, _, fetch_url in queued if fetch_url}
+
+    def push(self, url, depth, anchor='', fetch_url=None):
+        if url in self.known:
+            self.queue.bump(url, anchor)
+            return
+        self.known.add(url)
+        self.depths[url] = depth
+        self.queue.push(url, depth, anchor)
+        self.store.execute(
+            "INSERT OR IGNORE INTO crawl_frontier (target_id, url, depth, fetch_url) VALUES (?, ?, ?, ?)",
+            (self.target_id, url, depth, fetch_url if self._spelling(url, fetch_url) else None)
+        )
+
+    def push_many(self, rows):
+        """Queue (url, depth, anchor, lastmod, fetch_url) seed rows with one insert and one commit.
+
+        URLs the target already knows are not pushed again, so seeding
+        again on --resume does not count the seeds as inlinks a second
+        time; a queued one only picks up a lastmod it did not have (the
+        start URL is queued before its seed row arrives).
+        """
+        new = []
+        dated = []
+        for url, depth, anchor, lastmod, fetch_url in rows:
+            if url in self.known:
+                if lastmod and url not in self.site_visited and url not in self.lastmods:
+                    self.lastmods[url] = lastmod
+                    self.queue.seed(url, depth, anchor, lastmod)
+                    dated.append((lastmod, self.target_id, url))
+                continue
+            self.known.add(url)
+            self.depths[url] = depth
+            if lastmod:
+                self.lastmods[url] = lastmod
+            self.queue.push(url, depth, anchor, lastmod)
+            new.append((self.target_id, url, depth, lastmod,
+                        fetch_url if self._spelling(url, fetch_url) else None))
+        self.store.conn.executemany("""
+            INSERT OR IGNORE INTO crawl_frontier (target_id, url, depth, lastmod, fetch_url)
+            VALUES (?, ?, ?, ?, ?)
+        """, new)
+        self.store.conn.executemany(
+            "UPDATE crawl_frontier SET lastmod = ? WHERE target_id = ? AND url = ? AND lastmod IS NULL", dated
+        )
+        self.store.checkpoint()
+
+    def mark_visited(self, url):
+        super().mark_visited(url)
+        self._set_state(url, FETCHING)
+
+    def mark_fetched(self, url, stored=True):
+        super().mark_fetched(url, stored)
+        self._set_state(url, FETCHED)
+        if stored:
+            self.store.execute(
+                "UPDATE crawl_targets SET pages_crawled = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (self.pages_crawled, self.target_id)
+            )
+
+    def mark_failed(self, url, error):
+        """Record a failure and requeue the URL until it runs out of retries"""
+        row = self.store.conn.execute(
+            "SELECT retries FROM crawl_frontier WHERE target_id = ? AND url = ?",
+            (self.target_id, url)
+        ).fetchone()
+        retries = (row[0] if row else 0) + 1
+
+        if retries <= FRONTIER_MAX_RETRIES:
+            state = QUEUED
+            self.site_visited.discard(url)
+            self.visited_links.discard(url)
+            self.queue.push(url, self.depths.get(url, 1), lastmod=self.lastmods.get(url))
+        else:
+            state = FAILED
+            self.fetch_urls.pop(url, None)
+
+        self.store.execute("""
+            UPDATE crawl_frontier
+            SET state = ?, retries = ?, last_error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE target_id = ? AND url = ?
+        """, (state, retries, str(error)[:500], self.target_id, url))
+
+    def _set_state(self, url, state):
+        self.store.execute("""
+            UPDATE crawl_frontier SET state = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE target_id = ? AND url = ?
+        """, (state, self.target_id, url))
+
+# -------------------- VISITED FILTER --------------------
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+class VisitedFilter:
+    """Set-like visited URLs: a Bloom filter in front of the crawl_visited table.
+
+    A negative answer from the filter is final. A positive one is checked
+    against the table, so false positives cost one indexed lookup and never
+    make the crawler skip a new page. Removed URLs stay set in the filter
+    and simply fall through to the table.
+    """
+
+    def __init__(self, store, capacity=VISITED_FILTER_CAPACITY, error_rate=VISITED_FILTER_ERROR):
+        self.store = store
+        self.filter = BloomFilter(capacity, error_rate)
+        self.count = 0
+        for (url,) in store.conn.execute(
+            "SELECT url FROM crawl_visited WHERE crawler = ?", (store.crawler,)
+        ):
+            self.filter.add(url)
+            self.count += 1
+
+    def __contains__(self, url):
+        if url not in self.filter:
+            return False
+        return self.store.conn.execute(
+            "SELECT 1 FROM crawl_visited WHERE crawler = ? AND url = ?",
+            (self.store.crawler, url)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, url):
+        if url in self:
+            return
+        self.filter.add(url)
+        self.count += 1
+        self.store.execute(
+            "INSERT OR IGNORE INTO crawl_visited (crawler, url) VALUES (?, ?)",
+            (self.store.crawler, url)
+        )
+
+    def discard(self, url):
+        if url in self:
+            self.count -= 1
+            self.store.execute(
+                "DELETE FROM crawl_visited WHERE crawler = ? AND url = ?",
+                (self.store.crawler, url)
+            )
+
+# -------------------- CRAWL STATE STORE --------------------
+
+def ensure_frontier_tables(conn):
+    """Create the crawl-state tables if they do not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_targets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            crawler TEXT NOT NULL,
+            name TEXT NOT NULL,
+            start_url TEXT NOT NULL,
+            max_depth INTEGER NOT NULL,
+            max_pages INTEGER,
+            pages_crawled INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'running',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (crawler, name)
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_frontier (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target_id INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            retries INTEGER DEFAULT 0,
+            last_error TEXT,
+            lastmod TEXT,
+            fetch_url TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (target_id) REFERENCES crawl_targets(id) ON DELETE CASCADE,
+            UNIQUE (target_id, url)
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_visited (
+            crawler TEXT NOT NULL,
+            url TEXT NOT NULL,
+            PRIMARY KEY (crawler, url)
+        ) WITHOUT ROWID;
+    """)
+    # State files from before seeds kept their sitemap/feed lastmod
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(crawl_frontier)")}
+    if 'lastmod' not in columns:
+        conn.execute("ALTER TABLE crawl_frontier ADD COLUMN lastmod TEXT")
+    # ... and before URLs were fetched as discovered (NULL: fetch the url itself)
+    if 'fetch_url' not in columns:
+        conn.execute("ALTER TABLE crawl_frontier ADD COLUMN fetch_url TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_frontier_state ON crawl_frontier(target_id, state);")
+    conn.commit()
+
+class CrawlStateStore:
+    """Crawl-state database for one crawler script (e.g. 'mega')"""
+
+    def __init__(self, crawler, resume=False, path=CRAWL_STATE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.crawler = crawler
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        ensure_frontier_tables(self.conn)
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+        if resume:
+            # Pages that were being fetched when the run stopped go back in the queue
+            self.conn.execute("""
+                DELETE FROM crawl_visited WHERE crawler = ? AND url IN (
+                    SELECT f.url FROM crawl_frontier f
+                    JOIN crawl_targets t ON f.target_id = t.id
+                    WHERE t.crawler = ? AND f.state = 'fetching'
+                )
+            """, (crawler, crawler))
+            self.conn.execute("""
+                UPDATE crawl_frontier SET state = 'queued'
+                WHERE state = 'fetching' AND target_id IN
+                    (SELECT id FROM crawl_targets WHERE crawler = ?)
+            """, (crawler,))
+        else:
+            self.conn.execute("""
+                DELETE FROM crawl_frontier WHERE target_id IN
+                    (SELECT id FROM crawl_targets WHERE crawler = ?)
+            """, (crawler,))
+            self.conn.execute("DELETE FROM crawl_targets WHERE crawler = ?", (crawler,))
+            self.conn.execute("DELETE FROM crawl_visited WHERE crawler = ?", (crawler,))
+        self.conn.commit()
+
+    def execute(self, sql, params=()):
+        """Run a write inside the open transaction, checkpointing periodically"""
+        self.conn.execute(sql, params)
+        self.pending += 1
+        if (self.pending >= CHECKPOINT_EVERY
+                or time.time() - self.last_checkpoint >= CHECKPOINT_SECONDS):
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Commit everything recorded since the last checkpoint.
+
+        Buffered resource and link rows and page bodies are written first,
+        so a page is never committed as fetched before it is stored. If
+        they cannot be written the checkpoint waits for the next one.
+        """
+        try:
+            flush_all()
+            self.conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Checkpoint postponed, crawled pages are not written yet: {e}")
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+    def load_visited(self):
+        """URLs already claimed by any target of this crawler.
+
+        Returns a plain set, or a VisitedFilter when VISITED_FILTER=bloom.
+        """
+        if VISITED_FILTER == 'bloom':
+            return VisitedFilter(self)
+
+        rows = self.conn.execute("""
+            SELECT f.url FROM crawl_frontier f
+            JOIN crawl_targets t ON f.target_id = t.id
+            WHERE t.crawler = ? AND f.state != 'queued'
+        """, (self.crawler,))
+        return {url for (url,) in rows}
+
+    def is_done(self, name):
+        row = self.conn.execute(
+            "SELECT status FROM crawl_targets WHERE crawler = ? AND name = ?",
+            (self.crawler, name)
+        ).fetchone()
+        return row is not None and row[0] == 'done'
+
+    def target_frontier(self, name, start_url, max_depth, max_pages, visited_links, scorer=None):
+        """Return the frontier for a target, restoring it if it was started before.
+
+        Restored URLs are re-scored without their anchor text and inlink
+        counts, which are not persisted; seeds keep their lastmod. The start
+        URL is fetched as given.
+        """
+        given_url = start_url
+        start_url = canonicalize_url(start_url)
+        self.conn.execute("""
+            INSERT OR IGNORE INTO crawl_targets (crawler, name, start_url, max_depth, max_pages)
+            VALUES (?, ?, ?, ?, ?)
+        """, (self.crawler, name, start_url, max_depth, max_pages))
+        target_id, pages_crawled = self.conn.execute(
+            "SELECT id, pages_crawled FROM crawl_targets WHERE crawler = ? AND name = ?",
+            (self.crawler, name)
+        ).fetchone()
+        self.conn.execute(
+            "INSERT OR IGNORE INTO crawl_frontier (target_id, url, depth, fetch_url) VALUES (?, ?, 1, ?)",
+            (target_id, start_url, given_url if given_url != start_url else None)
+        )
+        self.checkpoint()
+
+        queued = []
+        site_visited = set()
+        rows = self.conn.execute("""
+            SELECT url, depth, state, lastmod, fetch_url FROM crawl_frontier
+            WHERE target_id = ? ORDER BY id
+        """, (target_id,))
+        for url, depth, state, lastmod, fetch_url in rows:
+            if state == QUEUED:
+                queued.append((url, depth, lastmod, fetch_url))
+            else:
+                site_visited.add(url)
+
+        return PersistentFrontier(self, target_id, visited_links, queued, site_visited, pages_crawled,
+                                  queue=make_queue(scorer))
+
+    def finish_target(self, frontier):
+        """Mark a target as done once its queue is drained or its budget is spent"""
+        self.execute(
+            "UPDATE crawl_targets SET status = 'done', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (frontier.target_id,)
+        )
+        self.checkpoint()
+
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
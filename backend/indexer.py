@@ -1,13 +1,21 @@
 import sqlite3
+import argparse
+import multiprocessing as mp
+import queue
+import threading
 import time
 import os
+from collections import deque
 from dotenv import load_dotenv
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 
-from sklearn.feature_extraction.text import TfidfVectorizer
+from compression import encode_text, decode_row
+from driver_supervisor import SupervisedDriver
+from fetcher import fetch_pages, is_static_url
+from keywords import EXTRACTOR_VERSION, current_corpus_stats, document_text, top_terms
+from page_store import PAGE_STORE_ENABLED, PAGE_STORE_PATH, blob_hash, get_page_store
 
 load_dotenv()
 
@@ -18,25 +26,109 @@ DATABASE_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), DATABASE_PATH)
 )
 
-# -------------------- DB FETCH --------------------
+INDEX_FETCH_WORKERS = int(os.getenv('INDEX_FETCH_WORKERS', '4'))
+INDEX_EXTRACT_WORKERS = int(os.getenv('INDEX_EXTRACT_WORKERS', '0'))   # 0 = one per CPU
+INDEX_QUEUE_SIZE = int(os.getenv('INDEX_QUEUE_SIZE', '256'))            # documents waiting for extraction
+INDEX_BATCH = int(os.getenv('INDEX_BATCH', '1000'))                     # documents per extraction task
+INDEX_WRITE_BATCH = int(os.getenv('INDEX_WRITE_BATCH', '500'))
+INDEX_RENDER_WAIT = float(os.getenv('INDEX_RENDER_WAIT', '3'))
+INDEX_PROGRESS_SECONDS = float(os.getenv('INDEX_PROGRESS_SECONDS', '5'))
+INDEX_MAX_RETRIES = int(os.getenv('INDEX_MAX_RETRIES', '3'))
 
-def fetch_pages_without_summary():
-    """Fetch all pages that need summaries"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT url, description, title
-        FROM resources
-        WHERE summary IS NULL OR summary = ''
+# -------------------- INDEX STATE --------------------
+
+def ensure_index_tables(conn):
+    """Create the index state and change log tables if they do not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_state (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            extractor_version INTEGER,
+            status TEXT NOT NULL,
+            retries INTEGER DEFAULT 0,
+            last_error TEXT,
+            indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (url) REFERENCES resources(url) ON DELETE CASCADE
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS index_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            change TEXT NOT NULL,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
     """)
-    rows = cursor.fetchall()
+    conn.commit()
+
+def read_changes(conn, since_id=0):
+    """Change log entries after since_id as (id, url, change).
+
+    change is 'added', 'updated' or 'removed'. Consumers such as the search
+    index and PageRank keep the last id they applied and read from there.
+    """
+    return conn.execute(
+        "SELECT id, url, change FROM index_changes WHERE id > ? ORDER BY id", (since_id,)
+    ).fetchall()
+
+def fetch_pages_without_summary(incremental=False):
+    """Fetch the pages to index as (url, description, title, previous status).
+
+    By default: pages without a summary, except pages that were empty or
+    whose fetch failed INDEX_MAX_RETRIES times. With incremental=True: new
+    pages, failed pages with retries left, pages whose summary was cleared
+    (recrawl.py) or came from an older extractor, and pages whose stored
+    body changed since they were indexed.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    ensure_index_tables(conn)
+    if not incremental:
+        # Pages never indexed have no index_state row, so s.* is NULL
+        condition = """
+            (r.summary IS NULL OR r.summary = '')
+            AND NOT (s.status IS 'failed' AND COALESCE(s.retries, 0) >= :retries)
+            AND NOT (r.summary IS '' AND s.status IS 'empty')
+        """
+        join = ""
+    else:
+        condition = """
+            s.url IS NULL
+            OR (s.status = 'failed' AND s.retries < :retries)
+            OR (s.status != 'failed' AND (r.summary IS NULL OR s.extractor_version IS NOT :version))
+        """
+        join = ""
+        if page_store_exists():
+            # Bodies stored by recrawl.py or a later crawl have a new hash
+            conn.execute("ATTACH DATABASE ? AS store", (PAGE_STORE_PATH,))
+            join = "LEFT JOIN store.pages p ON p.url = r.url"
+            condition += " OR (p.text_hash IS NOT NULL AND p.text_hash IS NOT s.content_hash)"
+    cursor = conn.execute(f"""
+        SELECT r.url, r.description, r.title, s.status
+        FROM resources r
+        LEFT JOIN index_state s ON s.url = r.url
+        {join}
+        WHERE {condition}
+    """, {'retries': INDEX_MAX_RETRIES, 'version': EXTRACTOR_VERSION})
+    rows = [decode_row(row, conn, (1,)) for row in cursor.fetchall()]
     conn.close()
     return rows
 
+def page_store_exists():
+    return PAGE_STORE_ENABLED and os.path.exists(PAGE_STORE_PATH)
+
+def remove_stale_state(conn):
+    """Drop index state for deleted resources and log them as removed"""
+    removed = conn.execute(
+        "DELETE FROM index_state WHERE url NOT IN (SELECT url FROM resources) RETURNING url"
+    ).fetchall()
+    conn.executemany("INSERT INTO index_changes (url, change) VALUES (?, 'removed')", removed)
+    conn.commit()
+    return len(removed)
+
 # -------------------- SELENIUM --------------------
 
 def setup_driver():
-    """Set up Selenium WebDriver (auto-managed ChromeDriver)"""
+    """Set up Selenium WebDriver (auto-managed ChromeDriver) under a SupervisedDriver"""
     chrome_options = Options()
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--no-sandbox")
@@ -44,96 +136,286 @@ def setup_driver():
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--window-size=1920,1080")
 
-    return webdriver.Chrome(options=chrome_options)
+    return SupervisedDriver(lambda: webdriver.Chrome(options=chrome_options))
 
 def fetch_page_body(url, driver):
-    """Fetch the body text of a webpage"""
+    """Fetch the body text of a webpage (for pages missing from the page store).
+
+    Static hosts are fetched over HTTP; Chrome waits for the page to
+    finish loading (at most INDEX_RENDER_WAIT seconds) instead of always
+    sleeping. Raises the fetch error.
+    """
+    page = fetch_pages([url], driver, render_wait=INDEX_RENDER_WAIT)[0]
+    if isinstance(page, Exception):
+        raise page
+    return page.content
+
+# -------------------- FETCH STAGE --------------------
+
+def _fetch_worker(tasks, documents, page_store, stats):
+    """Turn (url, description, title) tasks into documents until a None arrives.
+
+    A document is (url, content, source, content hash, error); the hash is
+    the page store's hash of the body. The worker always ends by putting a
+    None on documents, even if it dies, so the extract loop never waits on
+    a thread that is gone.
+    """
+    driver = None
     try:
-        driver.get(url)
-        time.sleep(3)
-        body = driver.find_element(By.TAG_NAME, 'body').text
-        return body
-    except Exception as e:
-        print(f"Error fetching body for {url}: {e}")
-        return ""
-
-# -------------------- SUMMARY GENERATION --------------------
-
-def generate_summaries():
-    print("Starting summary generation...")
-    print("=" * 60)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            url, description, title = task
+            start = time.monotonic()
+            source = 'store'
+            error = None
+            try:
+                page_body = page_store.get_text(url) if page_store is not None else None
+                if page_body is None:
+                    source = 'fetched'
+                    if driver is None and not is_static_url(url):
+                        driver = setup_driver()
+                    page_body = fetch_page_body(url, driver)
+                    if page_store is not None and page_body:
+                        page_store.put(url, page_body)
+            except Exception as e:
+                print(f"Error fetching body for {url}: {str(e)[:80]}")
+                source = 'failed'
+                error = str(e)[:500]
+                page_body = ''
+            stats.add('fetch', time.monotonic() - start)
 
-    pages = fetch_pages_without_summary()
-    if not pages:
-        print("✓ All pages already have summaries!")
-        return
+            # Include title for better context (title is very important for matching)
+            documents.put((url, document_text(title, description, page_body), source,
+                           blob_hash(page_body.encode('utf-8')), error))
+    finally:
+        if driver is not None:
+            driver.quit()
+        documents.put(None)
+
+# -------------------- EXTRACT STAGE --------------------
+
+_idf = None
 
-    print(f"Found {len(pages)} pages to process")
+def _init_extractor(idf):
+    # Each extraction process gets the corpus IDF vector once
+    global _idf
+    _idf = idf
 
-    driver = setup_driver()
-    vectorizer = TfidfVectorizer(
-        max_features=30,
-        stop_words='english'
-    )
+def summarize_batch(documents):
+    """Keyword summaries for a batch of (url, content); returns ([(summary, url)], seconds)"""
+    start = time.process_time()
+    summaries = top_terms([content for _, content in documents], _idf)
+    results = [(" ".join(terms), url) for (url, _), terms in zip(documents, summaries)]
+    return results, time.process_time() - start
+
+# -------------------- PIPELINE --------------------
+
+class _StageStats:
+    """Seconds and counts per pipeline stage, shared by the fetch threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {'fetch': 0.0, 'extract': 0.0, 'write': 0.0}
+        self.sources = {'store': 0, 'fetched': 0, 'failed': 0}
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] += seconds
+
+def generate_summaries(fetch_workers=INDEX_FETCH_WORKERS, extract_workers=INDEX_EXTRACT_WORKERS,
+                       incremental=False):
+    """Summarize every page that needs it (see fetch_pages_without_summary).
+
+    Fetch threads read bodies from the page store (or fetch them) into a
+    bounded queue; batches of documents are summarized in a process pool
+    with the corpus IDF (keywords.py); summaries, index state and change
+    log entries are written back in batches by this process alone.
+    """
+    print(f"Starting {'incremental ' if incremental else ''}summary generation...")
+    print("=" * 60)
 
     conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    ensure_index_tables(conn)
+    if incremental:
+        removed = remove_stale_state(conn)
+        if removed:
+            print(f"✓ {removed} deleted resources logged as removed")
 
-    processed = 0
+    pages = fetch_pages_without_summary(incremental)
+    if not pages:
+        conn.close()
+        print("✓ All pages already have summaries!")
+        return
 
-    try:
-        for idx, (url, description, title) in enumerate(pages, start=1):
-            try:
-                print(f"[{idx}/{len(pages)}] Processing: {url}")
-
-                page_body = fetch_page_body(url, driver)
-                
-                # Include title for better context (title is very important for matching)
-                full_content = f"{title or ''} {description or ''} {page_body}"
-
-                if not full_content.strip():
-                    cursor.execute(
-                        "UPDATE resources SET summary = ? WHERE url = ?",
-                        ('', url)
-                    )
-                    conn.commit()
-                    continue
+    extract_workers = extract_workers or os.cpu_count() or 1
+    corpus = current_corpus_stats(DATABASE_PATH)
+    print(f"Found {len(pages)} pages to process "
+          f"({fetch_workers} fetch threads, {extract_workers} extract processes)")
 
-                tfidf_matrix = vectorizer.fit_transform([full_content])
-                terms = vectorizer.get_feature_names_out()
+    # Bodies come from the page store; Chrome is only started for pages
+    # crawled before the store existed
+    page_store = get_page_store()
+    stats = _StageStats()
+    tasks = queue.Queue()
+    documents = queue.Queue(maxsize=INDEX_QUEUE_SIZE)
+    previous = {}
+    for url, description, title, status in pages:
+        previous[url] = status
+        tasks.put((url, description, title))
+    for _ in range(fetch_workers):
+        tasks.put(None)
 
-                sorted_terms = [
-                    terms[i] for i in tfidf_matrix[0].indices
-                ]
+    hashes = {}          # url -> content hash of documents being summarized
+    updates = []         # (summary, url)
+    states = []          # (url, content_hash, status)
+    failures = []        # (url, error)
+    changes = {'added': 0, 'updated': 0}
+    processed = written = 0
 
-                # Create a richer summary with more terms
-                summary = " ".join(sorted_terms[:25])
+    def write(flush=False):
+        nonlocal updates, states, failures, written
+        if (flush and (updates or failures)) or len(updates) + len(failures) >= INDEX_WRITE_BATCH:
+            start = time.monotonic()
+            conn.executemany(
+                "UPDATE resources SET summary = ? WHERE url = ?",
+                [(encode_text(summary, conn) if summary else '', url) for summary, url in updates]
+            )
+            conn.executemany("""
+                INSERT INTO index_state (url, content_hash, extractor_version, status, retries, last_error)
+                VALUES (?, ?, ?, ?, 0, NULL)
+                ON CONFLICT(url) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    extractor_version = excluded.extractor_version,
+                    status = excluded.status, retries = 0, last_error = NULL,
+                    indexed_at = CURRENT_TIMESTAMP
+            """, [(url, content_hash, EXTRACTOR_VERSION, status) for url, content_hash, status in states])
+            conn.executemany("""
+                INSERT INTO index_state (url, extractor_version, status, retries, last_error)
+                VALUES (?, ?, 'failed', 1, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    status = 'failed', retries = retries + 1, last_error = excluded.last_error,
+                    indexed_at = CURRENT_TIMESTAMP
+            """, [(url, EXTRACTOR_VERSION, error) for url, error in failures])
+            # Pages indexed before are updates; new and previously failed pages are additions
+            logged = [(url, 'updated' if previous.get(url) in ('indexed', 'empty') else 'added')
+                      for _, url in updates]
+            conn.executemany("INSERT INTO index_changes (url, change) VALUES (?, ?)", logged)
+            conn.commit()
+            for _, change in logged:
+                changes[change] += 1
+            written += len(updates)
+            updates, states, failures = [], [], []
+            stats.add('write', time.monotonic() - start)
 
-                cursor.execute(
-                    "UPDATE resources SET summary = ? WHERE url = ?",
-                    (summary, url)
-                )
-                conn.commit()
+    def collect(result):
+        nonlocal processed
+        results, seconds = result.get()
+        stats.add('extract', seconds)
+        for summary, url in results:
+            updates.append((summary, url))
+            states.append((url, hashes.pop(url), 'indexed' if summary else 'empty'))
+        processed += sum(1 for summary, _ in results if summary)
+        write()
 
-                processed += 1
+    threads = []
+    start = time.time()
+    last_report = start
+    try:
+        # Fork the extraction processes before any fetch thread is running
+        with mp.Pool(extract_workers, initializer=_init_extractor, initargs=(corpus.idf(),)) as pool:
+            threads = [
+                threading.Thread(target=_fetch_worker, args=(tasks, documents, page_store, stats), daemon=True)
+                for _ in range(fetch_workers)
+            ]
+            for thread in threads:
+                thread.start()
 
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-                cursor.execute(
-                    "UPDATE resources SET summary = ? WHERE url = ?",
-                    ('', url)
-                )
-                conn.commit()
+            pending = deque()
+            batch = []
+            done = finished = 0
+            while finished < len(threads):
+                document = documents.get()
+                if document is None:
+                    finished += 1
+                    continue
+                done += 1
+                url, content, source, content_hash, error = document
+                stats.sources[source] += 1
+                if source == 'failed':
+                    # Left for a retry; the summary is not touched
+                    failures.append((url, error))
+                    write()
+                else:
+                    hashes[url] = content_hash
+                    batch.append((url, content))
+                if len(batch) >= INDEX_BATCH:
+                    pending.append(pool.apply_async(summarize_batch, (batch,)))
+                    batch = []
+                # Keep a bounded number of batches in flight
+                while pending and (pending[0].ready() or len(pending) >= extract_workers * 2):
+                    collect(pending.popleft())
 
+                if time.time() - last_report >= INDEX_PROGRESS_SECONDS:
+                    last_report = time.time()
+                    print(f"  [{done}/{len(pages)}] {done / (last_report - start):.1f} pages/s, "
+                          f"queue {documents.qsize()}/{INDEX_QUEUE_SIZE}, {written} written")
+            if batch:
+                pending.append(pool.apply_async(summarize_batch, (batch,)))
+            if done < len(pages):
+                # A fetch thread died; its pages keep no summary and are picked up next run
+                print(f"⚠️  {len(pages) - done} pages were not fetched (a fetch worker stopped)")
+            while pending:
+                collect(pending.popleft())
+        write(flush=True)
     finally:
         conn.close()
-        driver.quit()
+        for thread in threads:
+            thread.join(timeout=1)
+        if page_store is not None:
+            page_store.flush()
 
+    elapsed = max(time.time() - start, 1e-9)
     print(f"\n{'=' * 60}")
-    print(f"✓ Summary generation completed! Processed {processed} pages")
+    print(f"✓ Summary generation completed! Processed {processed} pages "
+          f"in {elapsed:.1f}s ({len(pages) / elapsed:.1f} pages/s)")
+    print(f"✓ {stats.sources['store']} page bodies read from the page store, "
+          f"{stats.sources['fetched']} fetched, {stats.sources['failed']} failed")
+    print(f"✓ Stage time: fetch {stats.seconds['fetch']:.1f}s (over {fetch_workers} threads), "
+          f"extract {stats.seconds['extract']:.1f}s CPU, write {stats.seconds['write']:.1f}s")
+    print(f"✓ Change log: {changes['added']} added, {changes['updated']} updated")
     print(f"{'=' * 60}")
 
 # -------------------- ENTRY POINT --------------------
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate keyword summaries for crawled pages")
+    parser.add_argument('--fetch-workers', type=int, default=INDEX_FETCH_WORKERS,
+                        help=f"threads reading or fetching page bodies (default: {INDEX_FETCH_WORKERS})")
+    parser.add_argument('--extract-workers', type=int, default=INDEX_EXTRACT_WORKERS,
+                        help="processes computing summaries (default: one per CPU)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only new, changed, failed and outdated-extractor pages")
+    parser.add_argument('--changes', type=int, metavar='SINCE_ID', nargs='?', const=0, default=None,
+                        help="print the change log after an entry id and exit")
+    args = parser.parse_args()
+
+    if args.changes is not None:
+        conn = sqlite3.connect(DATABASE_PATH)
+        ensure_index_tables(conn)
+        entries = read_changes(conn, args.changes)
+        conn.close()
+        counts = {}
+        for _, _, change in entries:
+            counts[change] = counts.get(change, 0) + 1
+        print(f"{len(entries)} changes after #{args.changes}: "
+              + ', '.join(f"{n} {change}" for change, n in counts.items()))
+        if entries:
+            print(f"Last entry: #{entries[-1][0]}")
+        return
+
+    generate_summaries(args.fetch_workers, args.extract_workers, args.incremental)
+
 if __name__ == "__main__":
-    generate_summaries()
+    main()
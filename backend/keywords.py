@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Corpus Keywords
+Keyword summaries weighted by document frequencies learned across the
+whole corpus.
+
+The indexer used to fit a TfidfVectorizer on each page alone, which
+builds a new vocabulary per page and gives every term the same IDF. Here
+a HashingVectorizer maps terms to KEYWORD_FEATURES columns without a
+vocabulary, so document frequencies can be accumulated in one streaming
+pass over the corpus into a single counts vector. Summaries are then the
+top TF-IDF terms of each document, computed for thousands of documents
+at a time as one sparse matrix.
+
+A document is what the indexer summarizes: a resource's title,
+description and stored body (document_text()). Counting DF over the same
+text matters: a word that only ever appears in titles would otherwise
+get a DF of 0 and the highest IDF there is.
+
+The DF statistics are saved to KEYWORD_STATS_PATH (counts for the
+non-zero columns only) so other components, such as the search index, can
+weight terms the same way via load_corpus_stats(). The indexer rebuilds
+them when the corpus has grown by KEYWORD_DF_REFRESH since the last
+build, or when they were built by an older EXTRACTOR_VERSION.
+
+Usage:
+    python keywords.py build        # rebuild DF statistics from the database and page store
+    python keywords.py stats
+    python keywords.py terms <url>  # summary terms for one stored page
+"""
+
+import sqlite3
+import time
+import sys
+import os
+import numpy as np
+from dotenv import load_dotenv
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from compression import decode_text
+from page_store import PAGE_STORE_PATH
+
+load_dotenv()
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DATABASE_PATH))
+
+KEYWORD_STATS_PATH = os.getenv('KEYWORD_STATS_PATH', '../database/keyword_df.npz')
+KEYWORD_STATS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), KEYWORD_STATS_PATH))
+KEYWORD_FEATURES = int(os.getenv('KEYWORD_FEATURES', str(2 ** 20)))
+KEYWORD_BATCH = int(os.getenv('KEYWORD_BATCH', '2000'))
+KEYWORD_DF_REFRESH = float(os.getenv('KEYWORD_DF_REFRESH', '0.1'))
+SUMMARY_TERMS = 25
+
+# Bump when summaries change, so indexer.py --incremental redoes them
+# (and the DF statistics are rebuilt)
+EXTRACTOR_VERSION = 3
+
+# Same tokenization as the TfidfVectorizer(stop_words='english') it replaces
+_analyzer = HashingVectorizer(stop_words='english').build_analyzer()
+
+def _tokens(tokens):
+    return tokens
+
+def _vectorizer(n_features, binary):
+    # Input documents are already token lists
+    return HashingVectorizer(n_features=n_features, analyzer=_tokens, alternate_sign=False,
+                             norm=None, binary=binary)
+
+def tokenize(text):
+    return _analyzer(text or '')
+
+def document_text(title, description, body):
+    """The text a page is summarized from, and counted in the DF statistics as"""
+    return f"{title or ''} {description or ''} {body or ''}"
+
+# -------------------- DOCUMENT FREQUENCIES --------------------
+
+class CorpusStats:
+    """Document count and per-column document frequencies for the corpus"""
+
+    def __init__(self, n_features=KEYWORD_FEATURES, n_docs=0, df=None, built_at=0.0,
+                 version=EXTRACTOR_VERSION):
+        self.n_features = n_features
+        self.n_docs = n_docs
+        self.df = df if df is not None else np.zeros(n_features, dtype=np.int64)
+        self.built_at = built_at
+        self.version = version
+        self._binary = _vectorizer(n_features, binary=True)
+
+    def update(self, texts):
+        """Count the documents each term occurs in, for a batch of texts"""
+        X = self._binary.transform([tokenize(text) for text in texts])
+        self.df += np.bincount(X.indices, minlength=self.n_features)
+        self.n_docs += len(texts)
+
+    def idf(self):
+        """Smoothed IDF per column, as TfidfVectorizer(smooth_idf=True) computes it"""
+        return (np.log((1 + self.n_docs) / (1 + self.df)) + 1).astype(np.float32)
+
+    def save(self, path=KEYWORD_STATS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        columns = np.flatnonzero(self.df)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, n_features=self.n_features, n_docs=self.n_docs,
+                            columns=columns.astype(np.int32), counts=self.df[columns],
+                            built_at=time.time(), version=self.version)
+        os.replace(tmp_path, path)
+
+def load_corpus_stats(path=KEYWORD_STATS_PATH):
+    """Saved CorpusStats, or None if they were never built"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        n_features = int(data['n_features'])
+        df = np.zeros(n_features, dtype=np.int64)
+        df[data['columns']] = data['counts']
+        version = int(data['version']) if 'version' in data else 0
+        return CorpusStats(n_features, int(data['n_docs']), df, float(data['built_at']), version)
+
+def iter_documents(database_path=DATABASE_PATH, page_store_path=PAGE_STORE_PATH, batch=KEYWORD_BATCH):
+    """Yield the document_text() of every resource, bodies from the page store"""
+    conn = sqlite3.connect(database_path)
+    store = sqlite3.connect(page_store_path) if os.path.exists(page_store_path) else None
+    try:
+        cursor = conn.execute("SELECT url, title, description FROM resources")
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            bodies = {}
+            if store is not None:
+                placeholders = ','.join('?' * len(rows))
+                for url, data in store.execute(f"""
+                    SELECT p.url, b.data FROM pages p JOIN blobs b ON b.hash = p.text_hash
+                    WHERE p.url IN ({placeholders})
+                """, [url for url, _, _ in rows]):
+                    bodies[url] = decode_text(data, store)
+            for url, title, description in rows:
+                yield document_text(title, decode_text(description, conn), bodies.get(url))
+    finally:
+        conn.close()
+        if store is not None:
+            store.close()
+
+def build_corpus_stats(database_path=DATABASE_PATH, page_store_path=PAGE_STORE_PATH,
+                       batch=KEYWORD_BATCH, log=True):
+    """Stream every document through the DF counter and save the result"""
+    stats = CorpusStats()
+    texts = []
+    for text in iter_documents(database_path, page_store_path, batch):
+        texts.append(text)
+        if len(texts) >= batch:
+            stats.update(texts)
+            texts = []
+            if log and stats.n_docs % (batch * 10) == 0:
+                print(f"  DF pass: {stats.n_docs:,} documents")
+    if texts:
+        stats.update(texts)
+    stats.save()
+    return stats
+
+def document_count(database_path=DATABASE_PATH):
+    if not os.path.exists(database_path):
+        return 0
+    conn = sqlite3.connect(database_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+    except sqlite3.Error:
+        return 0
+    finally:
+        conn.close()
+
+def current_corpus_stats(database_path=DATABASE_PATH, log=True):
+    """Saved DF statistics, rebuilt first if the corpus has outgrown them"""
+    stats = load_corpus_stats()
+    documents = document_count(database_path)
+    if documents == 0:
+        # No corpus yet: every IDF is 1 and summaries rank terms by frequency
+        return stats or CorpusStats()
+    if (stats is not None and stats.n_features == KEYWORD_FEATURES
+            and stats.version == EXTRACTOR_VERSION
+            and documents <= stats.n_docs * (1 + KEYWORD_DF_REFRESH)):
+        return stats
+    if log:
+        print(f"Building corpus document frequencies from {documents:,} documents...")
+    start = time.time()
+    stats = build_corpus_stats(database_path, log=log)
+    if log:
+        print(f"✓ DF statistics for {stats.n_docs:,} documents "
+              f"({np.count_nonzero(stats.df):,} terms) in {time.time() - start:.1f}s")
+    return stats
+
+# -------------------- SUMMARIES --------------------
+
+def top_terms(texts, idf, k=SUMMARY_TERMS):
+    """Top-k TF-IDF terms of each text, highest weight first.
+
+    All texts are vectorized as one sparse matrix; hashed columns are
+    mapped back to terms through the batch's own tokens.
+    """
+    docs = [tokenize(text) for text in texts]
+    counts = _vectorizer(len(idf), binary=False)
+    X = counts.transform(docs).tocsr()
+    X.data *= idf[X.indices]
+
+    vocabulary = sorted({token for tokens in docs for token in tokens})
+    terms = {}
+    if vocabulary:
+        columns = counts.transform([[token] for token in vocabulary]).tocsr().indices
+        # A hash collision inside the batch keeps the first term
+        for column, token in zip(columns, vocabulary):
+            terms.setdefault(column, token)
+
+    summaries = []
+    for row in range(X.shape[0]):
+        start, end = X.indptr[row], X.indptr[row + 1]
+        data, indices = X.data[start:end], X.indices[start:end]
+        if len(data) > k:
+            best = np.argpartition(-data, k)[:k]
+        else:
+            best = np.arange(len(data))
+        best = best[np.lexsort((indices[best], -data[best]))]
+        summaries.append([terms[indices[i]] for i in best])
+    return summaries
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('build', 'stats', 'terms') or (command == 'terms' and len(sys.argv) < 3):
+        print(__doc__)
+        return
+
+    if command == 'build':
+        start = time.time()
+        stats = build_corpus_stats()
+        print(f"✓ DF statistics for {stats.n_docs:,} documents in {time.time() - start:.1f}s "
+              f"saved to {KEYWORD_STATS_PATH}")
+        return
+
+    stats = load_corpus_stats()
+    if stats is None:
+        print("No DF statistics yet. Run: python keywords.py build")
+        return
+
+    if command == 'terms':
+        from page_store import PageStore
+        conn = sqlite3.connect(DATABASE_PATH)
+        row = conn.execute("SELECT title, description FROM resources WHERE url = ?", (sys.argv[2],)).fetchone()
+        title, description = (row[0], decode_text(row[1], conn)) if row else (None, None)
+        conn.close()
+        store = PageStore()
+        try:
+            body = store.get_text(sys.argv[2])
+        finally:
+            store.close()
+        if row is None and body is None:
+            print("Page not in the database or the page store")
+            return
+        print(' '.join(top_terms([document_text(title, description, body)], stats.idf())[0]))
+        return
+
+    print("=" * 60)
+    print(f"  CORPUS DF STATISTICS ({KEYWORD_STATS_PATH})")
+    print("=" * 60)
+    print(f"Documents:     {stats.n_docs:,}")
+    print(f"Hashed terms:  {np.count_nonzero(stats.df):,} of {stats.n_features:,} columns")
+    print(f"Built:         {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats.built_at))}")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Link Graph
+Decides which of a page's links are stored as edges, and compacts the
+links table.
+
+Most hrefs on a crawled page are navigation, footer, social and off-site
+links that never become resources. Storing them made the links table grow
+far faster than resources and filled PageRank with nodes search never
+serves. An edge is now kept only if its destination is in scope: a
+url_rules site accepts it, or it is already a known resource (crawled in
+this run). Edges are deduplicated per page, self-links are dropped and
+LINKS_PER_PAGE (0 = no limit) caps the edges stored per source page.
+
+LINK_SCOPE=all restores the old behaviour of storing every link.
+
+compact applies the same rule to an existing database: it deletes
+self-links, edges whose source is not a resource (left behind when
+resources are removed) and edges whose destination is out of scope, then
+runs VACUUM and reports the space reclaimed. --resources-only also drops
+edges to pages that were never crawled.
+
+Usage:
+    python link_graph.py stats
+    python link_graph.py compact [--dry-run] [--resources-only]
+"""
+
+import sqlite3
+import sys
+import os
+from dotenv import load_dotenv
+
+from url_rules import classify
+
+load_dotenv()
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DATABASE_PATH))
+
+LINK_SCOPE = os.getenv('LINK_SCOPE', 'rules')           # 'rules' or 'all'
+LINKS_PER_PAGE = int(os.getenv('LINKS_PER_PAGE', '0'))  # 0 = no limit
+
+# -------------------- STORAGE FILTER --------------------
+
+def in_scope(url, known=()):
+    """True if a url_rules site accepts the URL or it is a known resource"""
+    return url in known or classify(url) is not None
+
+def page_edges(source_url, links, known=(), scope=LINK_SCOPE, cap=LINKS_PER_PAGE):
+    """Destinations to store as edges from one page.
+
+    links are the page's canonical links in page order; known is the set of
+    URLs already crawled. Returns them deduplicated, without self-links,
+    filtered to in-scope URLs (unless scope is 'all') and capped at cap.
+    """
+    edges = []
+    seen = {source_url}
+    for link in links:
+        if link in seen:
+            continue
+        seen.add(link)
+        if scope != 'all' and not in_scope(link, known):
+            continue
+        edges.append(link)
+        if cap and len(edges) >= cap:
+            break
+    return edges
+
+# -------------------- COMPACTION --------------------
+
+def _database_bytes(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    return page_size * page_count
+
+def link_stats(conn):
+    """Counts of stored edges by what their endpoints are"""
+    conn.create_function('in_scope', 1, lambda url: classify(url) is not None, deterministic=True)
+    total, self_links, dangling, to_resources, out_of_scope = conn.execute("""
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(l.source_url = l.destination_url), 0),
+            COALESCE(SUM(s.url IS NULL), 0),
+            COALESCE(SUM(d.url IS NOT NULL), 0),
+            COALESCE(SUM(d.url IS NULL AND NOT in_scope(l.destination_url)), 0)
+        FROM links l
+        LEFT JOIN resources s ON s.url = l.source_url
+        LEFT JOIN resources d ON d.url = l.destination_url
+    """).fetchone()
+    return {
+        'links': total, 'self_links': self_links, 'dangling_source': dangling,
+        'to_resources': to_resources, 'out_of_scope': out_of_scope,
+        'bytes': _database_bytes(conn),
+    }
+
+def compact_links(conn, resources_only=False, dry_run=False):
+    """Delete self-links, dangling and out-of-scope edges, then VACUUM.
+
+    Returns (edges removed, bytes reclaimed); a dry run only counts the
+    edges and reclaims nothing.
+    """
+    conn.create_function('in_scope', 1, lambda url: classify(url) is not None, deterministic=True)
+    keep_destination = "d.url IS NOT NULL" if resources_only else "(d.url IS NOT NULL OR in_scope(l.destination_url))"
+    condition = f"""
+        l.source_url = l.destination_url
+        OR s.url IS NULL
+        OR NOT {keep_destination}
+    """
+    doomed = f"""
+        SELECT l.id FROM links l
+        LEFT JOIN resources s ON s.url = l.source_url
+        LEFT JOIN resources d ON d.url = l.destination_url
+        WHERE {condition}
+    """
+    if dry_run:
+        return conn.execute(f"SELECT COUNT(*) FROM ({doomed})").fetchone()[0], 0
+
+    before = _database_bytes(conn)
+    removed = conn.execute(f"DELETE FROM links WHERE id IN ({doomed})").rowcount
+    conn.commit()
+    conn.execute("VACUUM")
+    return removed, before - _database_bytes(conn)
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('stats', 'compact'):
+        print(__doc__)
+        return
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        if command == 'compact':
+            dry_run = '--dry-run' in sys.argv
+            removed, reclaimed = compact_links(conn, '--resources-only' in sys.argv, dry_run)
+            if dry_run:
+                print(f"Would remove {removed:,} edges")
+            else:
+                print(f"✓ Removed {removed:,} edges, reclaimed {reclaimed / 1024 / 1024:.1f} MB")
+            return
+
+        stats = link_stats(conn)
+        total = max(stats['links'], 1)
+        print("=" * 60)
+        print("  LINK GRAPH")
+        print("=" * 60)
+        print(f"Edges:               {stats['links']:,}")
+        print(f"To crawled pages:    {stats['to_resources']:,} ({stats['to_resources'] / total:.0%})")
+        print(f"Out of scope:        {stats['out_of_scope']:,} ({stats['out_of_scope'] / total:.0%})")
+        print(f"Dangling source:     {stats['dangling_source']:,}")
+        print(f"Self-links:          {stats['self_links']:,}")
+        print(f"Database size:       {stats['bytes'] / 1024 / 1024:.1f} MB")
+        print("=" * 60)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compression Measurement Tool
+Compare database size, page-cache footprint and search-path decode cost
+with and without text column compression.
+
+Works on temporary copies, the real database is never modified.
+
+Usage:
+    python measure_compression.py [zlib|zstd]
+"""
+
+import sqlite3
+import shutil
+import tempfile
+import time
+import os
+import sys
+from dotenv import load_dotenv
+
+import compression
+from compression import decode_row, reencode_resources, train_dictionary
+
+load_dotenv()
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DATABASE_PATH))
+
+SEARCH_QUERY = "SELECT description, summary, url, title, tags, popularity_score FROM resources"
+RUNS = 5
+
+def reset_caches():
+    """Forget dictionaries cached from another database copy"""
+    compression._dictionaries.clear()
+    compression._active_ids.clear()
+    compression._codec_objects.clear()
+
+def table_bytes(conn, name):
+    """Bytes used by a table's pages (what a full scan pulls into the page cache)"""
+    try:
+        row = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()
+        return row[0] or 0
+    except sqlite3.OperationalError:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        return page_size * page_count
+
+def time_search_path(path):
+    """Median seconds to load and decode the rows the search endpoint reads"""
+    timings = []
+    for _ in range(RUNS):
+        reset_caches()
+        conn = sqlite3.connect(path)
+        start = time.perf_counter()
+        rows = [decode_row(row, conn, (0, 1)) for row in conn.execute(SEARCH_QUERY)]
+        timings.append(time.perf_counter() - start)
+        conn.close()
+    timings.sort()
+    return timings[len(timings) // 2], len(rows)
+
+def prepare_copy(path, codec):
+    """Re-encode a database copy with the given codec and vacuum it"""
+    reset_caches()
+    conn = sqlite3.connect(path)
+    if codec != 'none':
+        train_dictionary(conn, codec)
+    reencode_resources(conn, codec)
+    conn.execute("VACUUM")
+    conn.close()
+
+def measure(path):
+    conn = sqlite3.connect(path)
+    stats = {
+        'file_bytes': os.path.getsize(path),
+        'resources_bytes': table_bytes(conn, 'resources'),
+    }
+    conn.close()
+    stats['search_seconds'], stats['rows'] = time_search_path(path)
+    return stats
+
+def main():
+    codec = sys.argv[1] if len(sys.argv) > 1 else 'zstd'
+    if codec not in compression.CODEC_IDS:
+        print(__doc__)
+        return
+
+    if not os.path.exists(DATABASE_PATH):
+        print(f"❌ Database not found at: {DATABASE_PATH}")
+        return
+
+    print("=" * 70)
+    print(f"  TEXT COMPRESSION MEASUREMENT ({codec})")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, 'before.db')
+        after_path = os.path.join(tmp, 'after.db')
+        shutil.copyfile(DATABASE_PATH, before_path)
+        shutil.copyfile(DATABASE_PATH, after_path)
+
+        prepare_copy(before_path, 'none')
+        prepare_copy(after_path, codec)
+
+        before = measure(before_path)
+        after = measure(after_path)
+
+    def ratio(key):
+        return after[key] / before[key] if before[key] else 0.0
+
+    print(f"\nRows on search path: {before['rows']}")
+    print(f"\n{'':28}{'before':>14}{'after':>14}{'ratio':>10}")
+    print("-" * 70)
+    print(f"{'Database size (KB)':28}{before['file_bytes'] / 1024:14.1f}"
+          f"{after['file_bytes'] / 1024:14.1f}{ratio('file_bytes'):10.2f}")
+    print(f"{'resources pages (KB)':28}{before['resources_bytes'] / 1024:14.1f}"
+          f"{after['resources_bytes'] / 1024:14.1f}{ratio('resources_bytes'):10.2f}")
+    print(f"{'Search load+decode (ms)':28}{before['search_seconds'] * 1000:14.2f}"
+          f"{after['search_seconds'] * 1000:14.2f}{ratio('search_seconds'):10.2f}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
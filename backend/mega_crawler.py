@@ -1,14 +1,22 @@
 import sqlite3
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from collections import deque
-import time
 import os
-import re
+import argparse
 from dotenv import load_dotenv
 import random
 
+from crawl_writer import get_writer, flush_all
+from discovery import SITE_SOURCES, discovery_targets
+from distributed import crawl_distributed
+from driver_pool import crawl_parallel
+from driver_supervisor import SupervisedDriver
+from frontier import CrawlStateStore
+import crawl_engine
+from tagger import assign_tags
+from telemetry import get_metrics
+from url_rules import site_filter
+
 load_dotenv()
 
 # -------------------- DATABASE --------------------
@@ -18,204 +26,38 @@ DATABASE_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), DATABASE_PATH)
 )
 
-# -------------------- TAG KEYWORDS --------------------
-
-category_keywords = {
-    "dataset": ["dataset", "data collection", "data source", "training data", "benchmark"],
-    "model": ["model", "algorithm", "neural network", "training", "inference", "architecture"],
-    "article": ["article", "guide", "tutorial", "how-to", "introduction", "overview"],
-    "research paper": ["research paper", "study", "journal", "publication", "arxiv", "conference", "proceedings", "ieee"],
-    "documentation": ["documentation", "api", "reference", "docs"],
-    "code": ["code", "implementation", "github", "repository", "example"]
-}
-
 # -------------------- HELPERS --------------------
 
-def assign_tags(content, url=""):
-    """Determine tags based on content and URL"""
-    tags = []
-    content_lower = content.lower()
-    url_lower = url.lower()
-    
-    # Check URL patterns first for more accurate tagging
-    if 'kaggle.com/datasets' in url_lower:
-        tags.append('dataset')
-    elif 'kaggle.com/models' in url_lower:
-        tags.append('model')
-    elif 'arxiv.org' in url_lower or 'ieeexplore.ieee.org' in url_lower:
-        tags.append('research paper')
-    elif 'github.com' in url_lower:
-        tags.append('code')
-    
-    # Then check content
-    for category, keywords in category_keywords.items():
-        if category not in tags:
-            if any(re.search(r'\b' + keyword + r'\b', content_lower) for keyword in keywords):
-                tags.append(category)
-    
-    return ", ".join(tags) if tags else "general"
-
 def store_resource(url, title, description, tags):
-    """Insert a new resource into the database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO resources (url, title, description, tags)
-            VALUES (?, ?, ?, ?)
-        """, (url, title, description, tags))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error storing resource: {e}")
-    finally:
-        conn.close()
+    """Queue a new resource for the database (written in batches)"""
+    get_writer(DATABASE_PATH).add_resource(url, title, description, tags)
 
 def store_link(source_url, destination_url):
-    """Insert a link between two pages"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    try:
-        cursor.execute("""
-            INSERT OR IGNORE INTO links (source_url, destination_url)
-            VALUES (?, ?)
-        """, (source_url, destination_url))
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Error storing link: {e}")
-    finally:
-        conn.close()
+    """Queue a link between two pages (written in batches)"""
+    get_writer(DATABASE_PATH).add_link(source_url, destination_url)
 
 # -------------------- SITE FILTERS --------------------
 
-def check_kaggle_page(url):
-    if any(symbol in url for symbol in ['#', '%']):
-        return None
-    if url.endswith(('/discussions', '/code', '/suggestions', '/competitions')):
-        return None
-    if '/discussion' in url:
-        return None
-    if 'kaggle.com/datasets' in url:
-        return 'dataset'
-    elif 'kaggle.com/models' in url:
-        return 'model'
-    elif 'kaggle.com/learn' in url:
-        return 'article'
-    return None
-
-def check_medium_page(url):
-    """Check Medium articles - very permissive for more content"""
-    if 'medium.com' in url:
-        if any(x in url for x in ['/plans', '/membership', '/about', '/jobs', '/newsletter']):
-            return None
-        # Very permissive - accept most Medium URLs
-        return 'article'
-    return None
-
-def check_towardsdatascience_page(url):
-    """Check Towards Data Science"""
-    if 'towardsdatascience.com' in url:
-        if any(x in url for x in ['#', '/plans', '/membership']):
-            return None
-        return 'article'
-    return None
-
-def check_arxiv_page(url):
-    """Check ArXiv papers - very important for research"""
-    if 'arxiv.org' in url and '/abs/' in url:
-        return 'research paper'
-    return None
-
-def check_huggingface_page(url):
-    """Check Hugging Face - models, datasets, papers"""
-    if 'huggingface.co' in url:
-        if any(x in url for x in ['#', '?page=']):
-            return None
-        if '/datasets/' in url:
-            return 'dataset'
-        elif '/models/' in url or '/spaces/' in url:
-            return 'model'
-        elif '/papers/' in url:
-            return 'research paper'
-        elif '/docs/' in url:
-            return 'documentation'
-    return None
-
-def check_paperswithcode_page(url):
-    """Check Papers with Code"""
-    if 'paperswithcode.com' in url:
-        if any(x in url for x in ['#']):
-            return None
-        if '/paper/' in url or '/method/' in url or '/task/' in url:
-            return 'research paper'
-        elif '/dataset/' in url:
-            return 'dataset'
-    return None
-
-def check_github_page(url):
-    """Check GitHub repositories - important for code"""
-    if 'github.com' in url:
-        if any(x in url for x in ['#', '/issues/', '/pull/', '/actions/', '/wiki/', '/settings/']):
-            return None
-        # Accept repos with ML keywords
-        ml_keywords = ['machine-learning', 'deep-learning', 'neural', 'tensorflow', 'pytorch', 
-                       'ai', 'ml', 'llm', 'transformer', 'vision', 'nlp']
-        if any(kw in url.lower() for kw in ml_keywords):
-            return 'code'
-    return None
-
-def check_distill_page(url):
-    """Check Distill.pub - high quality ML articles"""
-    if 'distill.pub' in url:
-        return 'article'
-    return None
-
-def check_openai_page(url):
-    """Check OpenAI blog and research"""
-    if 'openai.com' in url:
-        if '/research/' in url or '/blog/' in url:
-            return 'article'
-    return None
-
-def check_deepmind_page(url):
-    """Check DeepMind blog and research"""
-    if 'deepmind.com' in url or 'deepmind.google' in url:
-        if any(x in url for x in ['/blog/', '/research/', '/publications/']):
-            return 'article'
-    return None
-
-def check_ai_googleblog_page(url):
-    """Check Google AI Blog"""
-    if 'ai.googleblog.com' in url or 'blog.research.google' in url:
-        return 'article'
-    return None
-
-def check_machinelearningmastery_page(url):
-    """Check ML Mastery"""
-    if 'machinelearningmastery.com' in url:
-        if any(x in url for x in ['#', '/blog/', '/start-here/', '/about/']):
-            return None
-        return 'article'
-    return None
-
-def check_analyticsvidhya_page(url):
-    """Check Analytics Vidhya"""
-    if 'analyticsvidhya.com' in url:
-        if '/blog/' in url or '/learn/' in url:
-            return 'article'
-    return None
-
-def check_kdnuggets_page(url):
-    """Check KDnuggets"""
-    if 'kdnuggets.com' in url:
-        if any(x in url for x in ['#', '/tag/', '/author/']):
-            return None
-        return 'article'
-    return None
+# Compiled from the shared rule table in url_rules.py
+check_kaggle_page = site_filter('kaggle')
+check_medium_page = site_filter('medium')
+check_towardsdatascience_page = site_filter('towardsdatascience')
+check_arxiv_page = site_filter('arxiv')
+check_huggingface_page = site_filter('huggingface')
+check_paperswithcode_page = site_filter('paperswithcode')
+check_github_page = site_filter('github')
+check_distill_page = site_filter('distill')
+check_openai_page = site_filter('openai')
+check_deepmind_page = site_filter('deepmind')
+check_ai_googleblog_page = site_filter('ai_googleblog')
+check_machinelearningmastery_page = site_filter('machinelearningmastery')
+check_analyticsvidhya_page = site_filter('analyticsvidhya')
+check_kdnuggets_page = site_filter('kdnuggets')
 
 # -------------------- SELENIUM SETUP --------------------
 
-def setup_driver():
-    """Set up Selenium WebDriver with optimizations"""
+def start_chrome():
+    """Start headless Chrome with optimizations"""
     chrome_options = Options()
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("--no-sandbox")
@@ -228,68 +70,21 @@ def setup_driver():
     
     return webdriver.Chrome(options=chrome_options)
 
+def setup_driver():
+    """Chrome under a SupervisedDriver: timeouts, recycling and resource blocking"""
+    return SupervisedDriver(start_chrome)
+
 # -------------------- CRAWLER --------------------
 
-def crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages=None):
+def crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages=None,
+               frontier=None):
     """Crawl with optional page limit"""
-    queue = deque([(start_url, 1)])
-    site_visited = set()
-    pages_crawled = 0
-
-    while queue:
-        if max_pages and pages_crawled >= max_pages:
-            break
-            
-        url, depth = queue.popleft()
-
-        if depth > max_depth or url in visited_links or url in site_visited:
-            continue
+    return crawl_engine.crawl_site(
+        start_url, max_depth, check_function, driver, visited_links, max_pages,
+        assign_tags=assign_tags, store_resource=store_resource, store_link=store_link,
+        render_wait=1, content_chars=500, log_every=10, frontier=frontier
+    )
 
-        result = check_function(url)
-        if result is None:
-            continue
-
-        site_visited.add(url)
-        visited_links.add(url)
-
-        try:
-            driver.get(url)
-            time.sleep(1)  # Reduced sleep for faster crawling
-
-            title = driver.title
-            try:
-                description = driver.find_element(
-                    By.CSS_SELECTOR, 'meta[name="description"]'
-                ).get_attribute('content')
-            except:
-                description = ''
-
-            content = driver.find_element(By.TAG_NAME, 'body').text[:500]  # Only first 500 chars
-            tags = assign_tags(content, url)
-
-            store_resource(url, title, description, tags)
-            pages_crawled += 1
-
-            if pages_crawled % 10 == 0:
-                print(f"  [{pages_crawled}] {url[:80]}...")
-
-            # Get links
-            links = driver.find_elements(By.TAG_NAME, 'a')
-            for link in links:
-                try:
-                    href = link.get_attribute('href')
-                    if href and href.startswith('http') and href not in visited_links:
-                        store_link(url, href)
-                        if check_function(href):
-                            queue.append((href, depth + 1))
-                except:
-                    continue
-
-        except Exception as e:
-            print(f"  Error: {url[:60]}... - {str(e)[:40]}")
-            continue
-
-    return pages_crawled
 
 # -------------------- MAIN --------------------
 
@@ -300,9 +95,25 @@ def main():
     print("=" * 80)
     print()
 
-    driver = setup_driver()
-    visited_links = set()
+    parser = argparse.ArgumentParser(description="Mega ML resource crawler")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="parallel driver processes (default: 1, sequential crawl)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue the last interrupted run instead of starting over")
+    parser.add_argument('--distributed', action='store_true',
+                        help="run as one worker of a distributed crawl (see distributed.py)")
+    parser.add_argument('--worker-id', default=None,
+                        help="worker name in the shared frontier (default: host-pid)")
+    parser.add_argument('--discover', nargs='*', metavar='SITE', default=None,
+                        help="also crawl URLs from sitemaps and feeds (default: every site in "
+                             "discovery.SITE_SOURCES)")
+    args = parser.parse_args()
+
+    store = None if args.distributed else CrawlStateStore('mega', resume=args.resume)
+    visited_links = set() if store is None else store.load_visited()
     total_crawled = 0
+    if args.resume:
+        print(f"Resuming: {len(visited_links)} URLs already crawled")
 
     # MASSIVE crawl targets - prioritize research papers and diverse sources
     crawl_targets = [
@@ -357,30 +168,69 @@ def main():
         ("GitHub - Transformers", "https://github.com/huggingface/transformers", 2, check_github_page, 50),
     ]
 
+    seeds = {}
+    if args.discover is not None:
+        print("Discovering URLs from sitemaps and feeds...")
+        discovered, seeds = discovery_targets(args.discover or list(SITE_SOURCES))
+        crawl_targets = discovered + crawl_targets
+        print(f"✓ {sum(len(rows) for rows in seeds.values())} URLs queued for "
+              f"{len(discovered)} discovery targets")
+        print()
+
     print(f"Total crawl targets: {len(crawl_targets)}")
     print(f"Estimated resources to crawl: {sum(t[4] for t in crawl_targets)}")
     print()
     
     try:
-        for i, (name, start_url, max_depth, check_func, max_pages) in enumerate(crawl_targets, 1):
-            print(f"\n[{i}/{len(crawl_targets)}] {name}")
-            print(f"URL: {start_url}")
-            print(f"Max pages: {max_pages}, Max depth: {max_depth}")
+        if args.distributed:
+            total_crawled = crawl_distributed(
+                crawl_targets, setup_driver, crawl_site, visited_links, args.worker_id, seeds=seeds
+            )
+        elif args.workers > 1:
+            print(f"Parallel mode: {args.workers} driver workers")
             print("-" * 80)
-            
-            crawled = crawl_site(
-                start_url, max_depth, check_func, driver, visited_links, max_pages
+            results = crawl_parallel(
+                crawl_targets, setup_driver, visited_links,
+                assign_tags, store_resource, store_link,
+                workers=args.workers, render_wait=1, content_chars=500, store=store, seeds=seeds
             )
-            total_crawled += crawled
-            
-            print(f"✓ Crawled {crawled} pages from {name}")
-            print(f"Total so far: {total_crawled} resources, {len(visited_links)} unique URLs")
-            
-            # Small delay between sources
-            time.sleep(2)
-            
+            for name, crawled in results.items():
+                print(f"✓ Crawled {crawled} pages from {name}")
+            total_crawled = sum(results.values())
+        else:
+            driver = setup_driver()
+            try:
+                for i, (name, start_url, max_depth, check_func, max_pages) in enumerate(crawl_targets, 1):
+                    if store.is_done(name):
+                        print(f"\n[{i}/{len(crawl_targets)}] {name} - already done, skipping")
+                        continue
+
+                    print(f"\n[{i}/{len(crawl_targets)}] {name}")
+                    print(f"URL: {start_url}")
+                    print(f"Max pages: {max_pages}, Max depth: {max_depth}")
+                    print("-" * 80)
+                
+                    frontier = store.target_frontier(name, start_url, max_depth, max_pages, visited_links)
+                    if name in seeds:
+                        frontier.push_many(seeds[name])
+                    crawled = crawl_site(
+                        start_url, max_depth, check_func, driver, visited_links, max_pages,
+                        frontier=frontier
+                    )
+                    store.finish_target(frontier)
+                    total_crawled += crawled
+                
+                    print(f"✓ Crawled {crawled} pages from {name}")
+                    print(f"Total so far: {total_crawled} resources, {len(visited_links)} unique URLs")
+                
+            finally:
+                driver.quit()
     finally:
-        driver.quit()
+        if store is not None:
+            store.close()
+        flush_all()
+
+    get_metrics().summary()
 
     # Get final link count
     conn = sqlite3.connect(DATABASE_PATH)
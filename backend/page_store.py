@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Page Store
+Content-addressed, compressed store for the text (and optionally the raw
+HTML) the crawlers extract, so indexer.py, tagger.py retag and recrawl.py
+read page bodies from local disk instead of reopening every URL in Chrome.
+
+Blobs are keyed by the BLAKE2b hash of their bytes, so a body shared by
+many URLs (mirrors, URL variants, error pages) is stored once; the pages
+table points each URL at its latest text and HTML blobs. Blobs are
+compressed with the compression.py codecs (zstd when installed, zlib
+otherwise) and live in their own database (PAGE_STORE_PATH) so they never
+bloat the main one. Writes are buffered and committed in batches.
+
+PAGE_STORE=0 turns the store off; PAGE_STORE_HTML=1 also keeps raw HTML.
+
+Usage:
+    python page_store.py stats
+    python page_store.py gc        # drop blobs no page points to
+"""
+
+import sqlite3
+import atexit
+import hashlib
+import threading
+import sys
+import os
+from dotenv import load_dotenv
+
+from compression import CODEC_IDS, compress_bytes, decode_text, zstandard
+from urlnorm import canonicalize_url
+
+load_dotenv()
+
+PAGE_STORE_ENABLED = os.getenv('PAGE_STORE', '1') == '1'
+PAGE_STORE_PATH = os.getenv('PAGE_STORE_PATH', '../database/pages.db')
+PAGE_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), PAGE_STORE_PATH))
+PAGE_STORE_CODEC = os.getenv('PAGE_STORE_CODEC', 'zstd' if zstandard is not None else 'zlib')
+PAGE_STORE_BATCH = int(os.getenv('PAGE_STORE_BATCH', '200'))
+
+# -------------------- SCHEMA --------------------
+
+def ensure_page_store_tables(conn):
+    """Create the blob and page tables if they do not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT PRIMARY KEY,
+            text_hash TEXT,
+            html_hash TEXT,
+            stored_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.commit()
+
+def blob_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+# -------------------- STORE --------------------
+
+class PageStore:
+    """Buffered writer and reader for one page store database"""
+
+    def __init__(self, path=PAGE_STORE_PATH, codec=PAGE_STORE_CODEC, batch_rows=PAGE_STORE_BATCH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.codec = codec if codec in CODEC_IDS else None
+        self.batch_rows = batch_rows
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        ensure_page_store_tables(self.conn)
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _encode(self, data):
+        # Plain TEXT when compression is off or does not help; decode_text()
+        # reads both forms
+        if self.codec is not None:
+            encoded = compress_bytes(data, self.codec, 0, self.conn)
+            if len(encoded) < len(data):
+                return encoded
+        return data.decode('utf-8')
+
+    # ----- writing -----
+
+    def put(self, url, text, html=None):
+        """Queue a page's text (and HTML) for the next batch"""
+        with self.lock:
+            self.pending[canonicalize_url(url)] = (text or '', html)
+            full = len(self.pending) >= self.batch_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write all queued pages in one transaction"""
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            if not pending:
+                return
+
+            blobs = {}
+            pages = []
+            for url, (text, html) in pending.items():
+                hashes = []
+                for value in (text, html):
+                    if value is None:
+                        hashes.append(None)
+                        continue
+                    data = value.encode('utf-8')
+                    digest = blob_hash(data)
+                    blobs.setdefault(digest, data)
+                    hashes.append(digest)
+                pages.append((url, *hashes))
+
+            # Only compress blobs the store does not have yet
+            digests = list(blobs)
+            known = set()
+            for start in range(0, len(digests), 500):
+                chunk = digests[start:start + 500]
+                known.update(h for (h,) in self.conn.execute(
+                    f"SELECT hash FROM blobs WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+                ))
+
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO blobs (hash, size, data) VALUES (?, ?, ?)",
+                    [(h, len(data), self._encode(data)) for h, data in blobs.items() if h not in known]
+                )
+                self.conn.executemany("""
+                    INSERT INTO pages (url, text_hash, html_hash) VALUES (?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        text_hash = excluded.text_hash,
+                        html_hash = COALESCE(excluded.html_hash, html_hash),
+                        stored_at = CURRENT_TIMESTAMP
+                """, pages)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"Error storing {len(pages)} page bodies: {e}")
+
+    # ----- reading -----
+
+    def _get(self, url, column):
+        url = canonicalize_url(url)
+        with self.lock:
+            pending = self.pending.get(url)
+        if pending is not None:
+            return pending[0] if column == 'text_hash' else pending[1]
+
+        # The connection is shared by every thread using the store
+        with self.lock:
+            row = self.conn.execute(f"""
+                SELECT b.data FROM pages p JOIN blobs b ON b.hash = p.{column}
+                WHERE p.url = ?
+            """, (url,)).fetchone()
+            return decode_text(row[0], self.conn) if row else None
+
+    def get_text(self, url):
+        """Stored body text for a URL, or None if the page was never stored"""
+        return self._get(url, 'text_hash')
+
+    def get_html(self, url):
+        return self._get(url, 'html_hash')
+
+    # ----- maintenance -----
+
+    def gc(self):
+        """Delete blobs no page points to; returns (blobs, bytes) removed"""
+        self.flush()
+        orphans = """
+            FROM blobs WHERE hash NOT IN (
+                SELECT text_hash FROM pages WHERE text_hash IS NOT NULL
+                UNION SELECT html_hash FROM pages WHERE html_hash IS NOT NULL
+            )
+        """
+        count, size = self.conn.execute(f"SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) {orphans}").fetchone()
+        self.conn.execute(f"DELETE {orphans}")
+        self.conn.commit()
+        return count, size
+
+    def stats(self):
+        self.flush()
+        pages, with_text, with_html = self.conn.execute(
+            "SELECT COUNT(*), COUNT(text_hash), COUNT(html_hash) FROM pages"
+        ).fetchone()
+        blobs, raw_bytes, stored_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM blobs"
+        ).fetchone()
+        return {
+            'pages': pages, 'with_text': with_text, 'with_html': with_html,
+            'blobs': blobs, 'raw_bytes': raw_bytes, 'stored_bytes': stored_bytes,
+        }
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# -------------------- SHARED INSTANCE --------------------
+
+_store = None
+
+def get_page_store():
+    """Return the process-wide page store, or None with PAGE_STORE=0"""
+    global _store
+    if not PAGE_STORE_ENABLED:
+        return None
+    if _store is None:
+        _store = PageStore()
+        atexit.register(_store.flush)
+    return _store
+
+def flush_page_store():
+    if _store is not None:
+        _store.flush()
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command not in ('stats', 'gc'):
+        print(__doc__)
+        return
+
+    store = PageStore()
+    try:
+        if command == 'gc':
+            count, size = store.gc()
+            print(f"✓ Removed {count} unreferenced blobs ({size / 1024 / 1024:.1f} MB)")
+            print("Run VACUUM (sqlite3 pages.db 'VACUUM') to reclaim freed pages")
+            return
+
+        stats = store.stats()
+        print("=" * 60)
+        print(f"  PAGE STORE ({store.path})")
+        print("=" * 60)
+        print(f"Pages:           {stats['pages']:,} ({stats['with_text']:,} text, "
+              f"{stats['with_html']:,} HTML)")
+        print(f"Unique blobs:    {stats['blobs']:,}")
+        print(f"Raw size:        {stats['raw_bytes'] / 1024 / 1024:.1f} MB")
+        print(f"Stored size:     {stats['stored_bytes'] / 1024 / 1024:.1f} MB "
+              f"({stats['stored_bytes'] / max(stats['raw_bytes'], 1):.0%} of raw)")
+        print("=" * 60)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,56 @@
+#!/usr/bin/env python3
+"""
+PageRank
+Popularity scores for resources from the links table.
+
+URLs are mapped to integer node ids and the link graph becomes a sparse
+column-stochastic transition matrix (scipy CSR, built from the integer
+edge arrays). Power iteration runs until the L1 change between two
+iterations drops below PAGERANK_TOL, or PAGERANK_MAX_ITER iterations.
+The rank held by pages without outgoing links (dangling pages) is spread
+evenly over all pages on every iteration instead of being lost, so the
+ranks always sum to one.
+
+Scores are stored multiplied by the number of pages, so the average score
+is 1.0 as with the old fixed 20-iteration version. They are written in
+one transaction together with a pagerank_runs row; its id (see
+latest_run_id()) changes exactly when the stored scores do.
+
+The default mode loads every link into memory. --out-of-core (or
+PAGERANK_OUT_OF_CORE=1) never does: SQLite maps URLs to dense ids in a
+table under PAGERANK_WORK_DIR, the edges are streamed in chunks into
+memory-mapped arrays sorted by destination, and every iteration is one
+sequential scan of them. PAGERANK_MEMORY_MB sizes the SQLite cache and
+every block of edges or pages processed at once; the rank vectors are
+memory-mapped files too (about 32 bytes per page).
+
+Usage:
+    python pagerank.py
+    python pagerank.py --out-of-core
+"""
+
 import sqlite3
-from dotenv import load_dotenv
+import shutil
+import time
+import sys
 import os
+import numpy as np
+from scipy import sparse
+from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
 DATABASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), DATABASE_PATH))
 
+PAGERANK_DAMPING = float(os.getenv('PAGERANK_DAMPING', '0.85'))
+PAGERANK_TOL = float(os.getenv('PAGERANK_TOL', '1e-6'))          # L1 change between iterations
+PAGERANK_MAX_ITER = int(os.getenv('PAGERANK_MAX_ITER', '100'))
+PAGERANK_OUT_OF_CORE = os.getenv('PAGERANK_OUT_OF_CORE', '0') == '1'
+PAGERANK_MEMORY_MB = int(os.getenv('PAGERANK_MEMORY_MB', '256'))    # out-of-core working memory
+PAGERANK_WORK_DIR = os.getenv('PAGERANK_WORK_DIR', '../database/pagerank_work')
+PAGERANK_WORK_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), PAGERANK_WORK_DIR))
+
 def fetch_links():
     """Fetch all links from the database"""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -16,82 +60,367 @@ def fetch_links():
     conn.close()
     return links
 
-def initialize_pagerank(links):
-    """Initialize PageRank dictionary with equal values"""
-    pages = set()
-    for source, destination in links:
-        pages.add(source)
-        pages.add(destination)
-    pagerank = {page: 1.0 for page in pages}
-    return pagerank, pages
-
-def calculate_pagerank(links, damping_factor=0.85, iterations=20):
-    """Calculate PageRank scores for all pages"""
+# -------------------- GRAPH --------------------
+
+def node_ids(links):
+    """Integer ids for the pages in links.
+
+    Returns (pages, sources, destinations): pages[i] is the URL of node i,
+    and the edge arrays hold node ids in link order.
+    """
+    ids = {}
+    sources = np.fromiter((ids.setdefault(s, len(ids)) for s, _ in links),
+                          dtype=np.int64, count=len(links))
+    destinations = np.fromiter((ids.setdefault(d, len(ids)) for _, d in links),
+                               dtype=np.int64, count=len(links))
+    return list(ids), sources, destinations
+
+def transition_matrix(sources, destinations, num_pages):
+    """Column-stochastic CSR matrix M (M[d, s] = 1/outdegree(s)) and the dangling mask.
+
+    Repeated edges count once per row in links, as they did before.
+    """
+    out_degree = np.bincount(sources, minlength=num_pages)
+    weights = 1.0 / out_degree[sources]
+    M = sparse.csr_matrix((weights, (destinations, sources)), shape=(num_pages, num_pages))
+    return M, out_degree == 0
+
+# -------------------- POWER ITERATION --------------------
+
+def power_iteration(M, dangling, damping_factor=PAGERANK_DAMPING, tol=PAGERANK_TOL,
+                    max_iterations=PAGERANK_MAX_ITER):
+    """Stationary ranks of the damped walk over M, summing to one.
+
+    Returns (ranks, residuals) with the L1 residual of every iteration;
+    len(residuals) is the number of iterations run.
+    """
+    num_pages = M.shape[0]
+    rank = np.full(num_pages, 1.0 / num_pages)
+    residuals = []
+    for _ in range(max_iterations):
+        # Teleport and dangling mass are both spread evenly over all pages
+        spread = (1 - damping_factor + damping_factor * rank[dangling].sum()) / num_pages
+        new_rank = damping_factor * (M @ rank) + spread
+        residuals.append(float(np.abs(new_rank - rank).sum()))
+        rank = new_rank
+        if residuals[-1] < tol:
+            break
+    return rank, residuals
+
+def print_residuals(residuals, tol):
+    for iteration, residual in enumerate(residuals, 1):
+        if iteration % 5 == 0 or iteration == len(residuals):
+            print(f"  Iteration {iteration}: L1 residual {residual:.3e}")
+    if residuals and residuals[-1] < tol:
+        print(f"✓ Converged after {len(residuals)} iterations (tolerance {tol:g})")
+    else:
+        print(f"✗ Not converged after {len(residuals)} iterations (tolerance {tol:g})")
+
+def calculate_pagerank(links, damping_factor=PAGERANK_DAMPING, tol=PAGERANK_TOL,
+                       max_iterations=PAGERANK_MAX_ITER):
+    """PageRank scores for all pages, averaging 1.0, and the residual of each iteration"""
     print("Calculating PageRank scores...")
     print("=" * 60)
-    
-    pagerank, pages = initialize_pagerank(links)
-    
-    if not pages:
+
+    if not links:
         print("No pages found to rank!")
-        return {}
-    
+        return {}, []
+
+    start = time.time()
+    pages, sources, destinations = node_ids(links)
+    M, dangling = transition_matrix(sources, destinations, len(pages))
+
     print(f"Total pages: {len(pages)}")
     print(f"Total links: {len(links)}")
+    print(f"Dangling pages: {int(dangling.sum())}")
     print(f"Damping factor: {damping_factor}")
-    print(f"Iterations: {iterations}")
-    
-    inbound_links = {page: [] for page in pages}
-    outbound_links = {page: 0 for page in pages}
-    
-    for source, destination in links:
-        inbound_links[destination].append(source)
-        outbound_links[source] += 1
-    
-    for iteration in range(iterations):
-        new_pagerank = {}
-        for page in pages:
-            rank_sum = 0
-            for inbound_page in inbound_links[page]:
-                if outbound_links[inbound_page] > 0:
-                    rank_sum += pagerank[inbound_page] / outbound_links[inbound_page]
-            new_pagerank[page] = (1 - damping_factor) + damping_factor * rank_sum
-        pagerank = new_pagerank
-        
-        if (iteration + 1) % 5 == 0:
-            print(f"  Iteration {iteration + 1}/{iterations} completed")
-    
-    return pagerank
-
-def store_pagerank(pagerank):
-    """Store PageRank scores in the database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    updated = 0
-    for url, score in pagerank.items():
-        cursor.execute("UPDATE resources SET popularity_score = ? WHERE url = ?", (score, url))
-        updated += 1
-    
+
+    rank, residuals = power_iteration(M, dangling, damping_factor, tol, max_iterations)
+    print_residuals(residuals, tol)
+    print(f"  {time.time() - start:.2f}s")
+
+    scores = rank * len(pages)
+    return dict(zip(pages, scores.tolist())), residuals
+
+# -------------------- STORAGE --------------------
+
+def ensure_pagerank_tables(conn):
+    """Create the PageRank run table if it does not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pagerank_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pages INTEGER,
+            links INTEGER,
+            resources_updated INTEGER,
+            iterations INTEGER,
+            residual REAL,
+            completed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
     conn.commit()
-    conn.close()
-    
-    print(f"\n✓ Updated {updated} PageRank scores")
+
+def latest_run_id(conn):
+    """Id of the last PageRank run whose scores are stored, or 0.
+
+    Anything that caches popularity scores can keep the id it was built
+    from and rebuild when this changes.
+    """
+    try:
+        row = conn.execute("SELECT MAX(id) FROM pagerank_runs").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+def _apply_scores(conn, rows, pages, links, residuals):
+    """Load (resource id, score) rows, apply them and record the run.
+
+    Runs inside the caller's transaction. Returns (resources updated, run id).
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.pagerank_scores")
+    conn.execute("CREATE TEMP TABLE pagerank_scores (id INTEGER PRIMARY KEY, score REAL)")
+    conn.executemany("INSERT INTO pagerank_scores (id, score) VALUES (?, ?)", rows)
+    updated = conn.execute("""
+        UPDATE resources SET popularity_score = s.score
+        FROM pagerank_scores s
+        WHERE s.id = resources.id
+    """).rowcount
+    run_id = conn.execute("""
+        INSERT INTO pagerank_runs (pages, links, resources_updated, iterations, residual)
+        VALUES (?, ?, ?, ?, ?)
+    """, (pages, links, updated, len(residuals), residuals[-1] if residuals else None)).lastrowid
+    conn.execute("DROP TABLE temp.pagerank_scores")
+    return updated, run_id
+
+def store_pagerank(pagerank, links=0, residuals=()):
+    """Store PageRank scores in the database and record the run.
+
+    The resources table is scanned once for (id, url); scores of pages
+    that are resources are loaded into a temporary table keyed by
+    resource id and applied with one joined UPDATE. Linked pages that are
+    not resources are never looked up. The scores and the run row are
+    committed in one transaction. Returns the run id.
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        ensure_pagerank_tables(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        rows = [(resource_id, pagerank[url])
+                for resource_id, url in conn.execute("SELECT id, url FROM resources")
+                if url in pagerank]
+        updated, run_id = _apply_scores(conn, rows, len(pagerank), links, residuals)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"\n✓ Updated {updated} PageRank scores "
+          f"({len(pagerank) - updated} linked pages are not resources), run {run_id}")
+    return run_id
+
+# -------------------- OUT OF CORE --------------------
+
+def _budget(memory_mb, share, bytes_per_item):
+    """Items per block that fit in share of the memory budget"""
+    return max(int(memory_mb * 1024 * 1024 * share / bytes_per_item), 1024)
+
+def _array(work_dir, name, mode='r+', dtype=None, shape=None):
+    return np.lib.format.open_memmap(os.path.join(work_dir, name + '.npy'), mode, dtype, shape)
+
+def build_graph_files(work_dir=PAGERANK_WORK_DIR, memory_mb=PAGERANK_MEMORY_MB):
+    """Write the link graph to work_dir without holding it in memory.
+
+    URLs get dense ids (id - 1) in the work_dir/nodes.db table
+    nodes(id, url), filled by SQLite from the links table. Edges are then
+    streamed in chunks, sorted by destination, into the memory-mapped
+    src.npy and dst.npy, and the inverse out-degree of every page (0 for
+    dangling pages) into inv_out.npy. Returns (pages, links).
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir)
+    conn = sqlite3.connect(os.path.join(work_dir, 'nodes.db'))
+    try:
+        conn.execute(f"PRAGMA cache_size = -{memory_mb * 1024 // 4}")
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("ATTACH DATABASE ? AS crawl", (DATABASE_PATH,))
+        conn.execute("CREATE TABLE nodes (id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL)")
+
+        # One snapshot of the links table for the ids and the edges
+        conn.execute("BEGIN")
+        conn.execute("INSERT OR IGNORE INTO nodes (url) SELECT source_url FROM crawl.links")
+        conn.execute("INSERT OR IGNORE INTO nodes (url) SELECT destination_url FROM crawl.links")
+        num_pages = conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+        num_links = conn.execute("SELECT COUNT(*) FROM crawl.links").fetchone()[0]
+        print(f"Total pages: {num_pages}")
+        print(f"Total links: {num_links}")
+
+        dtype = np.int32 if num_pages < 2 ** 31 else np.int64
+        src = _array(work_dir, 'src', 'w+', dtype, (num_links,))
+        dst = _array(work_dir, 'dst', 'w+', dtype, (num_links,))
+        cursor = conn.execute("""
+            SELECT s.id - 1, d.id - 1
+            FROM nodes d
+            JOIN crawl.links l ON l.destination_url = d.url
+            JOIN nodes s ON s.url = l.source_url
+            ORDER BY d.id
+        """)
+        chunk = _budget(memory_mb, 0.25, 200)
+        position = 0
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            edges = np.array(rows, dtype=dtype)
+            src[position:position + len(rows)] = edges[:, 0]
+            dst[position:position + len(rows)] = edges[:, 1]
+            position += len(rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    inv_out = _array(work_dir, 'inv_out', 'w+', np.float64, (num_pages,))
+    block = _budget(memory_mb, 0.5, 32)
+    for start in range(0, num_links, block):
+        sources, counts = np.unique(src[start:start + block], return_counts=True)
+        inv_out[sources] += counts
+    for start in range(0, num_pages, block):
+        degree = inv_out[start:start + block]
+        np.divide(1.0, degree, out=degree, where=degree > 0)
+    for array in (src, dst, inv_out):
+        array.flush()
+    return num_pages, num_links
+
+def power_iteration_files(work_dir, num_pages, num_links, damping_factor=PAGERANK_DAMPING,
+                          tol=PAGERANK_TOL, max_iterations=PAGERANK_MAX_ITER,
+                          memory_mb=PAGERANK_MEMORY_MB):
+    """power_iteration() over the graph files written by build_graph_files().
+
+    Each iteration scans the edges sequentially in destination order,
+    memory_mb-sized blocks at a time; the rank vectors are memory-mapped
+    files as well. Returns (ranks as a memmap, residuals).
+    """
+    src, dst, inv_out = _array(work_dir, 'src', 'r'), _array(work_dir, 'dst', 'r'), _array(work_dir, 'inv_out', 'r')
+    rank = _array(work_dir, 'rank_a', 'w+', np.float64, (num_pages,))
+    new_rank = _array(work_dir, 'rank_b', 'w+', np.float64, (num_pages,))
+    weighted = _array(work_dir, 'weighted', 'w+', np.float64, (num_pages,))
+    node_block = _budget(memory_mb, 0.5, 48)
+    edge_block = _budget(memory_mb, 0.5, 48)
+
+    rank[:] = 1.0 / num_pages
+    residuals = []
+    for _ in range(max_iterations):
+        # Rank each page passes along per outgoing link, and the dangling mass
+        dangling_mass = 0.0
+        for start in range(0, num_pages, node_block):
+            r, inv = rank[start:start + node_block], inv_out[start:start + node_block]
+            np.multiply(r, inv, out=weighted[start:start + node_block])
+            dangling_mass += r[inv == 0].sum()
+            new_rank[start:start + node_block] = 0.0
+
+        # Edges are sorted by destination: sum each run of equal destinations
+        for start in range(0, num_links, edge_block):
+            d = dst[start:start + edge_block]
+            values = weighted[src[start:start + edge_block]]
+            runs = np.concatenate(([0], np.flatnonzero(d[1:] != d[:-1]) + 1))
+            new_rank[d[runs]] += np.add.reduceat(values, runs)
+
+        spread = (1 - damping_factor + damping_factor * dangling_mass) / num_pages
+        residual = 0.0
+        for start in range(0, num_pages, node_block):
+            block = new_rank[start:start + node_block]
+            block *= damping_factor
+            block += spread
+            residual += np.abs(block - rank[start:start + node_block]).sum()
+        residuals.append(float(residual))
+        rank, new_rank = new_rank, rank
+        if residuals[-1] < tol:
+            break
+    return rank, residuals
+
+def store_pagerank_files(work_dir, rank, links=0, residuals=(), memory_mb=PAGERANK_MEMORY_MB):
+    """store_pagerank() for ranks indexed by the node ids in work_dir/nodes.db"""
+    num_pages = len(rank)
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        ensure_pagerank_tables(conn)
+        conn.execute("ATTACH DATABASE ? AS graph", (os.path.join(work_dir, 'nodes.db'),))
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.execute("""
+            SELECT r.id, n.id - 1 FROM resources r JOIN graph.nodes n ON n.url = r.url
+        """)
+        chunk = _budget(memory_mb, 0.25, 200)
+
+        def rows():
+            while True:
+                batch = cursor.fetchmany(chunk)
+                if not batch:
+                    return
+                ids = np.array(batch, dtype=np.int64)
+                scores = rank[ids[:, 1]] * num_pages
+                yield from zip(ids[:, 0].tolist(), scores.tolist())
+
+        updated, run_id = _apply_scores(conn, rows(), num_pages, links, residuals)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"\n✓ Updated {updated} PageRank scores "
+          f"({num_pages - updated} linked pages are not resources), run {run_id}")
+    return run_id
+
+def pagerank_out_of_core(work_dir=PAGERANK_WORK_DIR, memory_mb=PAGERANK_MEMORY_MB,
+                         damping_factor=PAGERANK_DAMPING, tol=PAGERANK_TOL,
+                         max_iterations=PAGERANK_MAX_ITER):
+    """Calculate and store PageRank through work_dir files; returns the run id or None"""
+    print(f"Calculating PageRank scores out of core ({memory_mb} MB budget, {work_dir})...")
+    print("=" * 60)
+
+    start = time.time()
+    num_pages, num_links = build_graph_files(work_dir, memory_mb)
+    if not num_links:
+        print("No links found in database!")
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return None
+    print(f"Damping factor: {damping_factor}")
+    print(f"  Graph files written in {time.time() - start:.2f}s")
+
+    start = time.time()
+    rank, residuals = power_iteration_files(work_dir, num_pages, num_links, damping_factor,
+                                            tol, max_iterations, memory_mb)
+    print_residuals(residuals, tol)
+    print(f"  {time.time() - start:.2f}s")
+
+    run_id = store_pagerank_files(work_dir, rank, num_links, residuals, memory_mb)
+    del rank
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return run_id
 
 def main():
     """Main function to calculate and store PageRank"""
+    if '--out-of-core' in sys.argv or PAGERANK_OUT_OF_CORE:
+        if pagerank_out_of_core() is not None:
+            print(f"\n{'=' * 60}")
+            print("✓ PageRank calculation completed!")
+            print(f"{'=' * 60}")
+        return
+
     links = fetch_links()
-    
+
     if not links:
         print("No links found in database!")
         return
-    
-    pagerank = calculate_pagerank(links)
-    store_pagerank(pagerank)
-    
+
+    pagerank, residuals = calculate_pagerank(links)
+    store_pagerank(pagerank, len(links), residuals)
+
     print(f"\n{'=' * 60}")
     print("✓ PageRank calculation completed!")
     print(f"{'=' * 60}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
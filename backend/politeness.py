@@ -0,0 +1,217 @@
+"""
+Politeness Scheduler
+Per-host request pacing for the crawlers, replacing the fixed
+time.sleep() after every page and between targets.
+
+Each host gets a token bucket (implemented as a GCRA "next allowed time")
+whose interval adapts to the host: it never drops below 1 / HOST_MAX_RATE,
+grows with the host's observed response time and error rate, and
+optionally honours the Crawl-delay from robots.txt. Requests to
+different hosts never wait for each other, so interleaving hosts raises
+overall throughput while each host keeps a bounded request rate.
+
+robots.txt is fetched once per host. The first request to a host fetches
+it and later requests to that host wait for it. The async path fetches
+it in an executor thread, so the event loop keeps serving other hosts.
+"""
+
+import asyncio
+import threading
+import time
+import os
+from urllib import robotparser
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOST_MAX_RATE = float(os.getenv('HOST_MAX_RATE', '2.0'))       # requests/sec per host
+HOST_BURST = int(os.getenv('HOST_BURST', '1'))                  # requests allowed back to back
+ADAPTIVE_FACTOR = float(os.getenv('HOST_ADAPTIVE_FACTOR', '1.0'))
+ERROR_BACKOFF = float(os.getenv('HOST_ERROR_BACKOFF', '4.0'))
+MAX_INTERVAL = float(os.getenv('HOST_MAX_INTERVAL', '30'))
+RESPECT_ROBOTS = os.getenv('RESPECT_ROBOTS', '0') == '1'
+ROBOTS_TIMEOUT = float(os.getenv('ROBOTS_TIMEOUT', '10'))
+
+# Send every request to this origin instead (e.g. http://127.0.0.1:8800),
+# with the real host as the first path segment; used by bench_crawl.py to
+# replay a synthetic site offline
+REPLAY_ORIGIN = os.getenv('REPLAY_ORIGIN', '').rstrip('/')
+
+USER_AGENT = os.getenv(
+    'CRAWLER_USER_AGENT',
+    'Mozilla/5.0 (compatible; ML-Xplore/1.0; +https://github.com/DhruvMehta323/ML-Xplore)'
+)
+
+class _HostState:
+    def __init__(self):
+        self.next_allowed = 0.0
+        self.response_time = 0.0
+        self.error_rate = 0.0
+        self.crawl_delay = None
+        self.robots = None          # threading.Event, set once robots.txt is read
+        self.requests = 0
+
+class HostScheduler:
+    """Token bucket per host with adaptive intervals"""
+
+    def __init__(self, max_rate=HOST_MAX_RATE, burst=HOST_BURST, respect_robots=RESPECT_ROBOTS):
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.burst = max(burst, 1)
+        self.respect_robots = respect_robots
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return (urlsplit(url).hostname or '').lower()
+
+    def _state(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = _HostState()
+        return state
+
+    def interval(self, host):
+        """Current minimum spacing between requests to host, in seconds"""
+        state = self._state(host)
+        interval = max(self.min_interval, state.response_time * ADAPTIVE_FACTOR)
+        if state.crawl_delay:
+            interval = max(interval, state.crawl_delay)
+        interval *= 1 + ERROR_BACKOFF * state.error_rate
+        return min(interval, max(MAX_INTERVAL, state.crawl_delay or 0))
+
+    def reserve(self, url):
+        """Claim the next request slot for url's host and return how long to wait"""
+        host = self.host_of(url)
+        if self.respect_robots:
+            self._load_robots(host, url)
+        return self._claim_slot(host)
+
+    def _claim_slot(self, host):
+        with self.lock:
+            state = self._state(host)
+            interval = self.interval(host)
+            now = time.monotonic()
+            start = max(state.next_allowed, now)
+            wait = max(0.0, start - interval * (self.burst - 1) - now)
+            state.next_allowed = start + interval
+            state.requests += 1
+            return wait
+
+    def ready_in(self, url):
+        """Seconds until url's host has a free slot, without claiming it"""
+        host = self.host_of(url)
+        with self.lock:
+            state = self._state(host)
+            allowed = state.next_allowed - self.interval(host) * (self.burst - 1)
+            return max(0.0, allowed - time.monotonic())
+
+    def acquire(self, url):
+        """Block until a request to url is allowed"""
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url):
+        host = self.host_of(url)
+        if self.respect_robots:
+            await self._load_robots_async(host, url)
+        wait = self._claim_slot(host)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record(self, url, elapsed, ok=True):
+        """Feed back a response time and outcome for url's host"""
+        with self.lock:
+            state = self._state(self.host_of(url))
+            if state.response_time == 0.0:
+                state.response_time = elapsed
+            else:
+                state.response_time = 0.7 * state.response_time + 0.3 * elapsed
+            state.error_rate = 0.8 * state.error_rate + (0.0 if ok else 0.2)
+
+    def interleave(self, urls):
+        """Order urls round-robin across hosts, soonest-ready host first"""
+        groups = {}
+        for url in urls:
+            groups.setdefault(self.host_of(url), []).append(url)
+        hosts = sorted(groups, key=lambda h: self._state(h).next_allowed)
+
+        ordered = []
+        while hosts:
+            for host in list(hosts):
+                ordered.append(groups[host].pop(0))
+                if not groups[host]:
+                    hosts.remove(host)
+        return ordered
+
+    # -------------------- ROBOTS.TXT --------------------
+
+    def _claim_robots(self, host):
+        """The host's robots event, and whether this caller claimed loading it"""
+        with self.lock:
+            state = self._state(host)
+            if state.robots is None:
+                state.robots = threading.Event()
+                return state.robots, True
+            return state.robots, False
+
+    def _set_crawl_delay(self, host, delay):
+        with self.lock:
+            state = self._state(host)
+            state.crawl_delay = delay
+            state.robots.set()
+
+    def _load_robots(self, host, url):
+        event, claimed = self._claim_robots(host)
+        if not claimed:
+            event.wait(ROBOTS_TIMEOUT)
+            return
+        delay = 0.0
+        try:
+            delay = robots_crawl_delay(url)
+        finally:
+            self._set_crawl_delay(host, delay)
+
+    async def _load_robots_async(self, host, url):
+        event, claimed = self._claim_robots(host)
+        if not claimed:
+            # Poll rather than block: other hosts' requests share this loop
+            deadline = time.monotonic() + ROBOTS_TIMEOUT
+            while not event.is_set() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            return
+        delay = 0.0
+        try:
+            delay = await asyncio.get_running_loop().run_in_executor(None, robots_crawl_delay, url)
+        finally:
+            self._set_crawl_delay(host, delay)
+
+def robots_url(url):
+    """robots.txt location for url's host, through REPLAY_ORIGIN when set"""
+    parts = urlsplit(url)
+    if REPLAY_ORIGIN:
+        return f"{REPLAY_ORIGIN}/{parts.netloc}/robots.txt"
+    return f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+def robots_crawl_delay(url):
+    """Crawl-delay for our user agent from the robots.txt of url's host, 0 if none or unreadable"""
+    parser = robotparser.RobotFileParser()
+    try:
+        request = Request(robots_url(url), headers={'User-Agent': USER_AGENT})
+        with urlopen(request, timeout=ROBOTS_TIMEOUT) as response:
+            parser.parse(response.read().decode('utf-8', errors='replace').splitlines())
+        return float(parser.crawl_delay(USER_AGENT) or parser.crawl_delay('*') or 0)
+    except Exception:
+        return 0.0
+
+_scheduler = None
+
+def get_scheduler():
+    """Return the process-wide scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = HostScheduler()
+    return _scheduler
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Recrawl Planner
+Revisit pages that are already in resources instead of crawling
+everything again.
+
+For every page the planner keeps a content hash, the HTTP validators
+(ETag / Last-Modified) and how often a revisit found it changed
+(page_state table). From that history it estimates a change rate per URL,
+leaning on the host's rate while a page has few visits, and revisits the
+pages most likely to be stale first, up to a fetch budget.
+
+Static pages are fetched with conditional requests, so an unchanged page
+costs a 304. A page whose content hash did not change only has its
+last_crawled bumped; a changed page is rewritten and its summary cleared,
+so indexer.py only regenerates summaries for pages that changed. Fetched
+bodies go to the page store (page_store.py), which is also what a page
+without a content hash yet is compared against.
+
+Usage:
+    python recrawl.py plan [budget]    # show what would be revisited
+    python recrawl.py run [budget]     # revisit and update changed pages
+    python recrawl.py stats            # change rates per host
+"""
+
+import sqlite3
+import hashlib
+import heapq
+import math
+import sys
+import os
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+from compression import encode_text, decode_row
+from crawl_engine import CRAWL_BATCH_SIZE
+from fetcher import fetch_pages, is_static_url, PageNotModified
+from link_graph import page_edges
+from mega_crawler import assign_tags, setup_driver
+from page_store import get_page_store
+from tagger import TAG_CONTENT_CHARS
+from urlnorm import canonical_links
+
+load_dotenv()
+
+# -------------------- DATABASE --------------------
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), DATABASE_PATH)
+)
+
+# -------------------- SETTINGS --------------------
+
+RECRAWL_BUDGET = int(os.getenv('RECRAWL_BUDGET', '200'))
+# Pages fetched more recently than this are never revisited
+RECRAWL_MIN_AGE_HOURS = float(os.getenv('RECRAWL_MIN_AGE_HOURS', '6'))
+# Assumed change interval for hosts with no history yet
+DEFAULT_CHANGE_RATE = 1 / (float(os.getenv('RECRAWL_DEFAULT_CHANGE_DAYS', '7')) * 86400)
+# Visits of history before a URL's own estimate outweighs its host's
+PRIOR_VISITS = 3
+
+# -------------------- PAGE STATE --------------------
+
+def ensure_page_state_table(conn):
+    """Create the page_state table if it does not exist"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS page_state (
+            url TEXT PRIMARY KEY,
+            content_hash TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            visits INTEGER DEFAULT 0,
+            changes INTEGER DEFAULT 0,
+            observed_seconds REAL DEFAULT 0,
+            last_fetched DATETIME,
+            last_changed DATETIME,
+            FOREIGN KEY (url) REFERENCES resources(url) ON DELETE CASCADE
+        );
+    """)
+    conn.commit()
+
+def content_hash(page):
+    """Hash of the fields a revisit can change, ignoring whitespace"""
+    text = '\n'.join(' '.join((field or '').split())
+                     for field in (page.title, page.description, page.content))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def estimate_rate(visits, changes, observed_seconds):
+    """Changes per second from revisit history, or None without history.
+
+    A revisit only tells whether the page changed at least once since the
+    previous visit, so changes / time underestimates busy pages. This is
+    the Cho & Garcia-Molina estimator for a Poisson change process, which
+    corrects for that and stays finite when every visit found a change.
+    """
+    if visits <= 0 or observed_seconds <= 0:
+        return None
+    mean_interval = observed_seconds / visits
+    return -math.log((visits - changes + 0.5) / (visits + 0.5)) / mean_interval
+
+def _blend(own_rate, visits, prior_rate):
+    """Weight an estimate by how much history it rests on"""
+    if own_rate is None:
+        return prior_rate
+    weight = visits / (visits + PRIOR_VISITS)
+    return weight * own_rate + (1 - weight) * prior_rate
+
+def host_rates(rows):
+    """Change rate per host from (url, visits, changes, observed_seconds) rows"""
+    totals = {}
+    for url, visits, changes, observed in rows:
+        host = urlsplit(url).hostname or ''
+        total = totals.setdefault(host, [0, 0, 0.0])
+        total[0] += visits or 0
+        total[1] += changes or 0
+        total[2] += observed or 0.0
+
+    return {
+        host: _blend(estimate_rate(*total), total[0], DEFAULT_CHANGE_RATE)
+        for host, total in totals.items()
+    }
+
+# -------------------- PLANNING --------------------
+
+def plan_recrawl(conn, budget=RECRAWL_BUDGET, min_age_hours=RECRAWL_MIN_AGE_HOURS):
+    """Pick up to budget pages ordered by the probability they changed.
+
+    Returns (staleness, url, age_seconds, rate) tuples, most stale first.
+    """
+    ensure_page_state_table(conn)
+    rows = conn.execute("""
+        SELECT r.url, p.visits, p.changes, p.observed_seconds,
+               (julianday('now') - julianday(COALESCE(p.last_fetched, r.last_crawled))) * 86400
+        FROM resources r
+        LEFT JOIN page_state p ON p.url = r.url
+    """).fetchall()
+
+    by_host = host_rates([row[:4] for row in rows])
+    min_age = min_age_hours * 3600
+
+    candidates = []
+    for url, visits, changes, observed, age in rows:
+        if age is None or age < min_age:
+            continue
+        host_rate = by_host.get(urlsplit(url).hostname or '', DEFAULT_CHANGE_RATE)
+        rate = _blend(estimate_rate(visits or 0, changes or 0, observed or 0.0),
+                      visits or 0, host_rate)
+        # Probability of at least one change since the last visit
+        staleness = 1 - math.exp(-rate * age)
+        candidates.append((staleness, url, age, rate))
+
+    return heapq.nlargest(budget, candidates)
+
+# -------------------- REVISITS --------------------
+
+def _record_visit(conn, url, age, changed, new_hash, page=None):
+    """Update page_state after a revisit.
+
+    changed=None means the first hash for a page whose earlier content was
+    never hashed; it sets the baseline without counting as a visit.
+    """
+    etag = page.etag if page is not None else None
+    last_modified = page.last_modified if page is not None else None
+    counted = changed is not None
+
+    conn.execute("""
+        INSERT INTO page_state (url, content_hash, etag, last_modified, visits, changes,
+                                observed_seconds, last_fetched, last_changed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP,
+                CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+        ON CONFLICT(url) DO UPDATE SET
+            content_hash = COALESCE(excluded.content_hash, content_hash),
+            etag = COALESCE(excluded.etag, etag),
+            last_modified = COALESCE(excluded.last_modified, last_modified),
+            visits = visits + excluded.visits,
+            changes = changes + excluded.changes,
+            observed_seconds = observed_seconds + excluded.observed_seconds,
+            last_fetched = CURRENT_TIMESTAMP,
+            last_changed = COALESCE(excluded.last_changed, last_changed)
+    """, (url, new_hash, etag, last_modified, int(counted), int(bool(changed)),
+          age if counted else 0.0, bool(changed)))
+
+def _store_changed_page(conn, url, page):
+    """Rewrite a changed page and clear its summary for indexer.py"""
+    tags = assign_tags(page.content[:TAG_CONTENT_CHARS], url)
+    conn.execute("""
+        UPDATE resources
+        SET title = ?, description = ?, tags = ?, summary = NULL,
+            last_crawled = CURRENT_TIMESTAMP
+        WHERE url = ?
+    """, (page.title, encode_text(page.description, conn), tags, url))
+    conn.executemany(
+        "INSERT OR IGNORE INTO links (source_url, destination_url) VALUES (?, ?)",
+        [(url, href) for href in page_edges(url, canonical_links(page.links))]
+    )
+
+def _revisit_batch(conn, batch, driver):
+    """Fetch one batch of planned pages and apply the results"""
+    urls = [url for _, url, _, _ in batch]
+    state = {
+        url: (content_hash, etag, last_modified)
+        for url, content_hash, etag, last_modified in conn.execute(
+            f"SELECT url, content_hash, etag, last_modified FROM page_state "
+            f"WHERE url IN ({','.join('?' * len(urls))})", urls
+        )
+    }
+    # Without a stored hash a 304 could not be checked against anything
+    validators = {url: (s[1], s[2]) for url, s in state.items() if s[0]}
+
+    counts = {'changed': 0, 'unchanged': 0, 'not_modified': 0, 'errors': 0}
+    results = fetch_pages(urls, driver, validators=validators)
+    page_store = get_page_store()
+
+    for (_, url, age, _), page in zip(batch, results):
+        if isinstance(page, PageNotModified):
+            _record_visit(conn, url, age, False, None)
+            conn.execute("UPDATE resources SET last_crawled = CURRENT_TIMESTAMP WHERE url = ?", (url,))
+            counts['not_modified'] += 1
+            continue
+        if isinstance(page, Exception):
+            counts['errors'] += 1
+            continue
+
+        new_hash = content_hash(page)
+        old_hash = state.get(url, (None,))[0]
+
+        stored_text = page_store.get_text(url) if page_store is not None else None
+
+        if old_hash is not None:
+            changed = new_hash != old_hash
+        elif stored_text is not None:
+            changed = stored_text != page.content
+        else:
+            # No hash yet: only a different title or description proves a change
+            row = conn.execute(
+                "SELECT title, description FROM resources WHERE url = ?", (url,)
+            ).fetchone()
+            title, description = decode_row(row, conn, (1,))
+            changed = True if (title, description or '') != (page.title, page.description) else None
+
+        _record_visit(conn, url, age, changed, new_hash, page)
+        if page_store is not None and (stored_text != page.content or page.html):
+            page_store.put(url, page.content, page.html)
+        if changed:
+            _store_changed_page(conn, url, page)
+            counts['changed'] += 1
+        else:
+            conn.execute("UPDATE resources SET last_crawled = CURRENT_TIMESTAMP WHERE url = ?", (url,))
+            counts['unchanged'] += 1
+
+    conn.commit()
+    return counts
+
+def recrawl(budget=RECRAWL_BUDGET):
+    """Revisit the most stale pages and return counts per outcome"""
+    conn = sqlite3.connect(DATABASE_PATH)
+    plan = plan_recrawl(conn, budget)
+    totals = {'changed': 0, 'unchanged': 0, 'not_modified': 0, 'errors': 0}
+
+    # Chrome is only started when the plan contains browser-only pages
+    driver = None
+    if any(not is_static_url(url) for _, url, _, _ in plan):
+        driver = setup_driver()
+
+    try:
+        for start in range(0, len(plan), CRAWL_BATCH_SIZE):
+            counts = _revisit_batch(conn, plan[start:start + CRAWL_BATCH_SIZE], driver)
+            for key, value in counts.items():
+                totals[key] += value
+            print(f"  [{min(start + CRAWL_BATCH_SIZE, len(plan))}/{len(plan)}] "
+                  f"{totals['changed']} changed, "
+                  f"{totals['unchanged'] + totals['not_modified']} unchanged")
+    finally:
+        conn.close()
+        if driver is not None:
+            driver.quit()
+        page_store = get_page_store()
+        if page_store is not None:
+            page_store.flush()
+
+    return totals
+
+# -------------------- ENTRY POINT --------------------
+
+def print_plan(budget):
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        plan = plan_recrawl(conn, budget)
+    finally:
+        conn.close()
+
+    print("=" * 80)
+    print(f"  RECRAWL PLAN ({len(plan)} pages, budget {budget})")
+    print("=" * 80)
+    for staleness, url, age, rate in plan:
+        print(f"  P(changed)={staleness:.2f}  age={age / 86400:6.1f}d  "
+              f"every~{1 / rate / 86400:7.1f}d  {url[:80]}")
+
+def print_stats():
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        ensure_page_state_table(conn)
+        rows = conn.execute(
+            "SELECT url, visits, changes, observed_seconds FROM page_state"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    pages = {}
+    for url, *_ in rows:
+        host = urlsplit(url).hostname or ''
+        pages[host] = pages.get(host, 0) + 1
+
+    print("=" * 70)
+    print(f"  CHANGE RATES ({len(rows)} pages tracked)")
+    print("=" * 70)
+    for host, rate in sorted(host_rates(rows).items(), key=lambda item: -item[1]):
+        print(f"  {host:40} {pages[host]:6} pages  changes every ~{1 / rate / 86400:.1f} days")
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else RECRAWL_BUDGET
+
+    if command == 'plan':
+        print_plan(budget)
+    elif command == 'run':
+        print("Starting recrawl...")
+        print("=" * 60)
+        totals = recrawl(budget)
+        print(f"\n{'=' * 60}")
+        print(f"✓ Recrawl completed: {totals['changed']} changed, "
+              f"{totals['unchanged']} unchanged, {totals['not_modified']} not modified (304), "
+              f"{totals['errors']} errors")
+        print("Run indexer.py to summarize the changed pages")
+        print(f"{'=' * 60}")
+    elif command == 'stats':
+        print_stats()
+    else:
+        print(__doc__)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tagger
+Category tags for crawled pages, shared by all crawler scripts.
+
+assign_tags() used to build and run one re.search(r'\\b' + keyword + r'\\b')
+per keyword per page. The keywords are now compiled once into a single
+regex, so one pass over the text finds every category. The retag command
+re-tags the stored resources in parallel worker processes after
+category_keywords changes, without recrawling: from the page body in the
+page store (page_store.py) when it has one, as the crawlers tag it.
+
+Usage:
+    python tagger.py retag [workers]
+"""
+
+import sqlite3
+import multiprocessing as mp
+import re
+import sys
+import time
+import os
+from collections import deque
+from dotenv import load_dotenv
+
+from compression import decode_text
+from page_store import PAGE_STORE_ENABLED, PAGE_STORE_PATH, PageStore
+
+load_dotenv()
+
+# -------------------- DATABASE --------------------
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), DATABASE_PATH)
+)
+
+RETAG_CHUNK_ROWS = int(os.getenv('RETAG_CHUNK_ROWS', '2000'))
+# The crawlers tag a page from this much of its body text
+TAG_CONTENT_CHARS = int(os.getenv('TAG_CONTENT_CHARS', '500'))
+
+# -------------------- TAG KEYWORDS --------------------
+
+category_keywords = {
+    "dataset": ["dataset", "data collection", "data source", "training data", "benchmark"],
+    "model": ["model", "algorithm", "neural network", "training", "inference", "architecture"],
+    "article": ["article", "guide", "tutorial", "how-to", "introduction", "overview"],
+    "research paper": ["research paper", "study", "journal", "publication", "arxiv", "conference", "proceedings", "ieee"],
+    "documentation": ["documentation", "api", "reference", "docs"],
+    "code": ["code", "implementation", "github", "repository", "example"]
+}
+
+# URL patterns checked before the content; the first match wins
+url_tags = [
+    ('kaggle.com/datasets', 'dataset'),
+    ('kaggle.com/models', 'model'),
+    ('arxiv.org', 'research paper'),
+    ('ieeexplore.ieee.org', 'research paper'),
+    ('github.com', 'code'),
+]
+
+# -------------------- COMPILED TAGGER --------------------
+
+class Tagger:
+    """All category keywords compiled into one regex"""
+
+    def __init__(self, keywords, url_rules):
+        self.categories = list(keywords)
+        self.url_rules = url_rules
+
+        # The lookahead matches at every position, so keywords that overlap
+        # are all seen. Longest first so 'training data' wins over
+        # 'training' at the same position; the shorter keyword's category
+        # is added through implied[].
+        words = sorted({w for ws in keywords.values() for w in ws}, key=len, reverse=True)
+        self.pattern = re.compile(
+            r'(?=\b(' + '|'.join(re.escape(w) for w in words) + r')\b)'
+        )
+        self.implied = {}
+        for word in words:
+            self.implied[word] = {
+                category for category, ws in keywords.items()
+                if any(re.match(re.escape(w) + r'\b', word) for w in ws)
+            }
+
+    def categories_in(self, text):
+        """Set of categories with a keyword in text (lowercased)"""
+        found = set()
+        for match in self.pattern.finditer(text):
+            found |= self.implied[match.group(1)]
+            if len(found) == len(self.categories):
+                break
+        return found
+
+    def assign(self, content, url=""):
+        """Comma-separated tags for a page, or 'general'"""
+        tags = []
+        url_lower = url.lower()
+        for pattern, category in self.url_rules:
+            if pattern in url_lower:
+                tags.append(category)
+                break
+
+        found = self.categories_in(content.lower())
+        # Keep category_keywords order, as the old per-keyword loop did
+        tags.extend(c for c in self.categories if c in found and c not in tags)
+        return ", ".join(tags) if tags else "general"
+
+TAGGER = Tagger(category_keywords, url_tags)
+
+def assign_tags(content, url=""):
+    """Determine tags based on content and URL"""
+    return TAGGER.assign(content, url)
+
+# -------------------- BULK RE-TAG --------------------
+
+_worker_conn = None
+_worker_store = None
+
+def _init_worker(database_path, page_store_path):
+    # Each worker decodes compressed text with its own connections
+    global _worker_conn, _worker_store
+    _worker_conn = sqlite3.connect(database_path)
+    if page_store_path is not None:
+        _worker_store = PageStore(page_store_path)
+
+def _retag_rows(rows):
+    """Tag one chunk; return (tags, id) only for rows whose tags changed"""
+    changed = []
+    for resource_id, url, title, description, summary, old_tags in rows:
+        body = _worker_store.get_text(url) if _worker_store is not None else None
+        if body is not None:
+            text = body[:TAG_CONTENT_CHARS]
+        else:
+            text = ' '.join(
+                decode_text(value, _worker_conn) or '' for value in (title, description, summary)
+            )
+        tags = assign_tags(text, url)
+        if tags != old_tags:
+            changed.append((tags, resource_id))
+    return changed
+
+def _read_chunks(conn, chunk_rows):
+    """Yield resources in id order, one short query per chunk"""
+    last_id = 0
+    while True:
+        rows = conn.execute("""
+            SELECT id, url, title, description, summary, tags FROM resources
+            WHERE id > ? ORDER BY id LIMIT ?
+        """, (last_id, chunk_rows)).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+def retag_resources(database_path=DATABASE_PATH, workers=None, chunk_rows=RETAG_CHUNK_ROWS):
+    """Re-tag every resource from its stored text and write changed tags back.
+
+    Tags are computed from the stored page body, or from title,
+    description and summary for pages missing from the page store.
+    Returns (rows scanned, rows changed).
+    """
+    workers = workers or os.cpu_count() or 1
+    page_store_path = (PAGE_STORE_PATH if PAGE_STORE_ENABLED and os.path.exists(PAGE_STORE_PATH)
+                       else None)
+    conn = sqlite3.connect(database_path)
+    scanned = changed = 0
+    pending = deque()
+
+    def write(updates):
+        nonlocal changed
+        conn.executemany("UPDATE resources SET tags = ? WHERE id = ?", updates)
+        conn.commit()
+        changed += len(updates)
+
+    try:
+        with mp.Pool(workers, initializer=_init_worker,
+                     initargs=(database_path, page_store_path)) as pool:
+            for rows in _read_chunks(conn, chunk_rows):
+                scanned += len(rows)
+                pending.append(pool.apply_async(_retag_rows, (rows,)))
+                # Keep a bounded number of chunks in flight
+                if len(pending) >= workers * 2:
+                    write(pending.popleft().get())
+            while pending:
+                write(pending.popleft().get())
+    finally:
+        conn.close()
+
+    return scanned, changed
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    if (sys.argv[1] if len(sys.argv) > 1 else '') != 'retag':
+        print(__doc__)
+        return
+
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print("Re-tagging resources...")
+    print("=" * 60)
+    start = time.time()
+    scanned, changed = retag_resources(workers=workers)
+    elapsed = time.time() - start
+
+    print(f"✓ Scanned {scanned} resources in {elapsed:.1f}s "
+          f"({scanned / max(elapsed, 1e-9):.0f} rows/s)")
+    print(f"✓ Updated tags on {changed} resources")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,4 @@
-import sqlite3
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from collections import deque
-import time
 import os
-import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,61 +12,16 @@ from crawler import (
     check_arxiv_page, check_ieee_page, check_paperswithcode_page,
     check_machinelearningmastery_page
 )
+import crawl_engine
+from telemetry import get_metrics
 
 def crawl_specific_target(start_url, max_depth, check_function, driver, visited_links, max_pages=50):
     """Crawl with a page limit for targeted collection"""
-    queue = deque([(start_url, 1)])
-    site_visited = set()
-    pages_crawled = 0
-
-    while queue and pages_crawled < max_pages:
-        url, depth = queue.popleft()
-
-        if depth > max_depth or url in visited_links or url in site_visited:
-            continue
-
-        print(f"[{pages_crawled + 1}/{max_pages}] [Depth {depth}] Crawling: {url}")
-
-        if check_function(url) is None:
-            continue
-
-        site_visited.add(url)
-        visited_links.add(url)
-
-        try:
-            driver.get(url)
-            time.sleep(3)
-
-            title = driver.title
-            try:
-                description = driver.find_element(
-                    By.CSS_SELECTOR, 'meta[name="description"]'
-                ).get_attribute('content')
-            except:
-                description = ''
-
-            content = driver.find_element(By.TAG_NAME, 'body').text
-            tags = assign_tags(content, url)
-
-            store_resource(url, title, description, tags)
-            pages_crawled += 1
-
-            links = driver.find_elements(By.TAG_NAME, 'a')
-            for link in links:
-                try:
-                    href = link.get_attribute('href')
-                    if href and href.startswith('http') and href not in visited_links:
-                        store_link(url, href)
-                        if check_function(href):
-                            queue.append((href, depth + 1))
-                except:
-                    continue
-
-        except Exception as e:
-            print(f"Error crawling {url}: {e}")
-            continue
-
-    return pages_crawled
+    return crawl_engine.crawl_site(
+        start_url, max_depth, check_function, driver, visited_links, max_pages,
+        assign_tags=assign_tags, store_resource=store_resource, store_link=store_link,
+        render_wait=3, log_every=1
+    )
 
 def main():
     print("=" * 70)
@@ -150,6 +98,8 @@ def main():
     finally:
         driver.quit()
 
+    get_metrics().summary()
+
     print(f"\n{'=' * 70}")
     print(f"✓ TOTAL CRAWLED: {total_crawled} pages")
     print(f"✓ Total unique URLs: {len(visited_links)}")
@@ -0,0 +1,252 @@
+"""
+Crawl Telemetry
+Structured metrics for the crawlers, replacing progress prints as the
+only record of a run.
+
+The crawl loops report every page (with its wait / fetch / render /
+extract / store timings), every failure (with the full error), the
+queue depth and driver restarts to a process-wide CrawlMetrics. Every
+TELEMETRY_INTERVAL seconds a snapshot of the last interval is appended
+to a rolling JSON-lines file, failures are logged there as they happen,
+and summary() prints per-stage latencies and per-host outcomes at the
+end of a run so the slow sources and stages stand out.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import os
+from logging.handlers import RotatingFileHandler
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TELEMETRY_ENABLED = os.getenv('TELEMETRY', '1') == '1'
+TELEMETRY_PATH = os.getenv('TELEMETRY_PATH', '../logs/crawl_metrics.jsonl')
+TELEMETRY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), TELEMETRY_PATH))
+TELEMETRY_INTERVAL = float(os.getenv('TELEMETRY_INTERVAL', '10'))
+TELEMETRY_MAX_BYTES = int(os.getenv('TELEMETRY_MAX_BYTES', str(10 * 1024 * 1024)))
+TELEMETRY_BACKUPS = int(os.getenv('TELEMETRY_BACKUPS', '3'))
+
+STAGES = ('wait', 'fetch', 'render', 'extract', 'store')
+OUTCOMES = ('ok', 'timeout', 'http_error', 'driver_error', 'error')
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# -------------------- HELPERS --------------------
+
+def host_of(url):
+    return (urlsplit(url).hostname or '').lower()
+
+def error_kind(error):
+    """Outcome bucket for a failed fetch"""
+    name = type(error).__name__
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or 'Timeout' in name:
+        return 'timeout'
+    if name in ('StaticFetchError', 'PageNotModified'):
+        return 'http_error'
+    if 'WebDriver' in name or name.endswith('DriverException'):
+        return 'driver_error'
+    if 'timed out' in str(error).lower():
+        return 'timeout'
+    return 'error'
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (capped at the max), in seconds"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(BUCKETS_MS[index] / 1000, self.max) if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 1),
+            'p95_ms': round(self.percentile(95) * 1000, 1),
+            'max_ms': round(self.max * 1000, 1),
+        }
+
+# -------------------- METRICS --------------------
+
+class _Window:
+    """Counters for one snapshot interval (and, separately, the whole run)"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.pages = 0
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.hosts = {}
+
+    def host(self, host):
+        stats = self.hosts.get(host)
+        if stats is None:
+            stats = self.hosts[host] = dict.fromkeys(OUTCOMES, 0)
+            stats['seconds'] = 0.0
+        return stats
+
+class CrawlMetrics:
+    """Collects crawl metrics and writes them to a rolling JSON-lines file"""
+
+    def __init__(self, path=TELEMETRY_PATH, interval=TELEMETRY_INTERVAL, enabled=TELEMETRY_ENABLED):
+        self.path = path
+        self.interval = interval
+        self.run = _Window()
+        self.window = _Window()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.driver_restarts = 0
+        self.logger = _open_log(path) if enabled else None
+
+    # ----- recording -----
+
+    def page_done(self, url, timings=None):
+        """A page was fetched and extracted; timings maps stage -> seconds"""
+        host = host_of(url)
+        for window in (self.run, self.window):
+            window.pages += 1
+            stats = window.host(host)
+            stats['ok'] += 1
+            for stage, seconds in (timings or {}).items():
+                window.stages[stage].add(seconds)
+                if stage != 'wait':
+                    stats['seconds'] += seconds
+        self._maybe_snapshot()
+
+    def page_failed(self, url, error, elapsed=None, kind=None):
+        """A fetch failed; error is the exception or its message"""
+        kind = kind or error_kind(error)
+        host = host_of(url)
+        for window in (self.run, self.window):
+            stats = window.host(host)
+            stats[kind] += 1
+            stats['seconds'] += elapsed or 0.0
+        self._log({
+            'event': 'error', 'url': url, 'host': host, 'kind': kind,
+            'error': str(error), 'elapsed_ms': round((elapsed or 0.0) * 1000, 1),
+        })
+        self._maybe_snapshot()
+
+    def observe(self, stage, seconds):
+        """Time spent in one stage outside the fetcher (e.g. 'store')"""
+        self.run.stages[stage].add(seconds)
+        self.window.stages[stage].add(seconds)
+
+    def set_queue_depth(self, depth):
+        self.queue_depth = depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def driver_restart(self, reason):
+        self.driver_restarts += 1
+        self._log({'event': 'driver_restart', 'reason': reason})
+
+    # ----- output -----
+
+    def _log(self, record):
+        if self.logger is not None:
+            record['ts'] = round(time.time(), 3)
+            self.logger.info(json.dumps(record))
+
+    def _maybe_snapshot(self):
+        if time.time() - self.window.started >= self.interval:
+            self.snapshot()
+
+    def snapshot(self):
+        """Write the current interval to the JSON-lines file and start a new one"""
+        elapsed = max(time.time() - self.window.started, 1e-9)
+        self._log({
+            'event': 'snapshot',
+            'pages': self.run.pages,
+            'pages_per_sec': round(self.window.pages / elapsed, 2),
+            'queue_depth': self.queue_depth,
+            'driver_restarts': self.driver_restarts,
+            'stages': {s: h.to_dict() for s, h in self.window.stages.items() if h.count},
+            'hosts': self.window.hosts,
+        })
+        self.window = _Window()
+
+    def summary(self):
+        """Print the end-of-run report and log it; returns it as a dict"""
+        elapsed = max(time.time() - self.run.started, 1e-9)
+        report = {
+            'event': 'summary',
+            'pages': self.run.pages,
+            'elapsed_sec': round(elapsed, 1),
+            'pages_per_sec': round(self.run.pages / elapsed, 2),
+            'max_queue_depth': self.max_queue_depth,
+            'driver_restarts': self.driver_restarts,
+            'stages': {s: h.to_dict() for s, h in self.run.stages.items() if h.count},
+            'hosts': self.run.hosts,
+        }
+        self._log(report)
+
+        print("=" * 80)
+        print(f"  CRAWL TELEMETRY: {report['pages']} pages in {report['elapsed_sec']}s "
+              f"({report['pages_per_sec']} pages/s)")
+        print("=" * 80)
+        print(f"Max queue depth: {self.max_queue_depth}   Driver restarts: {self.driver_restarts}")
+        print()
+        print(f"{'Stage':10} {'count':>8} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+        for stage, h in report['stages'].items():
+            print(f"{stage:10} {h['count']:8} {h['mean_ms']:10} {h['p50_ms']:10} "
+                  f"{h['p95_ms']:10} {h['max_ms']:10}")
+        print()
+        print(f"{'Host':35} {'ok':>6} {'timeout':>8} {'http':>6} {'driver':>7} {'error':>6} {'ms/page':>9}")
+        hosts = sorted(self.run.hosts.items(), key=lambda item: -sum(item[1][o] for o in OUTCOMES))
+        for host, stats in hosts:
+            attempts = sum(stats[o] for o in OUTCOMES)
+            print(f"{host[:35]:35} {stats['ok']:6} {stats['timeout']:8} {stats['http_error']:6} "
+                  f"{stats['driver_error']:7} {stats['error']:6} "
+                  f"{stats['seconds'] / attempts * 1000:9.0f}")
+        if self.logger is not None:
+            print(f"\nMetrics written to {self.path}")
+        print("=" * 80)
+        return report
+
+def _open_log(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    logger = logging.getLogger(f'crawl_telemetry.{path}')
+    if not logger.handlers:
+        handler = RotatingFileHandler(path, maxBytes=TELEMETRY_MAX_BYTES,
+                                      backupCount=TELEMETRY_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+_metrics = None
+
+def get_metrics():
+    """Return the process-wide metrics collector"""
+    global _metrics
+    if _metrics is None:
+        _metrics = CrawlMetrics()
+    return _metrics
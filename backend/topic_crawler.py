@@ -1,9 +1,5 @@
 import sqlite3
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from collections import deque
-import time
+import argparse
 import os
 from dotenv import load_dotenv
 
@@ -17,6 +13,12 @@ from mega_crawler import (
     check_arxiv_page, check_medium_page, check_huggingface_page,
     check_paperswithcode_page, check_github_page
 )
+from distributed import crawl_distributed
+from driver_pool import crawl_parallel
+from crawl_writer import flush_all
+from telemetry import get_metrics
+from crawl_priority import RelevanceScorer, topic_terms
+import crawl_engine
 
 # -------------------- SPECIFIC TOPIC QUERIES --------------------
 
@@ -107,78 +109,22 @@ SPECIFIC_TOPICS = {
 
 # -------------------- CRAWL FUNCTION --------------------
 
-def crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages=50):
-    """Crawl with page limit"""
-    queue = deque([(start_url, 1)])
-    site_visited = set()
-    pages_crawled = 0
-
-    while queue and pages_crawled < max_pages:
-        url, depth = queue.popleft()
-
-        if depth > max_depth or url in visited_links or url in site_visited:
-            continue
-
-        result = check_function(url)
-        if result is None:
-            continue
-
-        site_visited.add(url)
-        visited_links.add(url)
-
-        try:
-            driver.get(url)
-            time.sleep(1)
-
-            title = driver.title
-            try:
-                description = driver.find_element(
-                    By.CSS_SELECTOR, 'meta[name="description"]'
-                ).get_attribute('content')
-            except:
-                description = ''
-
-            content = driver.find_element(By.TAG_NAME, 'body').text[:500]
-            tags = assign_tags(content, url)
-
-            store_resource(url, title, description, tags)
-            pages_crawled += 1
-
-            # Get links
-            links = driver.find_elements(By.TAG_NAME, 'a')
-            for link in links:
-                try:
-                    href = link.get_attribute('href')
-                    if href and href.startswith('http') and href not in visited_links:
-                        store_link(url, href)
-                        if check_function(href):
-                            queue.append((href, depth + 1))
-                except:
-                    continue
-
-        except Exception as e:
-            continue
+def topic_scorer(topic_name):
+    """Frontier scorer that favours links about the topic"""
+    return RelevanceScorer(topic=topic_terms(topic_name))
 
-    return pages_crawled
-
-# -------------------- MAIN --------------------
-
-def main():
-    print("=" * 80)
-    print(" " * 20 + "TOPIC-SPECIFIC ML CRAWLER")
-    print(" " * 15 + "Covering Niche and Advanced ML Topics")
-    print("=" * 80)
-    print()
-    
-    print("Topics to cover:")
-    for i, topic in enumerate(SPECIFIC_TOPICS.keys(), 1):
-        print(f"  {i:2d}. {topic}")
-    print()
-    
-    driver = setup_driver()
-    visited_links = set()
+def crawl_site(start_url, max_depth, check_function, driver, visited_links, max_pages=50,
+               scorer=None, frontier=None):
+    """Crawl with page limit"""
+    return crawl_engine.crawl_site(
+        start_url, max_depth, check_function, driver, visited_links, max_pages,
+        assign_tags=assign_tags, store_resource=store_resource, store_link=store_link,
+        render_wait=1, content_chars=500, frontier=frontier, scorer=scorer
+    )
+
+def crawl_topics(driver, visited_links):
+    """Crawl every topic source in turn with one driver"""
     total_crawled = 0
-    
     topic_count = 0
     
     for topic_name, sources in SPECIFIC_TOPICS.items():
@@ -188,13 +134,15 @@ def main():
         print(f"{'=' * 80}")
         
         topic_crawled = 0
+        scorer = topic_scorer(topic_name)
         
         for source_name, url, check_func in sources:
             print(f"\n  Crawling: {source_name}")
             print(f"  URL: {url[:70]}...")
             
             try:
-                crawled = crawl_site(url, 3, check_func, driver, visited_links, max_pages=30)
+                crawled = crawl_site(url, 3, check_func, driver, visited_links, max_pages=30,
+                                     scorer=scorer)
                 topic_crawled += crawled
                 total_crawled += crawled
                 print(f"  ✓ Crawled {crawled} pages")
@@ -203,7 +151,69 @@ def main():
         
         print(f"\n  Topic '{topic_name}' total: {topic_crawled} resources")
     
-    driver.quit()
+    return total_crawled
+
+# -------------------- MAIN --------------------
+
+def main():
+    print("=" * 80)
+    print(" " * 20 + "TOPIC-SPECIFIC ML CRAWLER")
+    print(" " * 15 + "Covering Niche and Advanced ML Topics")
+    print("=" * 80)
+    print()
+    
+    print("Topics to cover:")
+    for i, topic in enumerate(SPECIFIC_TOPICS.keys(), 1):
+        print(f"  {i:2d}. {topic}")
+    print()
+    
+    parser = argparse.ArgumentParser(description="Topic-specific ML crawler")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="parallel driver processes (default: 1, sequential crawl)")
+    parser.add_argument('--distributed', action='store_true',
+                        help="run as one worker of a distributed crawl (see distributed.py)")
+    parser.add_argument('--worker-id', default=None,
+                        help="worker name in the shared frontier (default: host-pid)")
+    args = parser.parse_args()
+    
+    visited_links = set()
+    total_crawled = 0
+    
+    crawl_targets = [
+        (f"{topic_name} / {source_name}", url, 3, check_func, 30)
+        for topic_name, sources in SPECIFIC_TOPICS.items()
+        for source_name, url, check_func in sources
+    ]
+    scorers = {
+        f"{topic_name} / {source_name}": topic_scorer(topic_name)
+        for topic_name, sources in SPECIFIC_TOPICS.items()
+        for source_name, _, _ in sources
+    }
+    
+    if args.distributed:
+        total_crawled = crawl_distributed(
+            crawl_targets, setup_driver, crawl_site, visited_links, args.worker_id, scorers
+        )
+    elif args.workers > 1:
+        print(f"Parallel mode: {args.workers} driver workers")
+        results = crawl_parallel(
+            crawl_targets, setup_driver, visited_links,
+            assign_tags, store_resource, store_link,
+            workers=args.workers, render_wait=1, content_chars=500, log_every=None,
+            scorers=scorers
+        )
+        for name, crawled in results.items():
+            print(f"  ✓ {name}: {crawled} pages")
+        total_crawled = sum(results.values())
+    else:
+        driver = setup_driver()
+        try:
+            total_crawled = crawl_topics(driver, visited_links)
+        finally:
+            driver.quit()
+    
+    flush_all()
+    get_metrics().summary()
     
     # Get stats
     conn = sqlite3.connect(DATABASE_PATH)
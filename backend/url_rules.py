@@ -0,0 +1,188 @@
+"""
+URL Rules
+One declarative rule table for every site the crawlers know, replacing
+the check_*_page functions that were duplicated (and had drifted apart)
+between crawler.py and mega_crawler.py.
+
+Each site lists its hosts, the patterns that exclude a URL and the
+patterns that give it a resource type, tried in order. Where the two old
+chains disagreed, each site keeps the stricter of them. The table is
+compiled once into a host -> site map plus precompiled regexes, and
+classify() caches its answer per URL, as a link is checked when it is
+queued and again when it is popped. This is a consolidation, not a
+speedup: bench_classifier.py shows the table about as fast as the
+chains it replaced.
+
+Patterns are matched against the path and query of a canonical URL
+(urlnorm.py), which has no trailing slash. Type patterns such as
+'/datasets/' need a page below the section, so listing pages (the
+section itself, a tag or search page, a site's home page) are never
+resources; crawl seeds that are listing pages are fetched only for their
+links. Exclusions end path segments with END instead of '/'.
+"""
+
+import re
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+URL_RULES_CACHE = int(os.getenv('URL_RULES_CACHE', '500000'))
+
+# scheme://[user@]host[:port] followed by path, query and fragment
+_URL = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://(?:[^/?#@]*@)?(\[[^\]]*\]|[^/?#:]*)(?::\d*)?(.*)', re.S)
+
+# End of a path segment: '/', the query or the end of the URL
+END = r'(?:/|\?|$)'
+
+# -------------------- RULE TABLE --------------------
+
+# site: (hosts, exclude patterns, [(pattern, resource type), ...])
+SITE_RULES = {
+    'kaggle': (
+        ['kaggle.com'],
+        [r'[#?%]', rf'/(?:discussions|code|suggestions|competitions)(?:\?|$)', r'/discussion'],
+        [(r'^/datasets/', 'dataset'), (r'^/models/', 'model'), (r'^/learn/', 'article')],
+    ),
+    'geeksforgeeks': (
+        ['geeksforgeeks.org'],
+        [r'[?#]', rf'/(?:jobs|courses|newsletter|write){END}'],
+        [(r'', 'article')],
+    ),
+    'medium': (
+        ['medium.com'],
+        [r'[?#]', rf'/(?:tag|topics|search|plans|membership|about|jobs|newsletter){END}'],
+        [(r'', 'article')],
+    ),
+    'towardsdatascience': (
+        ['towardsdatascience.com'],
+        [r'[?#]', rf'/(?:tagged|plans|membership){END}'],
+        [(r'', 'article')],
+    ),
+    'arxiv': (
+        ['arxiv.org'],
+        [],
+        [(r'^/abs/', 'research paper')],
+    ),
+    'ieee': (
+        ['ieeexplore.ieee.org'],
+        [],
+        [(r'^/document/', 'research paper')],
+    ),
+    'huggingface': (
+        ['huggingface.co'],
+        [r'#', r'[?&]page='],
+        [
+            (r'/datasets/', 'dataset'),
+            (r'/(?:models|spaces)/', 'model'),
+            (r'/papers/', 'research paper'),
+            (r'/docs/', 'documentation'),
+        ],
+    ),
+    'paperswithcode': (
+        ['paperswithcode.com'],
+        [r'[?#]'],
+        [(r'/(?:paper|method)/', 'research paper'), (r'/dataset/', 'dataset')],
+    ),
+    'github': (
+        ['github.com'],
+        [r'#', rf'/(?:issues|pull|actions|wiki|settings){END}'],
+        [(r'(?i)machine-learning|deep-learning|neural|tensorflow|pytorch'
+          r'|ai|ml|llm|transformer|vision|nlp', 'code')],
+    ),
+    'distill': (
+        ['distill.pub'],
+        [],
+        [(r'', 'article')],
+    ),
+    'openai': (
+        ['openai.com'],
+        [],
+        [(r'/(?:research|blog)/', 'article')],
+    ),
+    'deepmind': (
+        ['deepmind.com', 'deepmind.google'],
+        [],
+        [(r'/(?:blog|research|publications)/', 'article')],
+    ),
+    'ai_googleblog': (
+        ['ai.googleblog.com', 'blog.research.google'],
+        [],
+        [(r'', 'article')],
+    ),
+    'machinelearningmastery': (
+        ['machinelearningmastery.com'],
+        [r'[?#]', rf'/(?:blog|start-here|about|category){END}'],
+        [(r'', 'article')],
+    ),
+    'analyticsvidhya': (
+        ['analyticsvidhya.com'],
+        [],
+        [(r'/(?:blog|learn)/', 'article')],
+    ),
+    'kdnuggets': (
+        ['kdnuggets.com'],
+        [r'#', rf'/(?:tag|author){END}'],
+        [(r'', 'article')],
+    ),
+}
+
+# -------------------- COMPILED RULES --------------------
+
+def compile_rules(rules):
+    """Build the host -> site map and per-site compiled patterns"""
+    hosts = {}
+    compiled = {}
+    for site, (site_hosts, exclude, types) in rules.items():
+        for host in site_hosts:
+            hosts[host] = site
+        exclude_re = re.compile('|'.join(f'(?:{p})' for p in exclude)) if exclude else None
+        compiled[site] = (exclude_re, [(re.compile(p), kind) for p, kind in types])
+    return hosts, compiled
+
+_HOSTS, _COMPILED = compile_rules(SITE_RULES)
+
+def site_of(host):
+    """Site for a host or one of its parent domains, or None"""
+    while host:
+        site = _HOSTS.get(host)
+        if site is not None:
+            return site
+        _, _, host = host.partition('.')
+    return None
+
+@lru_cache(maxsize=URL_RULES_CACHE)
+def classify(url):
+    """Return (site, resource type) for a URL, or None if no rule accepts it"""
+    match = _URL.match(url)
+    if match is None:
+        return None
+    site = site_of(match.group(1).lower())
+    if site is None:
+        return None
+
+    target = match.group(2) or '/'
+    if target.split('?', 1)[0] == '/':
+        # A site's home page is a listing, never a resource
+        return None
+
+    exclude_re, types = _COMPILED[site]
+    if exclude_re is not None and exclude_re.search(target):
+        return None
+    for pattern, kind in types:
+        if pattern.search(target):
+            return site, kind
+    return None
+
+def site_filter(site):
+    """Check function for one site: URL -> resource type, or None"""
+    if site not in SITE_RULES:
+        raise KeyError(f"No URL rules for site '{site}'")
+
+    def check(url):
+        result = classify(url)
+        return result[1] if result is not None and result[0] == site else None
+
+    check.__name__ = f"check_{site}_page"
+    return check
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+URL Canonicalization
+One spelling per page, so http/https, www./bare host, trailing slashes,
+query parameter order and tracking parameters stop producing duplicate
+rows in visited_links, resources and links.
+
+canonicalize_url() is applied by the crawl engine before a link is
+checked, enqueued or stored, and by the crawl writer before anything is
+written. The migrate command merges duplicates already in the database.
+
+Usage:
+    python urlnorm.py migrate    # merge duplicate URLs in the database
+"""
+
+import sqlite3
+import ipaddress
+import re
+import sys
+import os
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# -------------------- DATABASE --------------------
+
+DATABASE_PATH = os.getenv('DATABASE_PATH', '../database/database.db')
+DATABASE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), DATABASE_PATH)
+)
+
+# -------------------- RULES --------------------
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref', 'ref_src', 'referrer', 'source', 'sk', 'trk', 'spm',
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+_UNRESERVED = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+# -------------------- CANONICALIZATION --------------------
+
+def _normalize_escape(match):
+    """Decode escaped unreserved characters, uppercase every other escape"""
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else '%' + match.group(1).upper()
+
+def _keeps_scheme(host):
+    """localhost and bare IP addresses rarely serve TLS, so keep their http"""
+    if host == 'localhost':
+        return True
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+def _is_tracking(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+@lru_cache(maxsize=200000)
+def canonicalize_url(url):
+    """Return the canonical spelling of an http(s) URL.
+
+    Lowercases scheme and host, upgrades http to https (except for
+    localhost and IP addresses), drops 'www.', default ports, fragments,
+    tracking parameters and trailing slashes, sorts the remaining query
+    parameters and normalizes percent-escapes.
+    Anything that is not an http(s) URL is returned unchanged.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.rstrip('.')
+    netloc = f"[{host}]" if ':' in host else host
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    if not _keeps_scheme(host):
+        scheme = 'https'
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+
+    path = _ESCAPE.sub(_normalize_escape, parts.path) or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking(name)
+    )
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+def canonical_links(links, spellings=None):
+    """Canonicalize a page's links, dropping duplicates and keeping order.
+
+    spellings, if a dict, gets {canonical link: link as it appeared} for
+    the first spelling of each link, so it can be fetched as discovered.
+    """
+    seen = set()
+    result = []
+    for original in links:
+        link = canonicalize_url(original)
+        if link not in seen:
+            seen.add(link)
+            result.append(link)
+            if spellings is not None:
+                spellings[link] = original
+    return result
+
+def canonical_anchors(anchors):
+    """Re-key a page's {link: anchor text} map by canonical URL"""
+    result = {}
+    for link, text in (anchors or {}).items():
+        link = canonicalize_url(link)
+        if text and not result.get(link):
+            result[link] = text
+    return result
+
+# -------------------- MIGRATION --------------------
+
+def _merge_resources(conn):
+    """Keep one resources row per canonical URL and rename it.
+
+    The survivor is the row that already has a summary and the highest
+    popularity score, otherwise the oldest row. Returns (rows renamed,
+    rows deleted).
+    """
+    groups = {}
+    for row in conn.execute("SELECT id, url, summary, popularity_score FROM resources ORDER BY id"):
+        groups.setdefault(canonicalize_url(row[1]), []).append(row)
+
+    renamed = deleted = 0
+    for canonical, rows in groups.items():
+        if len(rows) == 1 and rows[0][1] == canonical:
+            continue
+        survivor = max(rows, key=lambda r: (bool(r[2]), r[3] or 0.0, -r[0]))
+        others = [r[0] for r in rows if r[0] != survivor[0]]
+        conn.executemany("DELETE FROM resources WHERE id = ?", [(i,) for i in others])
+        if survivor[1] != canonical:
+            conn.execute("UPDATE resources SET url = ? WHERE id = ?", (canonical, survivor[0]))
+            renamed += 1
+        deleted += len(others)
+    return renamed, deleted
+
+def _rewrite_column(conn, table, columns):
+    """Rewrite URL columns in place; rows that collide with an existing one are dropped"""
+    assignments = ', '.join(f"{c} = canonical_url({c})" for c in columns)
+    changed = ' OR '.join(f"{c} != canonical_url({c})" for c in columns)
+    updated = conn.execute(f"UPDATE OR IGNORE {table} SET {assignments} WHERE {changed}").rowcount
+    dropped = conn.execute(f"DELETE FROM {table} WHERE {changed}").rowcount
+    return updated, dropped
+
+def migrate(conn):
+    """Merge duplicate URLs in resources, links, page_state and interactions"""
+    conn.create_function('canonical_url', 1, canonicalize_url, deterministic=True)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    report = {'resources': _merge_resources(conn)}
+    report['links'] = _rewrite_column(conn, 'links', ('source_url', 'destination_url'))
+    if 'page_state' in tables:
+        report['page_state'] = _rewrite_column(conn, 'page_state', ('url',))
+    # Interactions are history, so rewrite them without dropping any
+    report['user_source_interaction'] = (conn.execute("""
+        UPDATE user_source_interaction SET resource_url = canonical_url(resource_url)
+        WHERE resource_url != canonical_url(resource_url)
+    """).rowcount, 0)
+    conn.commit()
+    return report
+
+# -------------------- ENTRY POINT --------------------
+
+def main():
+    if (sys.argv[1] if len(sys.argv) > 1 else '') != 'migrate':
+        print(__doc__)
+        return
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        before = conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+        report = migrate(conn)
+    finally:
+        conn.close()
+
+    print("=" * 60)
+    print("  URL CANONICALIZATION")
+    print("=" * 60)
+    for table, (rewritten, dropped) in report.items():
+        print(f"  {table:25} {rewritten:8} rewritten  {dropped:8} duplicates removed")
+    print(f"\n✓ Resources: {before} -> {before - report['resources'][1]}")
+    print("Run pagerank.py to recompute scores over the merged link graph")
+
+if __name__ == "__main__":
+    main()